@@ -88,7 +88,6 @@ from flask_login import LoginManager
 from dotenv import load_dotenv
 
 from .config import Config
-from .db import close_db
 from .auth import DBUser
 
 login_manager = LoginManager()
@@ -114,20 +113,19 @@ def create_app():
     os.makedirs(db_dir, exist_ok=True)
     app.config["DB_PATH"] = db_path
 
+    from . import db
+    db.init_app(app)
+
     login_manager.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        # busca usuário por ID no banco
+        # registro compacto do usuário, com cache por worker (app/usercache.py)
         try:
-            from .db import get_db
-            db = get_db()
-            row = db.execute(
-                "SELECT * FROM users WHERE id = ? AND is_active = 1",
-                (user_id,),
-            ).fetchone()
-            if row:
-                return DBUser(row)
+            from .usercache import get_user
+            record = get_user(user_id)
+            if record:
+                return DBUser(record)
         except Exception:
             return None
         return None
@@ -135,14 +133,26 @@ def create_app():
     from .routes import main_bp
     app.register_blueprint(main_bp)
 
-    app.teardown_appcontext(close_db)
-
-    # (opcional mas recomendado) cria tabelas/migrações/seed admin
-    try:
-        from .db import init_db
-        with app.app_context():
-            init_db()
-    except Exception:
-        pass
+    from . import aggregates, scanlog, qrcache, usercache, ratelimit, qrimage, archive, metrics, sqltrace, assets, pages, compress
+    metrics.init_app(app)
+    sqltrace.init_app(app)
+    aggregates.init_app(app)
+    scanlog.init_app(app)
+    qrcache.init_app(app)
+    usercache.init_app(app)
+    ratelimit.init_app(app)
+    qrimage.init_app(app)
+    archive.init_app(app)
+    assets.init_app(app)
+    pages.init_app(app)
+    compress.init_app(app)
+
+    from . import cli
+    cli.init_app(app)
+
+    # Checagem de schema (1 query) + migrações pendentes + admin do .env.
+    # Roda uma vez no startup, não a cada request.
+    from .db import check_db
+    check_db(app)
 
     return app
@@ -0,0 +1,414 @@
+"""Agregados derivados dos scans, mantidos na própria ingestão.
+
+Tudo aqui roda na mesma transação do INSERT em qr_access_logs (ver
+scanlog.write_scans), então os agregados nunca divergem dos logs brutos.
+"""
+import calendar
+import logging
+from datetime import datetime, timedelta, timezone
+from itertools import chain
+
+from .archive import archived_totals, iter_archived
+from .useragent import DEVICE_BOT, classify, labels
+from .hll import HLL
+
+log = logging.getLogger(__name__)
+
+# Fuso usado nos buckets diários (qr_scan_daily). Definido por init_app.
+_tz = timezone(timedelta(hours=-3), "America/Sao_Paulo")
+
+
+def load_timezone(name: str):
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        # sem tzdata (ex.: Windows sem o pacote): São Paulo não tem horário de verão desde 2019
+        log.warning("timezone %s indisponível; usando UTC-3 fixo", name)
+        return timezone(timedelta(hours=-3), name)
+
+
+def init_app(app):
+    global _tz
+    _tz = load_timezone(app.config.get("STATS_TIMEZONE", "America/Sao_Paulo"))
+
+
+def stats_timezone():
+    return _tz
+
+
+def _parse_utc(accessed_at: str) -> datetime:
+    # accessed_at é ISO em UTC, sem offset ('2026-01-01T12:00:00.123456')
+    return datetime.fromisoformat(accessed_at).replace(tzinfo=timezone.utc)
+
+
+def hour_bucket(dt: datetime) -> int:
+    """Epoch (s) do início da hora UTC."""
+    epoch = calendar.timegm(dt.utctimetuple())
+    return epoch - epoch % 3600
+
+
+def local_day(dt: datetime) -> str:
+    return dt.astimezone(_tz).date().isoformat()
+
+
+# ---------------- CONTADORES (qr_scan_counters) ----------------
+
+def apply_counters(db, scans):
+    """Soma os scans do lote em qr_scan_counters (um upsert por QR)."""
+    per_qr = {}
+    for s in scans:
+        n, last = per_qr.get(s.qr_code_id, (0, ""))
+        per_qr[s.qr_code_id] = (n + 1, max(last, s.accessed_at))
+
+    db.executemany("""
+      INSERT INTO qr_scan_counters (qr_code_id, scans, last_scan_at)
+      VALUES (?, ?, ?)
+      ON CONFLICT(qr_code_id) DO UPDATE SET
+        scans = scans + excluded.scans,
+        last_scan_at = max(COALESCE(last_scan_at, ''), excluded.last_scan_at)
+    """, [(qr_id, n, last) for qr_id, (n, last) in per_qr.items()])
+
+
+# ---------------- ROLLUPS (qr_scan_hourly / qr_scan_daily) ----------------
+# hourly: hora UTC (epoch em segundos) -> serve qualquer fuso na leitura
+# daily: dia no fuso STATS_TIMEZONE -> serve dia/semana/mês/intervalos
+
+def scan_datetime(s) -> datetime:
+    if s.ts is not None:
+        return datetime.fromtimestamp(s.ts / 1000, timezone.utc)
+    return _parse_utc(s.accessed_at)
+
+
+def _bucket_scans(scans):
+    """Buckets do lote: hourly/daily -> [scans, bots]; ua -> scans por (dia, device, os, browser);
+    uniques -> sketch HLL por (qr, dia), só de scans que não são de bots."""
+    hourly, daily, ua, uniques = {}, {}, {}, {}
+    for s in scans:
+        dt = scan_datetime(s)
+        day = local_day(dt)
+        bot = 1 if s.is_bot else 0
+        for buckets, key in ((hourly, (s.qr_code_id, hour_bucket(dt))), (daily, (s.qr_code_id, day))):
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = [1, bot]
+            else:
+                b[0] += 1
+                b[1] += bot
+        uk = (s.qr_code_id, day, s.ua_device or 0, s.ua_os or 0, s.ua_browser or 0)
+        ua[uk] = ua.get(uk, 0) + 1
+        if not bot:
+            sketch = uniques.get((s.qr_code_id, day))
+            if sketch is None:
+                sketch = uniques[(s.qr_code_id, day)] = HLL()
+            sketch.add(s.ip_address, s.user_agent)
+    return hourly, daily, ua, uniques
+
+
+def _merge_buckets(into, other):
+    hourly, daily, ua, uniques = into
+    h2, d2, u2, q2 = other
+    for k, sketch in q2.items():
+        if k in uniques:
+            uniques[k].merge(sketch)
+        else:
+            uniques[k] = sketch
+    for target, source in ((hourly, h2), (daily, d2)):
+        for k, (n, bots) in source.items():
+            b = target.setdefault(k, [0, 0])
+            b[0] += n
+            b[1] += bots
+    for k, n in u2.items():
+        ua[k] = ua.get(k, 0) + n
+
+
+def _upsert_uniques(db, uniques):
+    # read-modify-write do sketch (estamos dentro da transação do lote)
+    rows = []
+    for (qr_id, day), sketch in uniques.items():
+        row = db.execute(
+            "SELECT sketch FROM qr_scan_uniques_daily WHERE qr_code_id = ? AND day = ?", (qr_id, day)
+        ).fetchone()
+        if row is not None:
+            sketch = HLL.from_bytes(row[0]).merge(sketch)
+        rows.append((qr_id, day, sketch.to_bytes()))
+    db.executemany(
+        "INSERT OR REPLACE INTO qr_scan_uniques_daily (qr_code_id, day, sketch) VALUES (?, ?, ?)", rows
+    )
+
+
+def _upsert_rollups(db, hourly, daily, ua, uniques):
+    db.executemany("""
+      INSERT INTO qr_scan_hourly (qr_code_id, hour, scans, bot_scans) VALUES (?, ?, ?, ?)
+      ON CONFLICT(qr_code_id, hour) DO UPDATE SET
+        scans = scans + excluded.scans,
+        bot_scans = bot_scans + excluded.bot_scans
+    """, [(q, h, n, bots) for (q, h), (n, bots) in hourly.items()])
+    db.executemany("""
+      INSERT INTO qr_scan_daily (qr_code_id, day, scans, bot_scans) VALUES (?, ?, ?, ?)
+      ON CONFLICT(qr_code_id, day) DO UPDATE SET
+        scans = scans + excluded.scans,
+        bot_scans = bot_scans + excluded.bot_scans
+    """, [(q, d, n, bots) for (q, d), (n, bots) in daily.items()])
+    db.executemany("""
+      INSERT INTO qr_scan_ua_daily (qr_code_id, day, device, os, browser, scans) VALUES (?, ?, ?, ?, ?, ?)
+      ON CONFLICT(qr_code_id, day, device, os, browser) DO UPDATE SET scans = scans + excluded.scans
+    """, [(*k, n) for k, n in ua.items()])
+    _upsert_uniques(db, uniques)
+
+
+def apply_rollups(db, scans):
+    _upsert_rollups(db, *_bucket_scans(scans))
+
+
+def apply_scans(db, scans):
+    """Atualiza todos os agregados para um lote de scans (sem commit)."""
+    apply_counters(db, scans)
+    apply_rollups(db, scans)
+
+
+class _LogRow:
+    __slots__ = ("qr_code_id", "accessed_at", "ts", "ip_address", "user_agent",
+                 "ua_device", "ua_os", "ua_browser", "is_bot")
+
+    def __init__(self, qr_code_id, accessed_at, ts, ip_address, user_agent, ua):
+        self.qr_code_id = qr_code_id
+        self.accessed_at = accessed_at
+        self.ts = ts
+        self.ip_address = ip_address
+        self.user_agent = user_agent
+        self.ua_device, self.ua_os, self.ua_browser, self.is_bot = ua
+
+
+_LOG_COLUMNS = "id, accessed_at, ts, ua_device, ua_os, ua_browser, is_bot, user_agent, ip_address"
+
+
+def _log_row(qr_id, r):
+    # is_bot NULL: linha ainda não classificada (backfill pendente)
+    ua = (r[3], r[4], r[5], r[6]) if r[6] is not None else classify(r[7])
+    return _LogRow(qr_id, r[1], r[2], r[8], r[7], ua)
+
+
+def _iter_logs(db, qr_id, chunk, max_id):
+    """Logs de um QR com id <= max_id, em lotes pelo índice (qr_code_id, ts).
+
+    Linhas com ts NULL (backfill-ts pendente) vêm no fim; o bucket usa o
+    accessed_at delas.
+    """
+    last = (-1, -1)
+    while True:
+        rows = db.execute(f"""
+          SELECT {_LOG_COLUMNS}
+          FROM qr_access_logs
+          WHERE qr_code_id = ? AND (ts, id) > (?, ?)
+          ORDER BY ts, id
+          LIMIT ?
+        """, (qr_id, last[0], last[1], chunk)).fetchall()
+        if not rows:
+            break
+        for r in rows:
+            if r[0] <= max_id:
+                yield _log_row(qr_id, r)
+        last = (rows[-1][2], rows[-1][0])
+    yield from _iter_logs_after(db, qr_id, chunk, 0, max_id, null_ts=True)
+
+
+def _iter_logs_after(db, qr_id, chunk, after_id, max_id=2**63 - 1, null_ts=False):
+    """Logs de um QR com after_id < id <= max_id (só os sem ts, com null_ts), em ordem de id."""
+    last = after_id
+    while True:
+        rows = db.execute(f"""
+          SELECT {_LOG_COLUMNS}
+          FROM qr_access_logs
+          WHERE qr_code_id = ? AND {"ts IS NULL AND " if null_ts else ""}id > ? AND id <= ?
+          ORDER BY id
+          LIMIT ?
+        """, (qr_id, last, max_id, chunk)).fetchall()
+        if not rows:
+            return
+        for r in rows:
+            yield _log_row(qr_id, r)
+        last = rows[-1][0]
+
+
+def rebuild_rollups(db, qr_ids=None, chunk=5000):
+    """Recalcula os rollups (hora, dia, UA, únicos) a partir dos logs brutos (+ arquivados).
+
+    Por QR: agrega os logs até uma marca d'água (max id) fora de transação de
+    escrita; depois, numa transação curta, soma tudo o que tem id acima da
+    marca (o write-behind pode gravar scans antigos depois de outros mais
+    novos, então o corte é por id, não por ts) e substitui as linhas. O
+    writer dos scans só espera essa última parte.
+    """
+    if qr_ids is None:
+        qr_ids = [r[0] for r in db.execute("SELECT id FROM qr_codes ORDER BY id")]
+
+    for qr_id in qr_ids:
+        watermark, missing_ts = db.execute(
+            "SELECT COALESCE(MAX(id), 0), COALESCE(SUM(ts IS NULL), 0) FROM qr_access_logs WHERE qr_code_id = ?",
+            (qr_id,),
+        ).fetchone()
+        if missing_ts:
+            log.warning("rollups do qr %s: %d log(s) sem ts, agregados pelo accessed_at "
+                        "(rode `flask db backfill-ts`)", qr_id, missing_ts)
+        archived = (_LogRow(qr_id, r[1], r[2], r[3], r[4], classify(r[4])) for r in iter_archived(db, qr_id))
+        buckets = _bucket_scans(chain(archived, _iter_logs(db, qr_id, chunk, watermark)))
+
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            tail = _iter_logs_after(db, qr_id, chunk, watermark)
+            _merge_buckets(buckets, _bucket_scans(tail))
+            for table in ("qr_scan_hourly", "qr_scan_daily", "qr_scan_ua_daily", "qr_scan_uniques_daily"):
+                db.execute(f"DELETE FROM {table} WHERE qr_code_id = ?", (qr_id,))
+            _upsert_rollups(db, *buckets)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return len(qr_ids)
+
+
+# ---------------- LEITURA ----------------
+
+def daily_series(db, qr_id, start_day: str, end_day: str, exclude_bots=False):
+    """[(dia local, scans)] entre start_day e end_day (inclusive), só dias com scans."""
+    col = "scans - bot_scans" if exclude_bots else "scans"
+    return [
+        (r[0], r[1])
+        for r in db.execute(f"""
+          SELECT day, {col} FROM qr_scan_daily
+          WHERE qr_code_id = ? AND day BETWEEN ? AND ?
+          ORDER BY day
+        """, (qr_id, start_day, end_day))
+        if r[1]
+    ]
+
+
+def hourly_series(db, qr_id, start: datetime, end: datetime, exclude_bots=False):
+    """[(hora local 'YYYY-MM-DD HH:00', scans)] para start <= hora < end."""
+    col = "scans - bot_scans" if exclude_bots else "scans"
+    rows = db.execute(f"""
+      SELECT hour, {col} FROM qr_scan_hourly
+      WHERE qr_code_id = ? AND hour >= ? AND hour < ?
+      ORDER BY hour
+    """, (qr_id, hour_bucket(start), int(end.timestamp()))).fetchall()
+    return [
+        (datetime.fromtimestamp(r[0], _tz).strftime("%Y-%m-%d %H:00"), r[1])
+        for r in rows
+        if r[1]
+    ]
+
+
+def bot_scans_total(db, qr_id) -> int:
+    """Total de scans de bots de um QR (dos rollups diários)."""
+    row = db.execute(
+        "SELECT COALESCE(SUM(bot_scans), 0) FROM qr_scan_daily WHERE qr_code_id = ?", (qr_id,)
+    ).fetchone()
+    return row[0]
+
+
+def ua_breakdown(db, qr_id, start_day: str, end_day: str, exclude_bots=False):
+    """Scans por dispositivo, SO e navegador no intervalo: {"device": [(nome, scans)], ...}."""
+    sql = """
+      SELECT device, os, browser, SUM(scans) FROM qr_scan_ua_daily
+      WHERE qr_code_id = ? AND day BETWEEN ? AND ?
+    """
+    params = [qr_id, start_day, end_day]
+    if exclude_bots:
+        sql += " AND device != ?"
+        params.append(DEVICE_BOT)
+    sql += " GROUP BY device, os, browser"
+
+    out = {"device": {}, "os": {}, "browser": {}}
+    for device, os_, browser, n in db.execute(sql, params):
+        for dim, name in zip(("device", "os", "browser"), labels(device, os_, browser)):
+            out[dim][name] = out[dim].get(name, 0) + n
+    return {dim: sorted(v.items(), key=lambda kv: -kv[1]) for dim, v in out.items()}
+
+
+def uniques(db, qr_id, start_day: str, end_day: str, group: str = "day"):
+    """Visitantes únicos aproximados (sem bots): (total do intervalo, {bucket: únicos}).
+
+    Merge dos sketches diários: por bucket (dia, semana ou mês, como regroup)
+    e do intervalo inteiro.
+    """
+    total = HLL()
+    buckets = {}
+    for day, blob in db.execute("""
+      SELECT day, sketch FROM qr_scan_uniques_daily
+      WHERE qr_code_id = ? AND day BETWEEN ? AND ?
+    """, (qr_id, start_day, end_day)):
+        sketch = HLL.from_bytes(blob)
+        key = _group_key(day, group)
+        if key in buckets:
+            buckets[key].merge(sketch)
+        else:
+            buckets[key] = sketch
+        total.merge(sketch)
+    return total.count(), {k: v.count() for k, v in buckets.items()}
+
+
+def _group_key(day: str, group: str) -> str:
+    if group == "month":
+        return day[:7]
+    if group == "week":
+        d = datetime.strptime(day, "%Y-%m-%d").date()
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return day
+
+
+def regroup(series, group: str):
+    """Reagrupa [(dia, scans)] por semana (segunda-feira) ou mês."""
+    out = {}
+    for day, n in series:
+        key = _group_key(day, group)
+        out[key] = out.get(key, 0) + n
+    return sorted(out.items())
+
+
+def rebuild_counters(db, qr_ids=None):
+    """Recalcula qr_scan_counters a partir de qr_access_logs (+ logs arquivados).
+
+    Uma transação curta por QR (usa idx_logs_qr_code_id_ts), para não travar o
+    writer dos scans durante o rebuild. Retorna quantos QRs foram recalculados.
+    """
+    if qr_ids is None:
+        qr_ids = [r[0] for r in db.execute("SELECT id FROM qr_codes ORDER BY id")]
+
+    for qr_id in qr_ids:
+        archived, archived_last = archived_totals(db, qr_id)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("""
+              INSERT OR REPLACE INTO qr_scan_counters (qr_code_id, scans, last_scan_at)
+              SELECT ?, COUNT(*) + ?, COALESCE((
+                SELECT accessed_at FROM qr_access_logs
+                WHERE qr_code_id = ? ORDER BY ts DESC, id DESC LIMIT 1
+              ), ?)
+              FROM qr_access_logs
+              WHERE qr_code_id = ?
+            """, (qr_id, archived, qr_id, archived_last, qr_id))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return len(qr_ids)
+
+
+def check_counters(db):
+    """Lista [(qr_code_id, contador, contagem real)] dos QRs divergentes."""
+    return db.execute("""
+      SELECT q.id AS qr_code_id,
+             COALESCE(c.scans, 0) AS counted,
+             COALESCE(l.n, 0) + COALESCE(a.n, 0) AS actual
+      FROM qr_codes q
+      LEFT JOIN qr_scan_counters c ON c.qr_code_id = q.id
+      LEFT JOIN (
+        SELECT qr_code_id, COUNT(*) AS n FROM qr_access_logs GROUP BY qr_code_id
+      ) l ON l.qr_code_id = q.id
+      LEFT JOIN (
+        SELECT qr_code_id, SUM(rows) AS n FROM archive_segments GROUP BY qr_code_id
+      ) a ON a.qr_code_id = q.id
+      WHERE COALESCE(c.scans, 0) != COALESCE(l.n, 0) + COALESCE(a.n, 0)
+      ORDER BY q.id
+    """).fetchall()
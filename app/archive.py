@@ -0,0 +1,188 @@
+"""Arquivamento dos scans antigos (qr_access_logs) em segmentos comprimidos.
+
+Logs com ts anterior ao corte saem do SQLite para arquivos append-only por
+mês (UTC), `scans-YYYY-MM.seg`. Cada bloco é um membro gzip independente com
+até `chunk` linhas de um único QR; a tabela archive_segments guarda onde está
+cada bloco (offset/tamanho) e o intervalo de ts, indexada por qr_code_id.
+
+Ordem de escrita: o bloco é gravado e sincronizado no arquivo antes da
+transação que insere o índice e apaga as linhas. Uma queda no meio deixa no
+máximo bytes órfãos no fim do segmento (nunca referenciados), nunca linhas
+perdidas ou duplicadas. Cada lote apaga poucas linhas numa transação curta,
+então o writer dos scans não fica esperando.
+
+Os rollups e contadores não mudam com o arquivamento; o que lê logs brutos
+(export, "últimos acessos", rebuilds) lê o arquivo + a tabela viva. Não rode
+o arquivamento junto com rebuild-counters/rebuild-rollups.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+_directory = None
+
+
+def init_app(app):
+    global _directory
+    _directory = app.config.get("SCAN_ARCHIVE_DIR") or None
+
+
+def archive_dir():
+    return _directory
+
+
+def month_of(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, timezone.utc).strftime("%Y-%m")
+
+
+def _segment_path(month: str) -> str:
+    return os.path.join(_directory, f"scans-{month}.seg")
+
+
+def _encode_block(rows) -> bytes:
+    # uma linha JSON por log: [id, accessed_at, ts, ip_address, user_agent, referer]
+    data = "".join(json.dumps(list(r), ensure_ascii=False, separators=(",", ":")) + "\n" for r in rows)
+    return gzip.compress(data.encode("utf-8"), mtime=0)
+
+
+def _append_block(month: str, block: bytes) -> int:
+    """Anexa o bloco ao segmento do mês e retorna o offset onde ele começa."""
+    import fcntl  # ver archive_scans
+
+    with open(_segment_path(month), "ab") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+    return offset
+
+
+def read_block(seg):
+    """Linhas (tuplas) de um bloco a partir da sua linha em archive_segments."""
+    with open(_segment_path(seg["month"]), "rb") as f:
+        f.seek(seg["byte_offset"])
+        data = gzip.decompress(f.read(seg["byte_length"]))
+    return [tuple(json.loads(line)) for line in data.decode("utf-8").splitlines()]
+
+
+def iter_archived(db, qr_id, start_ms=None, end_ms=None):
+    """Logs arquivados de um QR em ordem (ts, id): (id, accessed_at, ts, ip, ua, referer)."""
+    if _directory is None:
+        return
+    lo = -1 if start_ms is None else start_ms
+    hi = 2**63 - 1 if end_ms is None else end_ms
+    segs = db.execute("""
+      SELECT month, byte_offset, byte_length FROM archive_segments
+      WHERE qr_code_id = ? AND max_ts >= ? AND min_ts < ?
+      ORDER BY min_ts, id
+    """, (qr_id, lo, hi)).fetchall()
+    for seg in segs:
+        for r in read_block(seg):
+            if lo <= r[2] < hi:
+                yield r
+
+
+def last_archived(db, qr_id, n):
+    """Os n logs arquivados mais recentes de um QR (mais novo primeiro), como dicts."""
+    out = []
+    if _directory is None or n <= 0:
+        return out
+    segs = db.execute("""
+      SELECT month, byte_offset, byte_length FROM archive_segments
+      WHERE qr_code_id = ?
+      ORDER BY max_ts DESC, id DESC
+    """, (qr_id,))
+    for seg in segs:
+        rows = sorted(read_block(seg), key=lambda r: (r[2], r[0]), reverse=True)
+        for r in rows:
+            out.append({"accessed_at": r[1], "ip_address": r[3], "user_agent": r[4], "referer": r[5]})
+            if len(out) >= n:
+                return out
+    return out
+
+
+def archived_totals(db, qr_id):
+    """(linhas arquivadas, accessed_at do log arquivado mais recente) de um QR."""
+    row = db.execute("""
+      SELECT COALESCE(SUM(rows), 0),
+             (SELECT last_accessed_at FROM archive_segments
+              WHERE qr_code_id = ? ORDER BY max_ts DESC, id DESC LIMIT 1)
+      FROM archive_segments WHERE qr_code_id = ?
+    """, (qr_id, qr_id)).fetchone()
+    return row[0], row[1]
+
+
+def archive_scans(db, before_ms: int, chunk=2000, pause=0.0):
+    """Move os logs com ts < before_ms para os segmentos. Retorna (linhas, blocos)."""
+    if _directory is None:
+        raise RuntimeError("SCAN_ARCHIVE_DIR não configurado")
+    try:
+        import fcntl  # só aqui: o import do app não depende dele (Windows)
+    except ImportError:
+        raise RuntimeError("arquivamento precisa de fcntl (Linux/macOS)")
+    os.makedirs(_directory, exist_ok=True)
+
+    # um arquivamento por vez (o índice e os segmentos andam juntos)
+    lock = open(os.path.join(_directory, ".archive.lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        raise RuntimeError("outro arquivamento já está rodando")
+
+    moved = blocks = 0
+    try:
+        qr_ids = [r[0] for r in db.execute("SELECT DISTINCT qr_code_id FROM qr_access_logs ORDER BY qr_code_id")]
+        for qr_id in qr_ids:
+            while True:
+                rows = db.execute("""
+                  SELECT id, accessed_at, ts, ip_address, user_agent, referer
+                  FROM qr_access_logs
+                  WHERE qr_code_id = ? AND ts < ?
+                  ORDER BY ts, id
+                  LIMIT ?
+                """, (qr_id, before_ms, chunk)).fetchall()
+                if not rows:
+                    break
+
+                by_month = {}
+                for r in rows:
+                    by_month.setdefault(month_of(r[2]), []).append(tuple(r))
+
+                index = []
+                for month, group in by_month.items():
+                    block = _encode_block(group)
+                    offset = _append_block(month, block)
+                    index.append((month, qr_id, offset, len(block), len(group),
+                                  group[0][2], group[-1][2], group[-1][1]))
+
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    db.executemany("""
+                      INSERT INTO archive_segments
+                        (month, qr_code_id, byte_offset, byte_length, rows, min_ts, max_ts, last_accessed_at)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, index)
+                    db.execute(
+                        "DELETE FROM qr_access_logs WHERE id IN (SELECT value FROM json_each(?))",
+                        (json.dumps([r[0] for r in rows]),),
+                    )
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+
+                moved += len(rows)
+                blocks += len(index)
+                if pause:
+                    time.sleep(pause)
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+    return moved, blocks
@@ -0,0 +1,298 @@
+"""Assets estáticos: bibliotecas locais, nomes com hash e versões pré-comprimidas.
+
+Fontes em static/ (css/, js/ e vendor/, com Bootstrap, Bootstrap Icons e
+Chart.js nas versões de VENDOR). `flask assets build` (offline) copia cada
+arquivo para static/dist/ com o hash do conteúdo no nome
+(css/landing.3f2a9c1d0b7e.css), reescreve os url(...) dos CSS para os nomes
+com hash, grava .gz (e .br, se o módulo brotli estiver instalado) e o
+static/dist/manifest.json. `flask assets vendor` baixa as bibliotecas uma vez
+(precisa de rede) e grava em static/vendor/vendor.lock.json a URL (com a
+versão) e o hash SRI de cada arquivo; os arquivos e o lock vão para o
+repositório. O build falha se faltar arquivo de VENDOR ou se ele não bater
+com o lock.
+
+Nos templates, {{ asset_url('css/landing.css') }} aponta para a versão com
+hash, servida em /static/dist/ com Cache-Control immutable de um ano e
+Content-Encoding conforme o Accept-Encoding. Sem build (desenvolvimento),
+cai no /static/ normal, e biblioteca ainda não baixada cai na CDN, com um
+aviso no log do startup.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import urllib.request
+
+from flask import abort, current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só há .gz
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# caminho em static/ -> URL de origem (também o fallback enquanto não baixado)
+VENDOR = {
+    "vendor/bootstrap/css/bootstrap.min.css":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css",
+    "vendor/bootstrap/js/bootstrap.bundle.min.js":
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js",
+    "vendor/bootstrap-icons/bootstrap-icons.min.css":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/bootstrap-icons.min.css",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff2":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff2",
+    "vendor/bootstrap-icons/fonts/bootstrap-icons.woff":
+        "https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.3/font/fonts/bootstrap-icons.woff",
+    "vendor/chart.js/chart.umd.min.js":
+        "https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js",
+    # Inter (landing pages), subset latin, fonte variável 100-900
+    "vendor/inter/inter-latin-wght-normal.woff2":
+        "https://cdn.jsdelivr.net/npm/@fontsource-variable/inter@5.0.16/files/inter-latin-wght-normal.woff2",
+}
+VENDOR_LOCK = "vendor/vendor.lock.json"
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".map")
+# (Accept-Encoding, sufixo), em ordem de preferência
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_SOURCE_MAP = re.compile(rb"\n?/[/*]# sourceMappingURL=[^\n]*")
+
+
+# ---------------- BUILD ----------------
+
+def _sources(static_dir):
+    out = []
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir).replace(os.sep, "/")
+        if rel_root == DIST:
+            dirs[:] = []
+            continue
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            rel = name if rel_root == "." else f"{rel_root}/{name}"
+            if not name.startswith(".") and rel != VENDOR_LOCK:
+                out.append(rel)
+    # CSS por último: os url(...) apontam para os nomes com hash já calculados
+    return sorted(out, key=lambda p: p.endswith(".css"))
+
+
+def _hashed_name(rel, data):
+    base, ext = posixpath.splitext(rel)
+    return f"{base}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _rewrite_css(css, rel, manifest):
+    folder = posixpath.dirname(rel)
+
+    def repl(m):
+        target = m.group(2).strip()
+        if target.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return m.group(0)
+        path, _, fragment = target.partition("#")
+        resolved = posixpath.normpath(posixpath.join(folder, path.split("?", 1)[0]))
+        hashed = manifest.get(resolved)
+        if hashed is None:
+            return m.group(0)
+        new = posixpath.relpath(hashed, folder or ".")
+        return f'url("{new}{"#" + fragment if fragment else ""}")'
+
+    return _CSS_URL.sub(repl, css)
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _integrity(data) -> str:
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode("ascii")
+
+
+def _read_lock(static_dir) -> dict:
+    try:
+        with open(os.path.join(static_dir, *VENDOR_LOCK.split("/")), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def check_vendor(static_dir) -> list:
+    """Problemas dos arquivos de VENDOR (faltando, fora do lock, hash diferente)."""
+    lock = _read_lock(static_dir)
+    problems = []
+    for rel, url in VENDOR.items():
+        path = os.path.join(static_dir, *rel.split("/"))
+        entry = lock.get(rel) or {}
+        if not os.path.exists(path):
+            problems.append(f"{rel}: faltando")
+        elif entry.get("url") != url:
+            problems.append(f"{rel}: não está no {VENDOR_LOCK} com {url}")
+        else:
+            with open(path, "rb") as f:
+                if _integrity(f.read()) != entry.get("integrity"):
+                    problems.append(f"{rel}: conteúdo diferente do hash do lock")
+    return problems
+
+
+def build_assets(static_dir, clean=False) -> dict:
+    """Gera static/dist/ e o manifest; retorna {fonte: nome com hash}.
+
+    RuntimeError se as bibliotecas de VENDOR não estiverem baixadas e conferidas.
+    """
+    problems = check_vendor(static_dir)
+    if problems:
+        raise RuntimeError("bibliotecas ausentes ou alteradas (rode `flask assets vendor`):\n  "
+                           + "\n  ".join(problems))
+    dist = os.path.join(static_dir, DIST)
+    manifest = {}
+    written = {MANIFEST}
+    for rel in _sources(static_dir):
+        with open(os.path.join(static_dir, rel), "rb") as f:
+            data = f.read()
+        if rel.endswith((".css", ".js")):
+            data = _SOURCE_MAP.sub(b"", data)  # os .map não são copiados
+        if rel.endswith(".css"):
+            data = _rewrite_css(data.decode("utf-8"), rel, manifest).encode("utf-8")
+        hashed = manifest[rel] = _hashed_name(rel, data)
+        target = os.path.join(dist, hashed)
+        written.add(hashed)
+        if not os.path.exists(target):  # mesmo nome = mesmo conteúdo
+            _write(target, data)
+        if not rel.endswith(COMPRESSIBLE):
+            continue
+        variants = [(".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+        for suffix, compress in variants:
+            if os.path.exists(target + suffix):
+                written.add(hashed + suffix)
+                continue
+            packed = compress(data)
+            if len(packed) < len(data):
+                _write(target + suffix, packed)
+                written.add(hashed + suffix)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
+    if clean:
+        for root, _, files in os.walk(dist):
+            for name in files:
+                rel = os.path.relpath(os.path.join(root, name), dist).replace(os.sep, "/")
+                if rel not in written:
+                    os.unlink(os.path.join(root, name))
+    return manifest
+
+
+def download_vendor(static_dir, force=False):
+    """Baixa as bibliotecas de VENDOR para static/ e atualiza o lock; retorna os caminhos gravados.
+
+    Se o lock já tem o hash da mesma URL (lock versionado), o download tem que
+    bater com ele (RuntimeError se não bater).
+    """
+    lock = _read_lock(static_dir)
+    done = []
+    for rel, url in VENDOR.items():
+        path = os.path.join(static_dir, *rel.split("/"))
+        if os.path.exists(path) and lock.get(rel, {}).get("url") == url and not force:
+            continue
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            data = resp.read()
+        integrity = _integrity(data)
+        pinned = lock.get(rel) or {}
+        if pinned.get("url") == url and pinned.get("integrity") not in (None, integrity):
+            raise RuntimeError(f"{rel}: {url} não bate com o hash do {VENDOR_LOCK}")
+        _write(path, data)
+        lock[rel] = {"url": url, "integrity": integrity}
+        done.append(rel)
+    lock = {rel: lock[rel] for rel in VENDOR if rel in lock}
+    _write(os.path.join(static_dir, *VENDOR_LOCK.split("/")),
+           (json.dumps(lock, indent=1, sort_keys=True) + "\n").encode("utf-8"))
+    return done
+
+
+# ---------------- SERVIR ----------------
+
+class Assets:
+    def __init__(self, static_dir, reload=False):
+        self.static_dir = static_dir
+        self.dist = os.path.join(static_dir, DIST)
+        self.reload = reload
+        self.mtime = None
+        self.manifest = {}
+        self.encodings = {}  # nome com hash -> [(encoding, sufixo), ...] existentes
+        self.load()
+
+    def load(self):
+        path = os.path.join(self.dist, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.mtime, self.manifest, self.encodings = None, {}, {}
+            return
+        if mtime == self.mtime:
+            return
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.encodings = {
+            hashed: [(enc, sfx) for enc, sfx in ENCODINGS if os.path.exists(os.path.join(self.dist, hashed + sfx))]
+            for hashed in manifest.values()
+        }
+        self.manifest = manifest
+        self.mtime = mtime
+
+    def url(self, rel):
+        if self.reload:
+            self.load()
+        hashed = self.manifest.get(rel)
+        if hashed is not None:
+            return url_for("assets", filename=hashed)
+        if rel in VENDOR and not os.path.exists(os.path.join(self.static_dir, *rel.split("/"))):
+            return VENDOR[rel]
+        return url_for("static", filename=rel)
+
+
+def asset_url(rel) -> str:
+    """URL de um arquivo de static/ (nome com hash depois do `flask assets build`)."""
+    return current_app.extensions["assets"].url(rel)
+
+
+def serve_asset(filename):
+    assets = current_app.extensions["assets"]
+    if assets.reload:
+        assets.load()
+    variants = assets.encodings.get(filename)
+    if variants is None:
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    accepted = request.accept_encodings
+    encoding, suffix = next(((enc, sfx) for enc, sfx in variants if accepted[enc]), (None, ""))
+    response = send_from_directory(assets.dist, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if variants:
+        response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    assets = app.extensions["assets"] = Assets(app.static_folder, reload=app.debug)
+    missing = [rel for rel in VENDOR if rel not in assets.manifest
+               and not os.path.exists(os.path.join(app.static_folder, *rel.split("/")))]
+    if missing:
+        log.warning("assets: %d arquivo(s) de static/vendor/ faltando, servidos pela CDN até "
+                    "rodar `flask assets vendor`: %s", len(missing), ", ".join(missing))
+    app.add_url_rule(f"{app.static_url_path}/{DIST}/<path:filename>", endpoint="assets", view_func=serve_asset)
+    app.jinja_env.globals["asset_url"] = asset_url
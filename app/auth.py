@@ -6,31 +6,39 @@
 #         self.email = email
 
 
+from collections import namedtuple
 from functools import wraps
 from flask import abort
 from flask_login import UserMixin, current_user
 
+# Só o que a sessão usa (cacheável entre requests, ver app/usercache.py)
+UserRecord = namedtuple("UserRecord", "id email name role is_active")
+
 class DBUser(UserMixin):
-    def __init__(self, row):
-        # row é sqlite3.Row
-        self._row = row
-        self.id = str(row["id"])  # Flask-Login usa string
+    def __init__(self, record):
+        self._record = record
+        self.id = str(record.id)  # Flask-Login usa string
+
+    @classmethod
+    def from_row(cls, row):
+        # row é sqlite3.Row de users
+        return cls(UserRecord(row["id"], row["email"], row["name"], row["role"], bool(row["is_active"])))
 
     @property
     def email(self):
-        return self._row["email"]
+        return self._record.email
 
     @property
     def name(self):
-        return self._row["name"]
+        return self._record.name
 
     @property
     def role(self):
-        return self._row["role"]
+        return self._record.role
 
     @property
     def is_active_flag(self):
-        return bool(self._row["is_active"])
+        return bool(self._record.is_active)
 
     def is_active(self):
         return self.is_active_flag
@@ -0,0 +1,215 @@
+"""Comandos `flask ...` (rodar com FLASK_APP=wsgi ou a partir da raiz do projeto)."""
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .db import (
+    get_db, upgrade_db, bootstrap_admin, schema_version, latest_schema_version, MIGRATIONS,
+    backfill_access_logs_ts, reclassify_bot_scans,
+)
+from .aggregates import rebuild_counters, check_counters, rebuild_rollups, stats_timezone
+from .qrimage import prune_disk_cache, get_image_cache, parse_options
+from .qrexport import select_qrs, iter_zip
+from .logexport import day_range_ms, iter_export
+from .archive import archive_scans, archive_dir
+from .assets import build_assets, download_vendor
+
+db_cli = AppGroup("db", help="Banco SQLite: migrações de schema.")
+scans_cli = AppGroup("scans", help="Scans: agregados derivados de qr_access_logs.")
+qr_cli = AppGroup("qr", help="QRs: imagens e cache de imagens.")
+assets_cli = AppGroup("assets", help="Assets estáticos: bibliotecas locais e build com hash.")
+
+
+@db_cli.command("upgrade")
+def db_upgrade():
+    """Aplica as migrações pendentes e garante o admin do .env."""
+    db = get_db()
+    applied = upgrade_db(db)
+    for version, name in applied:
+        click.echo(f"  {version:>3}  {name}")
+    bootstrap_admin(db)
+    click.echo(f"schema na versão {schema_version(db)} ({len(applied)} migração(ões) aplicada(s)).")
+
+
+@db_cli.command("status")
+def db_status():
+    """Mostra a versão aplicada e as migrações pendentes."""
+    current = schema_version(get_db())
+    click.echo(f"versão aplicada: {current} / mais recente: {latest_schema_version()}")
+    for version, name, _ in MIGRATIONS:
+        mark = "x" if version <= current else " "
+        click.echo(f"  [{mark}] {version:>3}  {name}")
+
+
+@db_cli.command("backfill-ts")
+@click.option("--chunk", default=5000, show_default=True, help="Linhas por transação.")
+def db_backfill_ts(chunk):
+    """Preenche qr_access_logs.ts (epoch ms) onde ainda está NULL."""
+    n = backfill_access_logs_ts(get_db(), chunk)
+    click.echo(f"{n} linha(s) preenchida(s).")
+
+
+@scans_cli.command("rebuild-counters")
+@click.option("--qr-id", "qr_ids", type=int, multiple=True, help="Só estes QRs (repetível).")
+def scans_rebuild_counters(qr_ids):
+    """Recalcula qr_scan_counters a partir dos logs."""
+    n = rebuild_counters(get_db(), list(qr_ids) or None)
+    click.echo(f"{n} contador(es) recalculado(s).")
+
+
+@scans_cli.command("check-counters")
+@click.option("--fix", is_flag=True, help="Recalcula os QRs divergentes.")
+def scans_check_counters(fix):
+    """Compara qr_scan_counters com COUNT(*) dos logs (exit 1 se divergir)."""
+    db = get_db()
+    bad = check_counters(db)
+    for r in bad:
+        click.echo(f"  qr {r['qr_code_id']}: contador={r['counted']} logs={r['actual']}")
+    if not bad:
+        click.echo("contadores consistentes.")
+        return
+    if fix:
+        rebuild_counters(db, [r["qr_code_id"] for r in bad])
+        click.echo(f"{len(bad)} contador(es) corrigido(s).")
+        return
+    raise SystemExit(1)
+
+
+@scans_cli.command("rebuild-rollups")
+@click.option("--qr-id", "qr_ids", type=int, multiple=True, help="Só estes QRs (repetível).")
+def scans_rebuild_rollups(qr_ids):
+    """Recalcula os rollups por hora/dia (ex.: depois de mudar STATS_TIMEZONE)."""
+    n = rebuild_rollups(get_db(), list(qr_ids) or None)
+    click.echo(f"rollups de {n} QR(s) recalculados.")
+
+
+@scans_cli.command("reclassify-bots")
+@click.option("--chunk", default=5000, show_default=True, help="Linhas por transação.")
+def scans_reclassify_bots(chunk):
+    """Reclassifica os scans marcados como bot (ex.: depois de corrigir o parser de UA)."""
+    n = reclassify_bot_scans(get_db(), chunk)
+    click.echo(f"{n} scan(s) deixaram de ser bot.")
+
+
+@scans_cli.command("export")
+@click.argument("output", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option("--qr-id", "qr_ids", type=int, multiple=True, help="Só estes QRs (repetível).")
+@click.option("--owner", "owner_email", default=None, help="Todos os QRs deste usuário (e-mail).")
+@click.option("--start", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Primeiro dia (fuso STATS_TIMEZONE).")
+@click.option("--end", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Último dia (inclusivo).")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option("--gzip", "gz", is_flag=True, help="Comprime a saída (gzip).")
+def scans_export(output, qr_ids, owner_email, start, end, fmt, gz):
+    """Exporta os scans brutos em CSV/NDJSON ('-' = stdout)."""
+    db = get_db()
+    owner_id = None
+    if owner_email:
+        row = db.execute("SELECT id FROM users WHERE email = ?", (owner_email.strip().lower(),)).fetchone()
+        if not row:
+            raise click.ClickException(f"usuário não encontrado: {owner_email}")
+        owner_id = row[0]
+
+    qrs = select_qrs(db, ids=list(qr_ids), owner_id=owner_id)
+    start_ms, end_ms = day_range_ms(start and start.date(), end and end.date(), stats_timezone())
+    body = iter_export(db, qrs, fmt, start_ms, end_ms,
+                       chunk=current_app.config["SCAN_EXPORT_CHUNK"], gzip=gz)
+    with click.open_file(output, "wb") as f:
+        for chunk in body:
+            f.write(chunk)
+    if output != "-":
+        click.echo(f"scans de {len(qrs)} QR(s) exportados em {output}.")
+
+
+@scans_cli.command("archive")
+@click.option("--days", type=int, default=None, help="Arquiva logs mais velhos que N dias (padrão: SCAN_ARCHIVE_AFTER_DAYS).")
+@click.option("--chunk", type=int, default=None, help="Linhas por lote/transação (padrão: SCAN_ARCHIVE_CHUNK).")
+@click.option("--pause", type=float, default=0.05, show_default=True, help="Pausa entre lotes (segundos).")
+def scans_archive(days, chunk, pause):
+    """Move logs antigos de qr_access_logs para os segmentos comprimidos."""
+    days = current_app.config["SCAN_ARCHIVE_AFTER_DAYS"] if days is None else days
+    chunk = chunk or current_app.config["SCAN_ARCHIVE_CHUNK"]
+    before_ms = int((time.time() - days * 86400) * 1000)
+    try:
+        moved, blocks = archive_scans(get_db(), before_ms, chunk=chunk, pause=pause)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{moved} log(s) arquivado(s) em {blocks} bloco(s) ({archive_dir()}).")
+
+
+@qr_cli.command("prune-cache")
+@click.option("--days", default=30, show_default=True, help="Remove imagens mais velhas que N dias.")
+def qr_prune_cache(days):
+    """Limpa o cache em disco das imagens (ex.: depois de trocar BASE_URL)."""
+    n = prune_disk_cache(current_app.config.get("QR_IMAGE_CACHE_DIR"), days * 86400)
+    click.echo(f"{n} arquivo(s) removido(s).")
+
+
+@qr_cli.command("export-zip")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--owner", "owner_email", default=None, help="Só os QRs deste usuário (e-mail).")
+@click.option("--status", type=click.Choice(["active", "inactive"]), default=None)
+@click.option("--id", "ids", type=int, multiple=True, help="IDs específicos (repetível).")
+@click.option("--workers", type=int, default=None, help="Processos de renderização (padrão: QR_RENDER_WORKERS).")
+@click.option("--format", "fmt", type=click.Choice(["png", "svg"]), default="png", show_default=True)
+@click.option("--size", type=int, default=None, help="Pixels (PNG) / unidades (SVG) por módulo.")
+@click.option("--border", type=int, default=None, help="Quiet zone em módulos.")
+@click.option("--ecc", type=click.Choice(["L", "M", "Q", "H"]), default=None, help="Correção de erro.")
+def qr_export_zip(output, owner_email, status, ids, workers, fmt, size, border, ecc):
+    """Gera um ZIP com a imagem (PNG/SVG) de cada QR selecionado."""
+    args = {k: v for k, v in {"size": size, "border": border, "ecc": ecc}.items() if v is not None}
+    try:
+        opts = parse_options(args, fmt=fmt)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    db = get_db()
+    owner_id = None
+    if owner_email:
+        row = db.execute("SELECT id FROM users WHERE email = ?", (owner_email.strip().lower(),)).fetchone()
+        if not row:
+            raise click.ClickException(f"usuário não encontrado: {owner_email}")
+        owner_id = row[0]
+
+    items = select_qrs(db, ids=list(ids), status=status, owner_id=owner_id)
+    if workers is None:
+        workers = current_app.config["QR_RENDER_WORKERS"]
+    base_url = current_app.config["BASE_URL"].rstrip("/")
+    with open(output, "wb") as f:
+        for chunk in iter_zip(items, base_url, get_image_cache(), workers, opts):
+            f.write(chunk)
+    click.echo(f"{len(items)} QR(s) exportado(s) em {output}.")
+
+
+@assets_cli.command("build")
+@click.option("--clean", is_flag=True, help="Remove de static/dist/ os arquivos de builds anteriores.")
+def assets_build(clean):
+    """Gera static/dist/ (nomes com hash, .gz/.br) e o manifest. Não usa rede."""
+    try:
+        manifest = build_assets(current_app.static_folder, clean=clean)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{len(manifest)} arquivo(s) em {current_app.static_folder}/dist.")
+
+
+@assets_cli.command("vendor")
+@click.option("--force", is_flag=True, help="Baixa de novo mesmo se o arquivo já existir.")
+def assets_vendor(force):
+    """Baixa Bootstrap, Bootstrap Icons, Chart.js e Inter para static/vendor/ (precisa de rede)."""
+    try:
+        done = download_vendor(current_app.static_folder, force=force)
+    except OSError as e:
+        raise click.ClickException(f"falha no download: {e}")
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for rel in done:
+        click.echo(f"  {rel}")
+    click.echo(f"{len(done)} arquivo(s) baixado(s).")
+
+
+def init_app(app):
+    app.cli.add_command(db_cli)
+    app.cli.add_command(scans_cli)
+    app.cli.add_command(qr_cli)
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,118 @@
+"""Compressão das respostas do Flask (gzip/brotli negociado pelo Accept-Encoding).
+
+Um after_request comprime HTML, JSON, CSV, SVG etc. acima de
+COMPRESS_MIN_SIZE bytes: corpo pronto de uma vez, resposta em streaming
+(export de scans, send_file) chunk a chunk, sem Content-Length. Brotli só se
+o módulo brotli estiver instalado. Fica de fora o que já vem comprimido ou
+não ganha nada: /r/<code>, PNG, ZIP, .gz, respostas com Content-Encoding
+(landing pages, /static/dist/), Range e Cache-Control: no-transform.
+
+Respostas comprimíveis levam Vary: Accept-Encoding, e um ETag forte vira
+fraco (W/"..."): o corpo muda com a codificação, o recurso não; quem compara
+If-None-Match usa a comparação fraca.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele só gzip
+    brotli = None
+
+MIMETYPES = frozenset((
+    "text/html", "text/css", "text/plain", "text/csv", "text/javascript", "text/xml",
+    "application/json", "application/javascript", "application/x-ndjson", "application/xml",
+    "image/svg+xml",
+))
+SKIP_PREFIXES = ("/r/",)
+
+
+def _gzip_stream(chunks, level):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def _br_stream(chunks, quality):
+    c = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        out = c.process(chunk)
+        if out:
+            yield out
+    yield c.finish()
+
+
+def _closing(gen, source):
+    """Repassa o close() para o iterável original (fecha conexão, arquivo...)."""
+    try:
+        yield from gen
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+
+class Compressor:
+    def __init__(self, level=6, br_level=4, min_size=500):
+        self.level = level
+        self.br_level = br_level
+        self.min_size = min_size
+        self.encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+
+    def eligible(self, response) -> bool:
+        return (
+            response.mimetype in MIMETYPES
+            and 200 <= response.status_code < 300 and response.status_code not in (204, 206)
+            and "Content-Encoding" not in response.headers
+            and "Content-Range" not in response.headers
+            and not response.cache_control.no_transform
+            and not request.path.startswith(SKIP_PREFIXES)
+        )
+
+    def compress(self, data, encoding) -> bytes:
+        if encoding == "br":
+            return brotli.compress(data, quality=self.br_level)
+        z = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return z.compress(data) + z.flush()
+
+    def after_request(self, response):
+        if not self.eligible(response):
+            return response
+        streamed = response.is_streamed or response.direct_passthrough
+        length = response.content_length if streamed else len(response.get_data())
+        if length is not None and length < self.min_size:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if streamed:
+            source = response.response
+            stream = _br_stream if encoding == "br" else _gzip_stream
+            level = self.br_level if encoding == "br" else self.level
+            response.response = _closing(stream(source, level), source)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(self.compress(response.get_data(), encoding))
+        response.headers["Content-Encoding"] = encoding
+        tag, weak = response.get_etag()
+        if tag and not weak:
+            response.set_etag(tag, weak=True)
+        return response
+
+
+def init_app(app):
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+    compressor = app.extensions["compress"] = Compressor(
+        level=app.config["COMPRESS_LEVEL"],
+        br_level=app.config["COMPRESS_BR_LEVEL"],
+        min_size=app.config["COMPRESS_MIN_SIZE"],
+    )
+    app.after_request(compressor.after_request)
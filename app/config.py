@@ -4,6 +4,21 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def _env_int_or_none(name: str):
+    v = os.getenv(name)
+    if v is None or v.strip() == "":
+        return None
+    return int(v)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None or v.strip() == "":
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+
 class Config:
     # Segurança
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
@@ -13,6 +28,18 @@ class Config:
         "DB_PATH",
         str(BASE_DIR / "data" / "app.db")  # local
     )
+    # Aplica migrações pendentes no startup (senão só avisa: `flask db upgrade`)
+    DB_AUTO_UPGRADE = _env_bool("DB_AUTO_UPGRADE", True)
+
+    # Conexões persistentes (uma por thread/worker) e PRAGMAs
+    DB_JOURNAL_MODE = os.getenv("DB_JOURNAL_MODE", "WAL")
+    DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+    DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+    # Dashboard/stats usam uma conexão separada, aberta com mode=ro
+    DB_READ_ONLY_CONNECTIONS = _env_bool("DB_READ_ONLY_CONNECTIONS", True)
 
     # URL base (QR / redirects)
     BASE_URL = os.getenv(
@@ -23,3 +50,102 @@ class Config:
     # Bootstrap admin (MVP)
     ADMIN_EMAIL = os.getenv("ADMIN_EMAIL", "")
     ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "")
+
+    # Imagens dos QRs: cache LRU em memória + disco (chave = hash do conteúdo)
+    QR_IMAGE_CACHE_DIR = os.getenv("QR_IMAGE_CACHE_DIR", str(BASE_DIR / "data" / "qr_cache"))
+    QR_IMAGE_CACHE_MEMORY_BYTES = int(os.getenv("QR_IMAGE_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+    QR_IMAGE_MAX_AGE = int(os.getenv("QR_IMAGE_MAX_AGE", "86400"))  # Cache-Control (segundos)
+    # Export em ZIP: processos de renderização (0 = renderiza no próprio worker)
+    QR_RENDER_WORKERS = int(os.getenv("QR_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+    QR_EXPORT_MAX_ITEMS = int(os.getenv("QR_EXPORT_MAX_ITEMS", "5000"))
+
+    # Dashboard: QRs por página (paginação keyset; próximas páginas via /api/qrs)
+    DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "50"))
+
+    # Export dos scans brutos (CSV/NDJSON): linhas por lote lido do banco
+    SCAN_EXPORT_CHUNK = int(os.getenv("SCAN_EXPORT_CHUNK", "5000"))
+
+    # Arquivamento dos scans antigos (`flask scans archive`): segmentos gzip por mês
+    SCAN_ARCHIVE_DIR = os.getenv("SCAN_ARCHIVE_DIR", str(BASE_DIR / "data" / "archive"))
+    SCAN_ARCHIVE_AFTER_DAYS = int(os.getenv("SCAN_ARCHIVE_AFTER_DAYS", "180"))
+    SCAN_ARCHIVE_CHUNK = int(os.getenv("SCAN_ARCHIVE_CHUNK", "2000"))
+
+    # Métricas Prometheus (/metrics): snapshots por processo somados na leitura.
+    # Acesso: admin logado ou "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+    METRICS_DIR = os.getenv("METRICS_DIR", str(BASE_DIR / "data" / "metrics"))
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # segundos
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+    # Trace das queries (opt-in): Server-Timing em cada resposta e log das
+    # queries lentas com EXPLAIN QUERY PLAN; SQL_TRACE_ALL loga todas (DEBUG)
+    SQL_TRACE = _env_bool("SQL_TRACE", False)
+    SQL_TRACE_ALL = _env_bool("SQL_TRACE_ALL", False)
+    SQL_SLOW_MS = float(os.getenv("SQL_SLOW_MS", "100"))
+    SQL_SLOW_LOG = os.getenv("SQL_SLOW_LOG", "")  # vazio: só o logging padrão (stderr)
+
+    # Fuso dos gráficos de stats (buckets diários; os logs brutos ficam em UTC)
+    STATS_TIMEZONE = os.getenv("STATS_TIMEZONE", "America/Sao_Paulo")
+
+    # Gravação dos scans do /r/<code>
+    # "async": write-behind (fila em memória + thread que grava em lotes)
+    # "sync": INSERT + commit dentro do próprio request
+    SCAN_LOG_MODE = os.getenv("SCAN_LOG_MODE", "async").strip().lower()
+    SCAN_LOG_BATCH_SIZE = int(os.getenv("SCAN_LOG_BATCH_SIZE", "200"))
+    SCAN_LOG_FLUSH_INTERVAL = float(os.getenv("SCAN_LOG_FLUSH_INTERVAL", "0.5"))  # segundos
+    SCAN_LOG_MAX_QUEUE = int(os.getenv("SCAN_LOG_MAX_QUEUE", "10000"))
+    SCAN_LOG_DRAIN_ON_SHUTDOWN = _env_bool("SCAN_LOG_DRAIN_ON_SHUTDOWN", True)
+    SCAN_LOG_SHUTDOWN_TIMEOUT = float(os.getenv("SCAN_LOG_SHUTDOWN_TIMEOUT", "10"))  # segundos
+
+    # Hits repetidos do mesmo (QR, IP, user-agent) dentro da janela só contam,
+    # sem gravar linha (0 = desliga). Memória: até 2 * MAX_KEYS chaves por worker.
+    SCAN_DEDUP_WINDOW = float(os.getenv("SCAN_DEDUP_WINDOW", "10"))  # segundos
+    SCAN_DEDUP_MAX_KEYS = int(os.getenv("SCAN_DEDUP_MAX_KEYS", "50000"))
+
+    # Rate limit do /r/<code> (token bucket em memória). Taxas em hits/s e
+    # bursts são totais do servidor; cada worker fica com 1/RATE_LIMIT_WORKERS.
+    # Acima do limite: "skip_log" (redireciona sem gravar o scan) ou "429".
+    RATE_LIMIT_ENABLED = _env_bool("RATE_LIMIT_ENABLED", True)
+    RATE_LIMIT_ACTION = os.getenv("RATE_LIMIT_ACTION", "skip_log").strip().lower()
+    RATE_LIMIT_CODE_RATE = float(os.getenv("RATE_LIMIT_CODE_RATE", "1"))   # por (IP, código)
+    RATE_LIMIT_CODE_BURST = float(os.getenv("RATE_LIMIT_CODE_BURST", "10"))
+    RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "5"))       # por IP
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "30"))
+    RATE_LIMIT_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", "500"))
+    RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "1000"))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_WORKERS = int(os.getenv("RATE_LIMIT_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+
+    # Proxies confiáveis na frente do app (IP dos logs, dedup e rate limit).
+    # Vazio (padrão): primeiro endereço do X-Forwarded-For, como sempre foi.
+    # N: o N-ésimo a partir da direita, que o cliente não consegue forjar; no
+    # Azure App Service (um front-end, que acrescenta o IP de quem conectou)
+    # seria 1, depois de conferir o header real em produção. 0 = ignora o header.
+    TRUSTED_PROXY_HOPS = _env_int_or_none("TRUSTED_PROXY_HOPS")
+
+    # Compressão das respostas do Flask (app/compress.py): gzip, ou brotli se instalado
+    COMPRESS_ENABLED = _env_bool("COMPRESS_ENABLED", True)
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))         # gzip, 1-9
+    COMPRESS_BR_LEVEL = int(os.getenv("COMPRESS_BR_LEVEL", "4"))   # brotli, 0-11
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "500"))  # bytes
+
+    # land/landing/landing_new renderizadas uma vez no startup (bytes + gzip + ETag)
+    PRERENDER_PAGES = _env_bool("PRERENDER_PAGES", True)
+
+    # /r/<code> atendido por um handler WSGI enxuto na frente do Flask (wsgi.py)
+    REDIRECT_FAST_PATH = _env_bool("REDIRECT_FAST_PATH", True)
+
+    # Cache code -> (id, status, current_url) usado pelo redirect
+    QR_CACHE_ENABLED = _env_bool("QR_CACHE_ENABLED", True)
+    QR_CACHE_MAXSIZE = int(os.getenv("QR_CACHE_MAXSIZE", "10000"))
+    QR_CACHE_TTL = float(os.getenv("QR_CACHE_TTL", "60"))  # segundos
+    QR_CACHE_NEGATIVE_TTL = float(os.getenv("QR_CACHE_NEGATIVE_TTL", "10"))  # códigos inexistentes
+    # De quanto em quanto tempo conferir cache_versions (coerência entre workers)
+    QR_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("QR_CACHE_VERSION_CHECK_INTERVAL", "1"))
+
+    # Cache dos usuários logados (user_loader): registro compacto por id, por worker.
+    # Desativar um usuário vale em todos os workers em até VERSION_CHECK_INTERVAL.
+    USER_CACHE_ENABLED = _env_bool("USER_CACHE_ENABLED", True)
+    USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "1000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))  # segundos
+    USER_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("USER_CACHE_VERSION_CHECK_INTERVAL", "1"))
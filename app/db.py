@@ -1,19 +1,133 @@
+import logging
+import os
 import sqlite3
+import threading
+from urllib.request import pathname2url
+
 from flask import g, current_app
-from werkzeug.security import generate_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class ConnectionManager:
+    """Conexões SQLite persistentes e afinadas, uma por thread (e por processo).
+
+    Evita o connect() a cada request. Conexões nunca atravessam um fork: no
+    filho (gunicorn --preload) as herdadas do master são abandonadas sem
+    close() e novas são abertas sob demanda.
+    """
+
+    def __init__(self, path, journal_mode="WAL", synchronous="NORMAL", busy_timeout_ms=5000,
+                 cache_size_kb=16384, mmap_size=134217728, cached_statements=256):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+        # classe das conexões (metrics.init_app troca pela instrumentada)
+        self.factory = sqlite3.Connection
+
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._orphans = []
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config["DB_PATH"],
+            journal_mode=config.get("DB_JOURNAL_MODE", "WAL"),
+            synchronous=config.get("DB_SYNCHRONOUS", "NORMAL"),
+            busy_timeout_ms=config.get("DB_BUSY_TIMEOUT_MS", 5000),
+            cache_size_kb=config.get("DB_CACHE_SIZE_KB", 16384),
+            mmap_size=config.get("DB_MMAP_SIZE", 134217728),
+            cached_statements=config.get("DB_STATEMENT_CACHE", 256),
+        )
+
+    def connect(self, readonly: bool = False):
+        """Abre uma conexão nova (não gerenciada) já com os PRAGMAs aplicados."""
+        if readonly:
+            target, uri = f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro", True
+        else:
+            target, uri = self.path, False
+        conn = sqlite3.connect(
+            target,
+            uri=uri,
+            timeout=self.busy_timeout_ms / 1000.0,
+            cached_statements=self.cached_statements,
+            factory=self.factory,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not readonly and self.journal_mode:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        if self.synchronous:
+            conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        if self.cache_size_kb:
+            conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        if self.mmap_size is not None:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    def connection(self, readonly: bool = False):
+        """Conexão persistente da thread atual (leitura/escrita ou somente leitura)."""
+        if self._pid != os.getpid():
+            self._after_fork()
+        attr = "ro" if readonly else "rw"
+        conn = getattr(self._local, attr, None)
+        if conn is None:
+            conn = self.connect(readonly)
+            setattr(self._local, attr, conn)
+        return conn
+
+    def close_thread(self):
+        """Fecha as conexões da thread atual (ex.: master antes do fork)."""
+        for attr in ("rw", "ro"):
+            conn = getattr(self._local, attr, None)
+            if conn is not None:
+                setattr(self._local, attr, None)
+                if self._pid == os.getpid():
+                    conn.close()
+
+    def _after_fork(self):
+        # Não fechar conexões herdadas do pai: só guardamos a referência.
+        for attr in ("rw", "ro"):
+            conn = getattr(self._local, attr, None)
+            if conn is not None:
+                self._orphans.append(conn)
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+
+def init_app(app):
+    app.extensions["db"] = ConnectionManager.from_config(app.config)
+    app.teardown_appcontext(close_db)
 
 
 def get_db():
     if "db" not in g:
-        g.db = sqlite3.connect(current_app.config["DB_PATH"])
-        g.db.row_factory = sqlite3.Row
+        g.db = current_app.extensions["db"].connection()
     return g.db
 
 
+def get_read_db():
+    """Conexão somente leitura (dashboard, stats)."""
+    if not current_app.config.get("DB_READ_ONLY_CONNECTIONS", True):
+        return get_db()
+    if "read_db" not in g:
+        g.read_db = current_app.extensions["db"].connection(readonly=True)
+    return g.read_db
+
+
 def close_db(_=None):
-    db = g.pop("db", None)
-    if db:
-        db.close()
+    # As conexões são persistentes: só garantimos que nenhuma transação
+    # aberta vaze para o próximo request.
+    for key in ("db", "read_db"):
+        db = g.pop(key, None)
+        if db is not None and db.in_transaction:
+            db.rollback()
 
 
 def _table_exists(db, table: str) -> bool:
@@ -32,11 +146,12 @@ def _column_exists(db, table: str, col: str) -> bool:
     return any(r["name"] == col for r in rows)
 
 
-def init_db():
-    db = get_db()
+# ---------------- MIGRAÇÕES ----------------
+# Cada passo roda uma única vez, em ordem, dentro de BEGIN IMMEDIATE (serializa
+# workers subindo ao mesmo tempo). A versão aplicada fica em schema_version.
 
-    # 1) Cria tabelas BASE (sem assumir owner_user_id já existente)
-    db.executescript("""
+def _m001_base_tables(db):
+    db.execute("""
     CREATE TABLE IF NOT EXISTS users (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
       name TEXT,
@@ -45,9 +160,10 @@ def init_db():
       role TEXT NOT NULL DEFAULT 'user',
       is_active INTEGER NOT NULL DEFAULT 1,
       created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    );
-    CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
 
+    db.execute("""
     CREATE TABLE IF NOT EXISTS qr_codes (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
       code TEXT UNIQUE NOT NULL,
@@ -56,9 +172,10 @@ def init_db():
       description TEXT,
       created_at TEXT NOT NULL,
       updated_at TEXT NOT NULL
-    );
-    CREATE INDEX IF NOT EXISTS idx_qr_codes_code ON qr_codes(code);
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_code ON qr_codes(code)")
 
+    db.execute("""
     CREATE TABLE IF NOT EXISTS qr_access_logs (
       id INTEGER PRIMARY KEY AUTOINCREMENT,
       qr_code_id INTEGER NOT NULL,
@@ -67,58 +184,434 @@ def init_db():
       user_agent TEXT,
       referer TEXT,
       FOREIGN KEY(qr_code_id) REFERENCES qr_codes(id)
-    );
-    CREATE INDEX IF NOT EXISTS idx_logs_qr_code_id ON qr_access_logs(qr_code_id);
-    """)
-    db.commit()
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_logs_qr_code_id ON qr_access_logs(qr_code_id)")
+
 
-    # 2) Migração segura: adiciona owner_user_id se não existir
+def _m002_owner_user_id(db):
+    # bancos criados pelo init_db antigo já podem ter a coluna
     if not _column_exists(db, "qr_codes", "owner_user_id"):
-        try:
-            db.execute("ALTER TABLE qr_codes ADD COLUMN owner_user_id INTEGER")
-            db.commit()
-        except Exception:
-            # Se já existe (condição de corrida), ignora
-            pass
+        db.execute("ALTER TABLE qr_codes ADD COLUMN owner_user_id INTEGER")
 
-    # 3) Índice do owner_user_id (só agora, com coluna garantida)
-    try:
-        db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_owner_user_id ON qr_codes(owner_user_id)")
+
+def _m003_owner_user_id_index(db):
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_owner_user_id ON qr_codes(owner_user_id)")
+
+
+def _m004_cache_versions(db):
+    # Versão por "assunto" para invalidar caches em memória entre workers
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS cache_versions (
+      name TEXT PRIMARY KEY,
+      version INTEGER NOT NULL DEFAULT 0
+    )""")
+    db.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('qr_codes', 0)")
+
+    bump = "UPDATE cache_versions SET version = version + 1 WHERE name = 'qr_codes';"
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_qr_codes_version_ins AFTER INSERT ON qr_codes
+    BEGIN {bump} END""")
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_qr_codes_version_upd
+    AFTER UPDATE OF code, current_url, status ON qr_codes
+    BEGIN {bump} END""")
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_qr_codes_version_del AFTER DELETE ON qr_codes
+    BEGIN {bump} END""")
+
+
+def _m005_scan_counters(db):
+    # Contador de scans por QR, atualizado na mesma transação da ingestão
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_counters (
+      qr_code_id INTEGER PRIMARY KEY,
+      scans INTEGER NOT NULL DEFAULT 0,
+      last_scan_at TEXT,
+      FOREIGN KEY(qr_code_id) REFERENCES qr_codes(id)
+    )""")
+    db.execute("""
+    INSERT OR REPLACE INTO qr_scan_counters (qr_code_id, scans, last_scan_at)
+    SELECT q.id, COUNT(l.id), MAX(l.accessed_at)
+    FROM qr_codes q
+    LEFT JOIN qr_access_logs l ON l.qr_code_id = q.id
+    GROUP BY q.id""")
+    # todo QR novo nasce com contador zerado
+    db.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_qr_codes_counter_ins AFTER INSERT ON qr_codes
+    BEGIN
+      INSERT OR IGNORE INTO qr_scan_counters (qr_code_id, scans) VALUES (NEW.id, 0);
+    END""")
+
+
+def _m006_scan_rollups(db):
+    # Rollups por QR: hora UTC (epoch s) e dia no fuso STATS_TIMEZONE
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_hourly (
+      qr_code_id INTEGER NOT NULL,
+      hour INTEGER NOT NULL,
+      scans INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (qr_code_id, hour)
+    ) WITHOUT ROWID""")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_daily (
+      qr_code_id INTEGER NOT NULL,
+      day TEXT NOT NULL,
+      scans INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (qr_code_id, day)
+    ) WITHOUT ROWID""")
+
+
+def _m007_access_logs_ts(db):
+    # epoch em ms: filtros por intervalo comparam inteiros e usam o índice
+    if not _column_exists(db, "qr_access_logs", "ts"):
+        db.execute("ALTER TABLE qr_access_logs ADD COLUMN ts INTEGER")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_logs_qr_code_id_ts ON qr_access_logs(qr_code_id, ts)")
+    # (qr_code_id) é prefixo do índice novo
+    db.execute("DROP INDEX IF EXISTS idx_logs_qr_code_id")
+
+
+def _m008_dashboard_indexes(db):
+    # Ordenações/filtros do dashboard (paginação keyset)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_updated ON qr_codes(updated_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_owner_updated ON qr_codes(owner_user_id, updated_at)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_scan_counters_scans ON qr_scan_counters(scans)")
+    # a ordenação por scans parte de qr_scan_counters: todo QR precisa de linha
+    db.execute("INSERT OR IGNORE INTO qr_scan_counters (qr_code_id, scans) SELECT id, 0 FROM qr_codes")
+
+
+def _m009_archive_segments(db):
+    # Índice dos blocos de logs arquivados (app/archive.py)
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS archive_segments (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      month TEXT NOT NULL,
+      qr_code_id INTEGER NOT NULL,
+      byte_offset INTEGER NOT NULL,
+      byte_length INTEGER NOT NULL,
+      rows INTEGER NOT NULL,
+      min_ts INTEGER NOT NULL,
+      max_ts INTEGER NOT NULL,
+      last_accessed_at TEXT
+    )""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_archive_segments_qr_ts ON archive_segments(qr_code_id, min_ts)")
+
+
+def _m010_user_agent_classes(db):
+    # Classificação do User-Agent (app/useragent.py); NULL = ainda não classificado
+    for col in ("ua_device", "ua_os", "ua_browser", "is_bot"):
+        if not _column_exists(db, "qr_access_logs", col):
+            db.execute(f"ALTER TABLE qr_access_logs ADD COLUMN {col} INTEGER")
+    for table in ("qr_scan_hourly", "qr_scan_daily"):
+        if not _column_exists(db, table, "bot_scans"):
+            db.execute(f"ALTER TABLE {table} ADD COLUMN bot_scans INTEGER NOT NULL DEFAULT 0")
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_ua_daily (
+      qr_code_id INTEGER NOT NULL,
+      day TEXT NOT NULL,
+      device INTEGER NOT NULL,
+      os INTEGER NOT NULL,
+      browser INTEGER NOT NULL,
+      scans INTEGER NOT NULL DEFAULT 0,
+      PRIMARY KEY (qr_code_id, day, device, os, browser)
+    ) WITHOUT ROWID""")
+
+
+def _m011_scan_uniques(db):
+    # Sketch HyperLogLog (app/hll.py) dos visitantes por QR e dia local
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_uniques_daily (
+      qr_code_id INTEGER NOT NULL,
+      day TEXT NOT NULL,
+      sketch BLOB NOT NULL,
+      PRIMARY KEY (qr_code_id, day)
+    )""")
+
+
+def _m012_users_cache_version(db):
+    # Versão 'users' em cache_versions: invalida o cache de usuários (app/usercache.py)
+    db.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('users', 0)")
+
+    bump = "UPDATE cache_versions SET version = version + 1 WHERE name = 'users';"
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_version_ins AFTER INSERT ON users
+    BEGIN {bump} END""")
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_version_upd
+    AFTER UPDATE OF email, name, role, is_active ON users
+    BEGIN {bump} END""")
+    db.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_version_del AFTER DELETE ON users
+    BEGIN {bump} END""")
+
+
+def _m013_scan_suppressed(db):
+    # Hits repetidos suprimidos pela janela de deduplicação (app/dedup.py), por
+    # QR: não viram linha em qr_access_logs, então não entram em contadores e
+    # rollups e não dá para recalculá-los a partir dos logs
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS qr_scan_suppressed (
+      qr_code_id INTEGER PRIMARY KEY,
+      hits INTEGER NOT NULL DEFAULT 0,
+      FOREIGN KEY(qr_code_id) REFERENCES qr_codes(id)
+    )""")
+
+
+def _m014_dashboard_text_sorts(db):
+    # Ordenações por descrição, status e URL do dashboard (código já tem o
+    # UNIQUE). A expressão tem que ser a mesma de _QR_SORTS em routes.py.
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_description "
+               "ON qr_codes(COALESCE(description, '') COLLATE NOCASE)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_status ON qr_codes(status)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_qr_codes_url "
+               "ON qr_codes(COALESCE(current_url, '') COLLATE NOCASE)")
+
+
+def backfill_access_logs_ts(db, chunk=5000):
+    """Preenche qr_access_logs.ts a partir de accessed_at, em faixas de id.
+
+    Cada faixa é uma transação curta, então o writer dos scans não fica
+    bloqueado. Idempotente: só toca linhas com ts NULL. Retorna quantas
+    linhas foram preenchidas.
+    """
+    max_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM qr_access_logs").fetchone()[0]
+    filled = 0
+    lo = 0
+    while lo < max_id:
+        hi = lo + chunk
+        cur = db.execute("""
+          UPDATE qr_access_logs
+          SET ts = CAST(round((julianday(accessed_at) - 2440587.5) * 86400000) AS INTEGER)
+          WHERE id > ? AND id <= ? AND ts IS NULL
+        """, (lo, hi))
         db.commit()
-    except Exception:
-        pass
+        filled += cur.rowcount
+        lo = hi
+    return filled
 
-    # 4) Seed / upsert do admin do .env (bootstrap)
-    admin_email = (current_app.config.get("ADMIN_EMAIL") or "").strip().lower()
-    admin_password = current_app.config.get("ADMIN_PASSWORD") or ""
 
-    if admin_email and admin_password:
-        row = db.execute("SELECT id FROM users WHERE email = ?", (admin_email,)).fetchone()
-        pw_hash = generate_password_hash(admin_password)
-
-        if row:
-            db.execute("""
-              UPDATE users
-              SET password_hash = ?, role = 'admin', is_active = 1
-              WHERE email = ?
-            """, (pw_hash, admin_email))
-            admin_id = row["id"]
-        else:
-            db.execute("""
-              INSERT INTO users (name, email, password_hash, role, is_active)
-              VALUES (?, ?, ?, 'admin', 1)
-            """, ("Admin", admin_email, pw_hash))
-            admin_id = db.execute("SELECT id FROM users WHERE email = ?", (admin_email,)).fetchone()["id"]
+def backfill_ua_classification(db, chunk=5000):
+    """Classifica o User-Agent dos logs antigos (is_bot NULL), em faixas de id.
+
+    O parser é memoizado, então o custo é proporcional aos UAs distintos.
+    Retorna quantas linhas foram classificadas.
+    """
+    from .useragent import classify
 
+    max_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM qr_access_logs").fetchone()[0]
+    done = 0
+    lo = 0
+    while lo < max_id:
+        hi = lo + chunk
+        rows = db.execute(
+            "SELECT id, user_agent FROM qr_access_logs WHERE id > ? AND id <= ? AND is_bot IS NULL",
+            (lo, hi),
+        ).fetchall()
+        db.executemany(
+            "UPDATE qr_access_logs SET ua_device = ?, ua_os = ?, ua_browser = ?, is_bot = ? WHERE id = ?",
+            [(*classify(ua), row_id) for row_id, ua in rows],
+        )
         db.commit()
+        done += len(rows)
+        lo = hi
+    return done
+
+
+def reclassify_bot_scans(db, chunk=5000):
+    """Reclassifica os logs marcados como bot (is_bot = 1) com o parser atual.
+
+    Para depois de uma mudança em useragent.py que deixa de marcar algum UA
+    como bot (`flask scans reclassify-bots`). Só grava as linhas cuja classificação mudou e recalcula os rollups dos
+    QRs afetados. Retorna quantas linhas mudaram.
+    """
+    from .aggregates import rebuild_rollups
+    from .useragent import classify
+
+    max_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM qr_access_logs").fetchone()[0]
+    changed, qr_ids = 0, set()
+    lo = 0
+    while lo < max_id:
+        hi = lo + chunk
+        rows = db.execute(
+            "SELECT id, qr_code_id, user_agent FROM qr_access_logs WHERE id > ? AND id <= ? AND is_bot = 1",
+            (lo, hi),
+        ).fetchall()
+        updates = []
+        for row_id, qr_id, ua in rows:
+            info = classify(ua)
+            if not info.is_bot:
+                updates.append((*info, row_id))
+                qr_ids.add(qr_id)
+        db.executemany(
+            "UPDATE qr_access_logs SET ua_device = ?, ua_os = ?, ua_browser = ?, is_bot = ? WHERE id = ?",
+            updates,
+        )
+        db.commit()
+        changed += len(updates)
+        lo = hi
+    if qr_ids:
+        rebuild_rollups(db, sorted(qr_ids))
+    return changed
+
+
+def _backfill_scan_rollups(db):
+    from .aggregates import rebuild_rollups
+    rebuild_rollups(db)
+
+
+MIGRATIONS = [
+    (1, "tabelas base", _m001_base_tables),
+    (2, "qr_codes.owner_user_id", _m002_owner_user_id),
+    (3, "índice qr_codes.owner_user_id", _m003_owner_user_id_index),
+    (4, "cache_versions + triggers", _m004_cache_versions),
+    (5, "qr_scan_counters", _m005_scan_counters),
+    (6, "qr_scan_hourly / qr_scan_daily", _m006_scan_rollups),
+    (7, "qr_access_logs.ts + índice (qr_code_id, ts)", _m007_access_logs_ts),
+    (8, "índices do dashboard", _m008_dashboard_indexes),
+    (9, "archive_segments", _m009_archive_segments),
+    (10, "classificação do User-Agent + bot_scans + qr_scan_ua_daily", _m010_user_agent_classes),
+    (11, "qr_scan_uniques_daily (HyperLogLog)", _m011_scan_uniques),
+    (12, "cache_versions 'users' + triggers", _m012_users_cache_version),
+    (13, "qr_scan_suppressed", _m013_scan_suppressed),
+    (14, "índices das ordenações por texto do dashboard", _m014_dashboard_text_sorts),
+]
+
+# Backfills pesados rodam depois de todas as migrações, fora de transação,
+# em lotes curtos (o writer dos scans continua gravando no meio). A ordem da
+# lista é a ordem de execução: o rebuild dos rollups já lê ts e a
+# classificação do UA. Cada backfill roda uma vez se qualquer uma das suas
+# versões foi aplicada agora.
+BACKFILLS = [
+    ((7,), backfill_access_logs_ts),
+    ((10,), backfill_ua_classification),
+    ((6, 10, 11), _backfill_scan_rollups),
+]
+
+
+def latest_schema_version() -> int:
+    return MIGRATIONS[-1][0]
+
 
-        # 5) Backfill: QRs antigos sem dono -> admin
+def schema_version(db) -> int:
+    """Versão aplicada (uma única query; 0 se o banco nunca foi migrado)."""
+    try:
+        row = db.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def upgrade_db(db=None):
+    """Aplica as migrações pendentes. Retorna [(versão, nome)] aplicadas."""
+    db = db or get_db()
+    db.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+      version INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""")
+    db.commit()
+
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if schema_version(db) >= version:
+            continue
+        db.execute("BEGIN IMMEDIATE")
         try:
-            db.execute("""
-                UPDATE qr_codes
-                SET owner_user_id = ?
-                WHERE owner_user_id IS NULL
-            """, (admin_id,))
+            # outro worker pode ter aplicado enquanto esperávamos o lock
+            if schema_version(db) >= version:
+                db.rollback()
+                continue
+            step(db)
+            db.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name),
+            )
             db.commit()
         except Exception:
-            pass
+            db.rollback()
+            raise
+        applied.append((version, name))
+
+    done = {v for v, _ in applied}
+    for versions, backfill in BACKFILLS:
+        if done.intersection(versions):
+            backfill(db)
+    return applied
+
+
+def bootstrap_admin(db=None):
+    """Garante o admin do .env. Só regrava o hash se a senha mudou."""
+    db = db or get_db()
+    admin_email = (current_app.config.get("ADMIN_EMAIL") or "").strip().lower()
+    admin_password = current_app.config.get("ADMIN_PASSWORD") or ""
+    if not admin_email or not admin_password:
+        return None
+
+    row = db.execute(
+        "SELECT id, password_hash, role, is_active FROM users WHERE email = ?",
+        (admin_email,),
+    ).fetchone()
+
+    if row is None:
+        cur = db.execute("""
+          INSERT INTO users (name, email, password_hash, role, is_active)
+          VALUES (?, ?, ?, 'admin', 1)
+        """, ("Admin", admin_email, generate_password_hash(admin_password)))
+        admin_id = cur.lastrowid
+    else:
+        admin_id = row["id"]
+        if not check_password_hash(row["password_hash"], admin_password):
+            db.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ?",
+                (generate_password_hash(admin_password), admin_id),
+            )
+        if row["role"] != "admin" or not row["is_active"]:
+            db.execute("UPDATE users SET role = 'admin', is_active = 1 WHERE id = ?", (admin_id,))
+
+    # Backfill: QRs antigos sem dono -> admin
+    db.execute("UPDATE qr_codes SET owner_user_id = ? WHERE owner_user_id IS NULL", (admin_id,))
+    db.commit()
+    return admin_id
+
+
+def init_db():
+    """Migra o banco (se preciso) e garante o admin do .env."""
+    db = get_db()
+    upgrade_db(db)
+    bootstrap_admin(db)
+
+
+def _admin_exists(db) -> bool:
+    email = (current_app.config.get("ADMIN_EMAIL") or "").strip().lower()
+    if not email or not current_app.config.get("ADMIN_PASSWORD"):
+        return True  # nada a garantir
+    return db.execute("SELECT 1 FROM users WHERE email = ?", (email,)).fetchone() is not None
+
+
+def check_db(app):
+    """Checagem de startup: versão do schema e existência do admin (duas queries).
+
+    O bootstrap_admin completo (hash da senha, backfill de donos) só roda
+    aqui se o admin ainda não existe; troca de senha no .env é aplicada
+    pelo `flask db upgrade`.
+    """
+    log = logging.getLogger(__name__)
+    try:
+        with app.app_context():
+            db = get_db()
+            current = schema_version(db)
+            if current < latest_schema_version():
+                if app.config.get("DB_AUTO_UPGRADE", True):
+                    for version, name in upgrade_db(db):
+                        log.info("migração %s aplicada: %s", version, name)
+                else:
+                    log.warning(
+                        "banco na versão %s, código espera %s: rode `flask db upgrade`",
+                        current, latest_schema_version(),
+                    )
+                    return
+            if not _admin_exists(db):
+                bootstrap_admin(db)
+    finally:
+        # o master não deve manter conexões abertas antes do fork dos workers
+        app.extensions["db"].close_thread()
@@ -0,0 +1,69 @@
+"""Janela de deduplicação dos scans do /r/<code>.
+
+Um scan físico costuma gerar vários hits: o app da câmera faz prefetch, o
+navegador repete, o mensageiro busca o preview. Hits do mesmo
+(qr_code_id, IP, user-agent) dentro de SCAN_DEDUP_WINDOW segundos do
+primeiro viram só um contador, sem linha em qr_access_logs nem commit. As
+repetições por QR ficam pendentes aqui até o scan writer somá-las em
+qr_scan_suppressed (no mesmo commit de um lote de scans).
+
+Estrutura: duas gerações de dicts {hash da chave: instante do primeiro hit}.
+A geração atual vira a anterior a cada janela (ou antes, se passar de
+max_keys), e a anterior é descartada inteira; a memória fica limitada a
+2 * max_keys entradas e não há varredura de expiração. A janela vale por
+worker: repetições que caem em workers diferentes ainda são gravadas.
+"""
+import threading
+import time
+
+
+class ScanDeduper:
+    def __init__(self, window=10.0, max_keys=50000):
+        self.window = window
+        self.max_keys = max(1, max_keys)
+        self._lock = threading.Lock()
+        self._current = {}
+        self._previous = {}
+        self._rotated_at = time.monotonic()
+        self._pending = {}  # qr_code_id -> repetições ainda não gravadas
+        self._stats = {"checked": 0, "duplicates": 0, "rotations": 0, "early_rotations": 0}
+
+    def is_duplicate(self, qr_code_id, ip_address, user_agent, now=None) -> bool:
+        """True se a chave já teve um hit na janela (e conta a repetição)."""
+        now = time.monotonic() if now is None else now
+        key = hash((qr_code_id, ip_address, user_agent))
+        with self._lock:
+            self._stats["checked"] += 1
+            if now - self._rotated_at >= self.window:
+                self._rotate(now)
+            first = self._current.get(key)
+            if first is None:
+                first = self._previous.get(key)
+            if first is not None and now - first < self.window:
+                self._stats["duplicates"] += 1
+                self._pending[qr_code_id] = self._pending.get(qr_code_id, 0) + 1
+                return True
+            if len(self._current) >= self.max_keys:
+                self._stats["early_rotations"] += 1
+                self._rotate(now)
+            self._current[key] = now
+            return False
+
+    def take_pending(self) -> dict:
+        """{qr_code_id: repetições} acumuladas desde a última chamada (e zera)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def _rotate(self, now):
+        self._previous = self._current
+        self._current = {}
+        self._rotated_at = now
+        self._stats["rotations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, window=self.window, keys=len(self._current) + len(self._previous))
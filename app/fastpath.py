@@ -0,0 +1,84 @@
+"""Fast path WSGI do /r/<code>, montado na frente do Flask em wsgi.py.
+
+O redirect do QR é o endpoint de maior volume e não precisa de nada da pilha
+do Flask: sessão, Flask-Login (user_loader quando vem cookie), hooks de
+request, roteamento. Aqui ele faz só o lookup do código (cache do qrcache),
+o rate limit, o registro do scan (fila do scanlog) e a resposta, com o mesmo status, corpo
+e headers que redirect_qr (as mensagens vêm de routes.py). Qualquer outra
+URL, ou método que não seja GET/HEAD, segue para o Flask.
+
+tests/test_fastpath.py confere a equivalência com a rota do Flask e
+bench/bench_redirect.py mede o ganho.
+"""
+import time
+
+from werkzeug.exceptions import InternalServerError
+from werkzeug.utils import redirect
+
+from . import metrics
+from .qrcache import resolve_qr
+from .ratelimit import check_redirect
+from .routes import QR_NOT_FOUND, QR_DISABLED, QR_UNAVAILABLE, QR_RATE_LIMITED, is_valid_http_url
+from .scanlog import new_scan, record_scan, client_ip
+
+_PREFIX = "/r/"
+_METRIC_LABELS = (("endpoint", "main.redirect_qr"),)
+
+
+class RedirectFastPath:
+    def __init__(self, app, wsgi_app=None):
+        self.app = app
+        self.wsgi_app = wsgi_app or app.wsgi_app
+        self.metrics = app.config.get("METRICS_ENABLED", True)
+        self.trusted_hops = app.config["TRUSTED_PROXY_HOPS"]
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        method = environ.get("REQUEST_METHOD")
+        code = path[len(_PREFIX):] if path.startswith(_PREFIX) else ""
+        if not code or "/" in code or method not in ("GET", "HEAD"):
+            return self.wsgi_app(environ, start_response)
+
+        started = time.perf_counter()
+        try:
+            # PATH_INFO vem em latin-1 (PEP 3333); o werkzeug decodifica como UTF-8
+            response = self._respond(environ, code.encode("latin-1").decode("utf-8", "replace"))
+        except Exception:
+            if self.app.testing or self.app.debug:
+                raise
+            self.app.logger.exception("Exception on %s [%s]", path, method)
+            response = InternalServerError().get_response(environ)
+
+        if self.metrics:
+            metrics.observe("http_request_duration_seconds", _METRIC_LABELS, time.perf_counter() - started)
+            metrics.inc("http_requests_total", _METRIC_LABELS + (("method", method), ("status", response.status_code)))
+            metrics.REGISTRY.start_flusher()
+        return response(environ, start_response)
+
+    def _respond(self, environ, code):
+        app = self.app
+        ip = client_ip(environ.get("HTTP_X_FORWARDED_FOR", ""), environ.get("REMOTE_ADDR"), self.trusted_hops)
+        log_scan, retry_after = check_redirect(app, ip, code)
+        if retry_after is not None:
+            return app.response_class(QR_RATE_LIMITED[0], status=QR_RATE_LIMITED[1],
+                                      headers={"Retry-After": str(retry_after)})
+
+        qr = resolve_qr(app.extensions["db"].connection(), code, app)
+        if not qr:
+            return app.response_class(QR_NOT_FOUND[0], status=QR_NOT_FOUND[1])
+
+        if log_scan:
+            record_scan(new_scan(
+                qr.id,
+                ip,
+                environ.get("HTTP_USER_AGENT", ""),
+                environ.get("HTTP_REFERER", ""),
+            ), app)
+
+        if qr.status != "active":
+            return app.response_class(QR_DISABLED[0], status=QR_DISABLED[1])
+
+        if not is_valid_http_url(qr.current_url or ""):
+            return app.response_class(QR_UNAVAILABLE[0], status=QR_UNAVAILABLE[1])
+
+        return redirect(qr.current_url, code=302, Response=app.response_class)
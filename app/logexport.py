@@ -0,0 +1,120 @@
+"""Export dos scans brutos (qr_access_logs) em CSV ou NDJSON, em streaming.
+
+Os logs são lidos em lotes de tamanho fixo por keyset (ts, id) no índice
+(qr_code_id, ts): cada lote é uma query curta, então nenhuma transação de
+leitura fica aberta durante o download e a memória não depende do total de
+linhas. Logs já arquivados (app/archive.py) são lidos dos segmentos.
+Opcionalmente o resultado sai comprimido em gzip conforme é gerado.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, time as dtime, timedelta
+
+from .archive import iter_archived
+from .useragent import classify, labels
+
+COLUMNS = (
+    "id", "qr_code_id", "code", "accessed_at", "ts", "ip_address", "user_agent", "referer",
+    "device", "os", "browser", "is_bot",
+)
+
+MIMETYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def day_range_ms(start_day, end_day, tz):
+    """Dias locais inclusivos [start_day, end_day] -> (início, fim) em epoch ms (fim exclusivo)."""
+    start_ms = end_ms = None
+    if start_day:
+        start_ms = int(datetime.combine(start_day, dtime.min, tz).timestamp() * 1000)
+    if end_day:
+        end_ms = int(datetime.combine(end_day + timedelta(days=1), dtime.min, tz).timestamp() * 1000)
+    return start_ms, end_ms
+
+
+def _ua_columns(user_agent, device=None, os_=None, browser=None, is_bot=None):
+    # linhas arquivadas ou ainda não classificadas: classifica na hora (memoizado)
+    if is_bot is None:
+        device, os_, browser, is_bot = classify(user_agent)
+    return (*labels(device, os_, browser), is_bot)
+
+
+def _iter_archived_batches(db, qr_id, code, start_ms, end_ms, chunk):
+    batch = []
+    for r in iter_archived(db, qr_id, start_ms, end_ms):
+        batch.append((r[0], qr_id, code, r[1], r[2], r[3], r[4], r[5], *_ua_columns(r[4])))
+        if len(batch) >= chunk:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_logs(db, qrs, start_ms=None, end_ms=None, chunk=5000):
+    """Linhas de log de cada QR em qrs [(id, code)], por QR e em ordem (ts, id).
+
+    Os segmentos arquivados (mais antigos) vêm antes da tabela viva; só os
+    blocos que cruzam o intervalo pedido são lidos.
+    """
+    for qr_id, code in qrs:
+        yield from _iter_archived_batches(db, qr_id, code, start_ms, end_ms, chunk)
+        last = (-1 if start_ms is None else start_ms - 1, 2**63 - 1)
+        while True:
+            rows = db.execute("""
+              SELECT id, accessed_at, ts, ip_address, user_agent, referer,
+                     ua_device, ua_os, ua_browser, is_bot
+              FROM qr_access_logs
+              WHERE qr_code_id = ? AND (ts, id) > (?, ?) AND ts < ?
+              ORDER BY ts, id
+              LIMIT ?
+            """, (qr_id, last[0], last[1], 2**63 - 1 if end_ms is None else end_ms, chunk)).fetchall()
+            if not rows:
+                break
+            yield [
+                (r[0], qr_id, code, r[1], r[2], r[3], r[4], r[5], *_ua_columns(r[4], r[6], r[7], r[8], r[9]))
+                for r in rows
+            ]
+            last = (rows[-1][2], rows[-1][0])
+
+
+def _encode_csv(batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, r)), ensure_ascii=False) + "\n" for r in rows
+        ).encode("utf-8")
+
+
+def _gzip(chunks, level=6):
+    z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: container gzip
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def iter_export(db, qrs, fmt="csv", start_ms=None, end_ms=None, chunk=5000, gzip=False, close=False):
+    """Bytes do export; com close=True fecha a conexão no fim (ou se o cliente desistir)."""
+    try:
+        batches = iter_logs(db, qrs, start_ms, end_ms, chunk)
+        body = _encode_csv(batches) if fmt == "csv" else _encode_ndjson(batches)
+        if gzip:
+            body = _gzip(body)
+        yield from body
+    finally:
+        if close:
+            db.close()
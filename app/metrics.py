@@ -0,0 +1,336 @@
+"""Métricas do app no formato texto do Prometheus (GET /metrics).
+
+Cada processo guarda contadores e histogramas em memória (um lock, um
+bisect por observação; nada de I/O no request). Para somar os workers do
+gunicorn, uma thread em cada processo grava um snapshot JSON em
+METRICS_DIR/metrics-<pid>.json a cada METRICS_FLUSH_INTERVAL segundos (e no
+exit), fora dos requests; o /metrics soma
+os snapshots dos outros processos com o estado vivo do próprio worker.
+Snapshots de processos que morreram são somados em metrics-dead.json (no
+/metrics e quando a thread de um worker novo começa), então os contadores
+não voltam atrás quando um worker é reciclado; o snapshot leva o início do
+processo, para um pid reaproveitado não passar por vivo. Apagar o
+diretório zera tudo. Sem fcntl (Windows) essa soma fica desligada e o
+/metrics mostra só o processo que respondeu.
+
+O tempo no banco vem de InstrumentedConnection, a classe das conexões do
+ConnectionManager: mede execute/executemany/executescript/commit (o fetch
+das linhas não entra). Requests com resposta em streaming medem só até o
+início do corpo.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import g, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem flock, métricas só do próprio processo
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# nome -> (tipo, ajuda, buckets)
+METRICS = {
+    "http_requests_total": ("counter", "Requests por endpoint, método e status.", None),
+    "http_request_duration_seconds": ("histogram", "Latência dos requests por endpoint.", LATENCY_BUCKETS),
+    "db_query_duration_seconds": ("histogram", "Tempo dentro do SQLite por operação.", DB_BUCKETS),
+    "qr_scans_recorded_total": ("counter", "Scans aceitos pelo /r/<code>, por modo de gravação.", None),
+    "qr_scans_written_total": ("counter", "Scans gravados no banco.", None),
+    "qr_scans_deduplicated_total": ("counter", "Hits repetidos na janela de deduplicação (sem gravar).", None),
+    "qr_redirects_rate_limited_total": ("counter", "Hits do /r/<code> acima do rate limit, por ação.", None),
+}
+
+_DEAD_FILE = "metrics-dead.json"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 5.0
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # gunicorn --preload: o filho não herda os números do master
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._started = _proc_start(self._pid)  # distingue de outro processo com o mesmo pid
+        self._counters = {}    # (nome, labels) -> valor
+        self._histograms = {}  # (nome, labels) -> [n por bucket..., n +Inf, soma]
+        self._flusher = None   # a thread do pai não existe no filho
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        i = bisect.bisect_left(buckets, value)
+        key = (name, labels)
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = [0] * (len(buckets) + 2)
+            h[i] += 1
+            h[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[n, [list(p) for p in lb], v] for (n, lb), v in self._counters.items()],
+                "histograms": [[n, [list(p) for p in lb], list(h)] for (n, lb), h in self._histograms.items()],
+            }
+
+    # ---- arquivos por processo ----
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def start_flusher(self):
+        """Garante a thread que grava o snapshot deste processo (barato: chamado a cada request)."""
+        if self._flusher is not None or not self.directory:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        try:
+            self._reap()  # snapshots de workers que já morreram (inclusive um antigo com este pid)
+        except OSError:
+            log.exception("metrics: falha ao recolher snapshots antigos")
+        while self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                log.exception("metrics: falha ao gravar o snapshot")
+
+    def flush(self):
+        if not self.directory or self._pid != os.getpid():
+            return
+        _write_json(self._path(f"metrics-{self._pid}.json"), dict(self.snapshot(), started=self._started))
+
+    def collect(self) -> dict:
+        """Snapshot somado de todos os processos (este worker entra com o estado vivo)."""
+        total = {}
+        _merge(total, self.snapshot())
+        if not self.directory:
+            return total
+        _merge(total, self._reap(total))
+        return total
+
+    def _reap(self, live=None) -> dict:
+        """Sob o flock: snapshots de processos mortos vão para metrics-dead.json
+        (e o arquivo é apagado); os vivos, menos este, são somados em live.
+        Retorna o acumulado dos mortos."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            dead = _read_json(self._path(_DEAD_FILE))
+            dead_changed = False
+            for name in os.listdir(self.directory):
+                if not (name.startswith("metrics-") and name.endswith(".json")) or name == _DEAD_FILE:
+                    continue
+                try:
+                    pid = int(name[len("metrics-"):-len(".json")])
+                except ValueError:
+                    continue
+                snap = _read_json(self._path(name))
+                if pid == os.getpid():
+                    if snap.get("started") == self._started:
+                        continue  # o próprio: entra com o estado vivo
+                elif _alive(pid, snap.get("started")):
+                    if live is not None:
+                        _merge(live, snap)
+                    continue
+                dead = _merge_snapshots(dead, snap)
+                dead_changed = True
+                os.unlink(self._path(name))
+            if dead_changed:
+                _write_json(self._path(_DEAD_FILE), dead)
+        return dead
+
+
+def _proc_start(pid):
+    """Início do processo em ticks desde o boot (/proc/<pid>/stat); None fora do Linux."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        return int(stat.rsplit(b")", 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _alive(pid, started=None) -> bool:
+    """O processo que gravou o snapshot ainda existe. Com started (Linux), um
+    processo novo que reaproveitou o pid não conta."""
+    if started is not None:
+        return _proc_start(pid) == started
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _merge(total, snap):
+    """Soma um snapshot em total {(tipo, nome, labels): valor | lista}."""
+    for name, labels, value in snap.get("counters", ()):
+        key = ("c", name, tuple(map(tuple, labels)))
+        total[key] = total.get(key, 0) + value
+    for name, labels, values in snap.get("histograms", ()):
+        key = ("h", name, tuple(map(tuple, labels)))
+        acc = total.get(key)
+        total[key] = list(values) if acc is None else [a + b for a, b in zip(acc, values)]
+    return total
+
+
+def _merge_snapshots(a, b):
+    total = _merge(_merge({}, a), b)
+    return {
+        "counters": [[n, [list(p) for p in lb], v] for (t, n, lb), v in total.items() if t == "c"],
+        "histograms": [[n, [list(p) for p in lb], v] for (t, n, lb), v in total.items() if t == "h"],
+    }
+
+
+REGISTRY = Registry()
+
+
+def inc(name, labels=(), value=1):
+    REGISTRY.inc(name, labels, value)
+
+
+def observe(name, labels, value):
+    REGISTRY.observe(name, labels, value)
+
+
+# ---------------- FORMATO TEXTO ----------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(v) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render() -> str:
+    total = REGISTRY.collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        t = "c" if kind == "counter" else "h"
+        for (_, _, labels), value in sorted((k, v) for k, v in total.items() if k[0] == t and k[1] == name):
+            if kind == "counter":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for le, n in zip(buckets + ("+Inf",), value[:-1]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- SQLITE ----------------
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3.Connection que soma o tempo de cada operação em db_query_duration_seconds."""
+
+    def execute(self, sql, parameters=(), /):
+        t = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            REGISTRY.observe("db_query_duration_seconds", (("op", "execute"),), time.perf_counter() - t)
+
+    def executemany(self, sql, parameters, /):
+        t = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            REGISTRY.observe("db_query_duration_seconds", (("op", "executemany"),), time.perf_counter() - t)
+
+    def executescript(self, sql, /):
+        t = time.perf_counter()
+        try:
+            return super().executescript(sql)
+        finally:
+            REGISTRY.observe("db_query_duration_seconds", (("op", "executescript"),), time.perf_counter() - t)
+
+    def commit(self):
+        t = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            REGISTRY.observe("db_query_duration_seconds", (("op", "commit"),), time.perf_counter() - t)
+
+
+# ---------------- FLASK ----------------
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        endpoint = request.endpoint or "none"
+        REGISTRY.observe("http_request_duration_seconds", (("endpoint", endpoint),), time.perf_counter() - started)
+        REGISTRY.inc("http_requests_total", (("endpoint", endpoint), ("method", request.method),
+                                             ("status", response.status_code)))
+        REGISTRY.start_flusher()
+    return response
+
+
+def init_app(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    # a soma entre workers depende do flock; sem fcntl cada processo vê só as suas
+    REGISTRY.directory = (app.config.get("METRICS_DIR") or None) if fcntl is not None else None
+    REGISTRY.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", 5.0)
+    app.extensions["db"].factory = InstrumentedConnection
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    atexit.register(REGISTRY.flush)
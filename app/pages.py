@@ -0,0 +1,75 @@
+"""Páginas estáticas (land, landing, landing_new) pré-renderizadas.
+
+O HTML dessas páginas não depende do request, então o template roda uma vez
+no startup e a rota só devolve os bytes prontos: identidade ou gzip
+(pré-comprimido, conforme o Accept-Encoding), ETag forte por variante e 304
+para If-None-Match. Com o app em debug a página é renderizada de novo quando
+o template (ou o manifest dos assets) muda. PRERENDER_PAGES=0 volta ao
+render_template a cada request. bench/bench_landing.py compara os dois.
+"""
+import gzip
+import hashlib
+
+from flask import current_app, render_template, request
+
+PAGES = ("land.html", "landing.html", "landing_new.html")
+
+
+class PrerenderedPage:
+    def __init__(self, app, template):
+        self.app = app
+        self.template = template
+        self.render()
+
+    def render(self):
+        app = self.app
+        with app.test_request_context():
+            body = render_template(self.template).encode("utf-8")
+        _, _, self._uptodate = app.jinja_loader.get_source(app.jinja_env, self.template)
+        self._assets_version = self._assets_mtime()
+        tag = hashlib.sha256(body).hexdigest()[:24]
+        variants = {None: (body, tag)}
+        packed = gzip.compress(body, 9, mtime=0)
+        if len(packed) < len(body):
+            variants["gzip"] = (packed, f"{tag}-gz")
+        self.variants = variants
+
+    def _assets_mtime(self):
+        assets = self.app.extensions.get("assets")
+        if assets is None:
+            return None
+        assets.load()
+        return assets.mtime
+
+    def stale(self) -> bool:
+        return not self._uptodate() or self._assets_mtime() != self._assets_version
+
+    def response(self):
+        if self.app.debug and self.stale():
+            self.render()
+        encoding = "gzip" if "gzip" in self.variants and request.accept_encodings["gzip"] else None
+        body, tag = self.variants[encoding]
+        if request.if_none_match.contains_weak(tag):
+            response = self.app.response_class(status=304)
+        else:
+            response = self.app.response_class(body, mimetype="text/html")
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(tag)
+        if len(self.variants) > 1:
+            response.vary.add("Accept-Encoding")
+        return response
+
+
+def page_response(template):
+    """Resposta de uma das PAGES (render_template normal com PRERENDER_PAGES=0)."""
+    pages = current_app.extensions.get("pages")
+    if pages is None:
+        return render_template(template)
+    return pages[template].response()
+
+
+def init_app(app):
+    if not app.config.get("PRERENDER_PAGES", True):
+        return
+    app.extensions["pages"] = {template: PrerenderedPage(app, template) for template in PAGES}
@@ -0,0 +1,116 @@
+"""Cache em memória da resolução code -> (id, status, current_url) do /r/<code>.
+
+LRU com TTL, incluindo cache negativo para códigos inexistentes. A coerência
+entre workers do gunicorn vem da tabela cache_versions: triggers em qr_codes
+incrementam a versão e cada worker confere esse número no máximo a cada
+QR_CACHE_VERSION_CHECK_INTERVAL segundos, limpando o cache quando muda.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+
+QRTarget = namedtuple("QRTarget", "id status current_url")
+
+_MISSING = object()
+
+
+class QRResolver:
+    def __init__(self, maxsize=10000, ttl=60.0, negative_ttl=10.0, version_check_interval=1.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # code -> (expira_em, QRTarget | None)
+        self._version = None
+        self._version_checked_at = 0.0
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def resolve(self, db, code: str):
+        """Retorna QRTarget ou None (código inexistente)."""
+        now = time.monotonic()
+        self._check_version(db, now)
+
+        with self._lock:
+            entry = self._entries.get(code, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(code)
+                self._stats["hits" if entry[1] is not None else "negative_hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        row = db.execute(
+            "SELECT id, status, current_url FROM qr_codes WHERE code = ?",
+            (code,),
+        ).fetchone()
+        target = QRTarget(row[0], row[1], row[2]) if row else None
+
+        ttl = self.ttl if target is not None else self.negative_ttl
+        with self._lock:
+            self._entries[code] = (now + ttl, target)
+            self._entries.move_to_end(code)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return target
+
+    def invalidate(self, code=None):
+        """Remove um código (ou tudo, se code=None) do cache deste processo."""
+        with self._lock:
+            if code is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(code, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["negative_hits"] + self._stats["misses"]
+            hit_ratio = (lookups - self._stats["misses"]) / lookups if lookups else 0.0
+            return dict(self._stats, size=len(self._entries), version=self._version,
+                        hit_ratio=round(hit_ratio, 4))
+
+    def _check_version(self, db, now):
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        row = db.execute("SELECT version FROM cache_versions WHERE name = 'qr_codes'").fetchone()
+        version = row[0] if row else None
+        with self._lock:
+            self._version_checked_at = now
+            if version != self._version:
+                if self._version is not None:
+                    self._entries.clear()
+                    self._stats["invalidations"] += 1
+                self._version = version
+
+
+def init_app(app):
+    if not app.config.get("QR_CACHE_ENABLED", True):
+        return
+    app.extensions["qr_resolver"] = QRResolver(
+        maxsize=app.config["QR_CACHE_MAXSIZE"],
+        ttl=app.config["QR_CACHE_TTL"],
+        negative_ttl=app.config["QR_CACHE_NEGATIVE_TTL"],
+        version_check_interval=app.config["QR_CACHE_VERSION_CHECK_INTERVAL"],
+    )
+
+
+def resolve_qr(db, code: str, app=None):
+    """app: para uso fora de um app context (fast path do /r/ em app/fastpath.py)."""
+    resolver = (app or current_app).extensions.get("qr_resolver")
+    if resolver is not None:
+        return resolver.resolve(db, code)
+    row = db.execute(
+        "SELECT id, status, current_url FROM qr_codes WHERE code = ?",
+        (code,),
+    ).fetchone()
+    return QRTarget(row[0], row[1], row[2]) if row else None
+
+
+def invalidate_qr(code=None):
+    resolver = current_app.extensions.get("qr_resolver")
+    if resolver is not None:
+        resolver.invalidate(code)
@@ -0,0 +1,144 @@
+"""Exportação em lote das imagens dos QRs num ZIP gerado em streaming.
+
+O ZIP é escrito num "sink" sem seek (zipfile usa data descriptors) e cada
+arquivo é entregue ao cliente assim que entra no ZIP, então a memória não
+cresce com o número de QRs. A renderização (qrcode/Pillow, CPU-bound) vai
+para um pool de processos, com no máximo 2x workers imagens em voo; o que já
+está no cache de imagens nem chega ao pool.
+"""
+import atexit
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .qrimage import DEFAULT_OPTIONS, image_key, options_params, render
+
+_pool = None
+_pool_pid = None
+
+
+def _get_pool(workers: int):
+    """Pool por processo (criado sob demanda; nunca herdado de um fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        # spawn: o worker do gunicorn tem threads (writer dos scans), fork não é seguro
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_pid = os.getpid()
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def select_qrs(db, ids=None, status=None, owner_id=None):
+    """QRs a exportar: [(id, code)]. Escopo por dono é responsabilidade de quem chama."""
+    where, params = [], []
+    if owner_id is not None:
+        where.append("owner_user_id = ?")
+        params.append(owner_id)
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if ids:
+        where.append(f"id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    sql = "SELECT id, code FROM qr_codes"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return [(r[0], r[1]) for r in db.execute(sql + " ORDER BY id", params)]
+
+
+def _safe_name(code: str, qr_id: int) -> str:
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", code).strip("._")
+    return name or f"qr-{qr_id}"
+
+
+def _unique_name(name: str, qr_id: int, used: set) -> str:
+    """Nome ainda não usado no ZIP (sem diferenciar maiúsculas, como no
+    Windows/macOS): códigos que viram o mesmo nome ganham o id do QR."""
+    candidate, n = name, 1
+    while candidate.lower() in used:
+        candidate = f"{name}-{qr_id}" if n == 1 else f"{name}-{qr_id}-{n}"
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _rendered(items, base_url, cache, workers, opts):
+    """Gera (nome, imagem) na ordem de items, renderizando em paralelo o que faltar."""
+    pool = _get_pool(workers) if workers > 0 else None
+    window = deque()
+    max_inflight = max(1, workers * 2)
+    params = options_params(opts)
+    used = set()
+
+    def drain(limit):
+        while len(window) > limit:
+            name, key, data = window.popleft()
+            if not isinstance(data, bytes):
+                data = data.result()
+                cache.put(key, opts.fmt, data)
+            yield name, data
+
+    for qr_id, code in items:
+        payload = f"{base_url}/r/{code}"
+        key = image_key(payload, params)
+        data = cache.get(key, opts.fmt)
+        if data is None:
+            if pool is None:
+                data = render(payload, opts)
+                cache.put(key, opts.fmt, data)
+            else:
+                data = pool.submit(render, payload, opts)
+        window.append((f"{_unique_name(_safe_name(code, qr_id), qr_id, used)}.{opts.fmt}", key, data))
+        yield from drain(max_inflight)
+    yield from drain(0)
+
+
+class _StreamSink:
+    """Arquivo só de escrita (sem seek) que acumula bytes até serem lidos."""
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def write(self, b):
+        self._buf += b
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+
+def iter_zip(items, base_url, cache, workers=2, opts=DEFAULT_OPTIONS):
+    """Gera os bytes de um ZIP com uma imagem (PNG/SVG) por QR, em streaming."""
+    sink = _StreamSink()
+    now = datetime.now().timetuple()[:6]
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zf:
+        for name, data in _rendered(items, base_url, cache, workers, opts):
+            # PNG já é comprimido; SVG é texto e vale a pena deflate
+            info = zipfile.ZipInfo(name, date_time=now)
+            info.compress_type = zipfile.ZIP_DEFLATED if opts.fmt == "svg" else zipfile.ZIP_STORED
+            zf.writestr(info, data)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    tail = sink.take()
+    if tail:
+        yield tail
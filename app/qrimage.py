@@ -0,0 +1,239 @@
+"""Imagens dos QRs: renderização + cache endereçado por conteúdo.
+
+A imagem só depende do payload (BASE_URL + /r/<code>) e dos parâmetros de
+renderização (formato PNG/SVG, tamanho do módulo, quiet zone, ECC), então a
+chave é o sha256 disso. O SVG sai direto da matriz de módulos, sem Pillow.
+O cache tem dois níveis: LRU em memória (limitado em bytes) e disco (escrita
+atômica via os.replace, segura com vários workers gravando a mesma chave).
+A mesma chave serve de ETag forte.
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from importlib import metadata
+
+import qrcode
+import qrcode.constants
+
+from flask import current_app
+
+# Mudou a forma de renderizar? Incremente para invalidar o cache inteiro.
+RENDER_VERSION = 1
+
+try:
+    _QRCODE_VERSION = metadata.version("qrcode")
+except metadata.PackageNotFoundError:
+    _QRCODE_VERSION = ""
+
+# fmt: png|svg; box_size: pixels (PNG) / unidades (SVG) por módulo;
+# border: quiet zone em módulos; ecc: nível de correção de erro L/M/Q/H.
+QROptions = namedtuple("QROptions", "fmt box_size border ecc")
+
+# Mesmos valores do qrcode.make()
+DEFAULT_OPTIONS = QROptions("png", 10, 4, "M")
+
+MIMETYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+_ECC = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+def parse_options(args, fmt=None) -> QROptions:
+    """QROptions a partir da query string (?format=&size=&border=&ecc=). ValueError se inválido."""
+    fmt = (fmt or args.get("format") or DEFAULT_OPTIONS.fmt).lower()
+    box_size = int(args.get("size") or DEFAULT_OPTIONS.box_size)
+    border = int(args.get("border", DEFAULT_OPTIONS.border))
+    ecc = (args.get("ecc") or DEFAULT_OPTIONS.ecc).upper()
+    if fmt not in MIMETYPES or ecc not in _ECC or not 1 <= box_size <= 50 or not 0 <= border <= 20:
+        raise ValueError("opções de renderização inválidas")
+    return QROptions(fmt, box_size, border, ecc)
+
+
+def options_params(opts: QROptions) -> dict:
+    """Parâmetros que entram na chave do cache (o padrão mantém a chave antiga)."""
+    params = {"format": opts.fmt}
+    for field in ("box_size", "border", "ecc"):
+        value = getattr(opts, field)
+        if value != getattr(DEFAULT_OPTIONS, field):
+            params[field] = value
+    return params
+
+
+def _build(payload: str, opts: QROptions):
+    qr = qrcode.QRCode(error_correction=_ECC[opts.ecc], box_size=opts.box_size, border=opts.border)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+
+def render_svg(payload: str, opts: QROptions = DEFAULT_OPTIONS) -> bytes:
+    """SVG direto da matriz: um único <path> com uma linha por sequência horizontal de módulos."""
+    matrix = _build(payload, opts).get_matrix()  # já inclui a quiet zone
+    n = len(matrix)
+    parts = []
+    cx, cy = 0, 0  # posição atual da "caneta" (coordenadas relativas deixam o path curto)
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < n:
+            if row[x]:
+                start = x
+                while x < n and row[x]:
+                    x += 1
+                parts.append(f"m{start - cx} {y - cy}h{x - start}" if parts else f"M{start} {y}h{x - start}")
+                cx, cy = x, y
+            else:
+                x += 1
+    size = n * opts.box_size
+    # traço de largura 1 centrado em y+0.5 cobre exatamente a linha de módulos
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/>'
+        f'<path transform="translate(0 .5)" stroke="#000" d="{"".join(parts)}"/></svg>'
+    )
+    return svg.encode("ascii")
+
+
+def render_png(payload: str) -> bytes:
+    img = qrcode.make(payload)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def render(payload: str, opts: QROptions = DEFAULT_OPTIONS) -> bytes:
+    if opts.fmt == "svg":
+        return render_svg(payload, opts)
+    if opts == DEFAULT_OPTIONS:
+        return render_png(payload)
+    img = _build(payload, opts).make_image()
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def image_key(payload: str, params: dict) -> str:
+    raw = json.dumps(
+        {"v": RENDER_VERSION, "qrcode": _QRCODE_VERSION, "data": payload, **params},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class QRImageCache:
+    def __init__(self, directory=None, max_memory_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+
+        self._lock = threading.Lock()
+        self._mem = OrderedDict()  # key -> bytes
+        self._mem_bytes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "renders": 0}
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{ext}")
+
+    def get(self, key: str, ext: str):
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+
+        if self.directory:
+            try:
+                with open(self._path(key, ext), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return data
+        return None
+
+    def put(self, key: str, ext: str, data: bytes):
+        self._remember(key, data)
+        if not self.directory:
+            return
+        path = self._path(key, ext)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def get_or_render(self, key: str, ext: str, render):
+        data = self.get(key, ext)
+        if data is None:
+            data = render()
+            with self._lock:
+                self._stats["renders"] += 1
+            self.put(key, ext, data)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, memory_entries=len(self._mem), memory_bytes=self._mem_bytes)
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._mem.pop(key, None)
+            if old is not None:
+                self._mem_bytes -= len(old)
+            self._mem[key] = data
+            self._mem_bytes += len(data)
+            while self._mem_bytes > self.max_memory_bytes:
+                _, evicted = self._mem.popitem(last=False)
+                self._mem_bytes -= len(evicted)
+
+
+def init_app(app):
+    app.extensions["qr_images"] = QRImageCache(
+        directory=app.config.get("QR_IMAGE_CACHE_DIR") or None,
+        max_memory_bytes=app.config["QR_IMAGE_CACHE_MEMORY_BYTES"],
+    )
+
+
+def get_image_cache() -> QRImageCache:
+    return current_app.extensions["qr_images"]
+
+
+def prune_disk_cache(directory: str, max_age_seconds: float, now=None) -> int:
+    """Remove arquivos do cache em disco não modificados há max_age_seconds."""
+    now = now or time.time()
+    removed = 0
+    if not directory or not os.path.isdir(directory):
+        return 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if now - os.path.getmtime(path) > max_age_seconds:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,139 @@
+"""Rate limit do /r/<code> por token bucket, em memória.
+
+Três níveis, checados em ordem: (IP, código), IP e global. Cada um é um
+balde de `burst` fichas reabastecido a `rate` fichas/s. Acima do limite o
+request não grava scan: com RATE_LIMIT_ACTION="skip_log" o redirect sai
+normalmente, com "429" a resposta é 429 com Retry-After.
+
+Memória limitada: os baldes ficam num OrderedDict em ordem de uso; um balde
+parado há burst/rate segundos já está cheio (igual a não existir) e é
+removido, e acima de RATE_LIMIT_MAX_KEYS os menos usados saem primeiro.
+
+Gunicorn: cada worker tem seus baldes e recebe uma fração dos requests, então
+as taxas configuradas (totais do servidor) são divididas por
+RATE_LIMIT_WORKERS (padrão: WEB_CONCURRENCY, o mesmo que define os workers do
+gunicorn). bench/bench_ratelimit.py mede o custo por request.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+ACTIONS = ("skip_log", "429")
+
+
+class Buckets:
+    """Baldes de um nível, por chave (sem lock próprio: o RedirectLimiter serializa)."""
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max(1, max_keys)
+        self.full_after = self.burst / rate
+        self.evictions = 0
+        self._ops = 0
+        self._buckets = OrderedDict()  # chave -> [fichas, último uso]
+
+    def take(self, key, now) -> float:
+        """Consome uma ficha. Retorna 0 se havia, senão os segundos até a próxima."""
+        buckets = self._buckets
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = [self.burst, now]
+            if len(buckets) > self.max_keys:
+                self._evict(now)
+        else:
+            tokens = b[0] + (now - b[1]) * self.rate
+            b[0] = tokens if tokens < self.burst else self.burst
+            b[1] = now
+            buckets.move_to_end(key)
+        # remoção dos baldes parados: amortizada, a cada 64 operações
+        self._ops += 1
+        if not self._ops & 63:
+            self._evict(now)
+        if b[0] >= 1.0:
+            b[0] -= 1.0
+            return 0.0
+        return (1.0 - b[0]) / self.rate
+
+    def _evict(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, (_, last) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - last < self.full_after:
+                break
+            del buckets[key]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class RedirectLimiter:
+    def __init__(self, ip_code=(1.0, 10), ip=(5.0, 30), global_=(500.0, 1000), max_keys=100000,
+                 action="skip_log", workers=1):
+        workers = max(1, workers)
+        self.action = action if action in ACTIONS else "skip_log"
+        self._lock = threading.Lock()
+        # (rate, burst) totais do servidor -> fatia deste worker; rate 0 desliga o nível
+        self._levels = [
+            (name, Buckets(rate / workers, burst / workers, max_keys))
+            for name, (rate, burst) in (("ip_code", ip_code), ("ip", ip), ("global", global_))
+            if rate > 0
+        ]
+        self._stats = {"checked": 0, "limited": 0}
+        self._limited_by = {name: 0 for name, _ in self._levels}
+
+    def check(self, ip, code, now=None) -> float:
+        """0 se o request está dentro dos limites, senão os segundos de espera sugeridos."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._stats["checked"] += 1
+            for name, buckets in self._levels:
+                key = (ip, code) if name == "ip_code" else ip if name == "ip" else None
+                wait = buckets.take(key, now)
+                if wait:
+                    self._stats["limited"] += 1
+                    self._limited_by[name] += 1
+                    return wait
+        return 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                action=self.action,
+                limited_by=dict(self._limited_by),
+                keys={name: len(b) for name, b in self._levels},
+                evictions={name: b.evictions for name, b in self._levels},
+            )
+
+
+def check_redirect(app, ip, code):
+    """(grava_scan, retry_after) para um hit no /r/<code>; retry_after != None = responder 429."""
+    limiter = app.extensions.get("redirect_limiter")
+    if limiter is None:
+        return True, None
+    wait = limiter.check(ip, code)
+    if not wait:
+        return True, None
+    metrics.inc("qr_redirects_rate_limited_total", (("action", limiter.action),))
+    if limiter.action == "429":
+        return False, max(1, math.ceil(wait))
+    return False, None
+
+
+def init_app(app):
+    if not app.config.get("RATE_LIMIT_ENABLED", True):
+        return
+    c = app.config
+    app.extensions["redirect_limiter"] = RedirectLimiter(
+        ip_code=(c["RATE_LIMIT_CODE_RATE"], c["RATE_LIMIT_CODE_BURST"]),
+        ip=(c["RATE_LIMIT_IP_RATE"], c["RATE_LIMIT_IP_BURST"]),
+        global_=(c["RATE_LIMIT_GLOBAL_RATE"], c["RATE_LIMIT_GLOBAL_BURST"]),
+        max_keys=c["RATE_LIMIT_MAX_KEYS"],
+        action=c["RATE_LIMIT_ACTION"],
+        workers=c["RATE_LIMIT_WORKERS"],
+    )
@@ -1,15 +1,31 @@
-from datetime import datetime
+from datetime import datetime, timedelta, time as dtime
 from urllib.parse import urlparse
+import base64
+import hmac
+import io
+import json
 import os
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_file, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, send_file, abort, jsonify
 from flask_login import login_user, login_required, logout_user, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 
-import qrcode
-
-from .db import get_db, init_db
+from .db import get_db, get_read_db
 from .auth import DBUser, admin_required
+from .scanlog import new_scan, record_scan, get_scan_writer, client_ip
+from .qrcache import resolve_qr, invalidate_qr
+from .usercache import invalidate_user
+from .ratelimit import check_redirect
+from .pages import page_response
+from .aggregates import (
+    stats_timezone, daily_series, hourly_series, regroup, bot_scans_total, ua_breakdown, uniques,
+)
+from .hll import STD_ERROR as HLL_STD_ERROR
+from .qrimage import MIMETYPES, image_key, options_params, parse_options, render, get_image_cache
+from .qrexport import select_qrs, iter_zip
+from . import logexport, metrics
+from .archive import last_archived
+from .useragent import classify as classify_ua
 
 main_bp = Blueprint("main", __name__)
 
@@ -26,10 +42,8 @@ def is_valid_http_url(u: str) -> bool:
         return False
 
 def get_client_ip():
-    xff = request.headers.get("X-Forwarded-For", "")
-    if xff:
-        return xff.split(",")[0].strip()
-    return request.remote_addr
+    return client_ip(request.headers.get("X-Forwarded-For", ""), request.remote_addr,
+                     current_app.config["TRUSTED_PROXY_HOPS"])
 
 def is_admin() -> bool:
     return bool(getattr(current_user, "role", None) == "admin")
@@ -57,10 +71,6 @@ def _fetch_qr_by_code_for_png(db, code: str):
         (code, current_user.id),
     ).fetchone()
 
-@main_bp.before_app_request
-def ensure_db():
-    init_db()
-
 # ---------------- AUTH ----------------
 @main_bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -90,6 +100,7 @@ def login():
               )
             """, (email, "Admin", email, pw_hash))
             db.commit()
+            invalidate_user()
             user_row = db.execute(
                 "SELECT * FROM users WHERE email = ? AND is_active = 1",
                 (email,),
@@ -99,7 +110,7 @@ def login():
             flash("Login inválido.")
             return render_template("login.html")
 
-        login_user(DBUser(user_row))
+        login_user(DBUser.from_row(user_row))
         return redirect(url_for("main.dashboard"))
 
     return render_template("login.html")
@@ -135,11 +146,12 @@ def admin_users():
             flash("Já existe um usuário com esse email.")
             return redirect(url_for("main.admin_users"))
 
-        db.execute("""
+        cur = db.execute("""
           INSERT INTO users (name, email, password_hash, role, is_active)
           VALUES (?, ?, ?, ?, 1)
         """, (name, email, generate_password_hash(password), role))
         db.commit()
+        invalidate_user(cur.lastrowid)
         flash("Usuário criado com sucesso!")
         return redirect(url_for("main.admin_users"))
 
@@ -151,36 +163,215 @@ def admin_users():
 
     return render_template("admin_users.html", users=users)
 
+@main_bp.route("/admin/runtime")
+@login_required
+@admin_required
+def admin_runtime():
+    """Contadores em memória deste worker (cache, fila de scans...)."""
+    resolver = current_app.extensions.get("qr_resolver")
+    users = current_app.extensions.get("user_cache")
+    writer = get_scan_writer()
+    deduper = current_app.extensions.get("scan_deduper")
+    limiter = current_app.extensions.get("redirect_limiter")
+    return jsonify({
+        "pid": os.getpid(),
+        "qr_cache": resolver.stats() if resolver else None,
+        "user_cache": users.stats() if users else None,
+        "qr_images": get_image_cache().stats(),
+        "scan_writer": writer.stats() if writer else {"mode": "sync"},
+        "scan_dedup": deduper.stats() if deduper else None,
+        "rate_limit": limiter.stats() if limiter else None,
+        "ua_cache": classify_ua.cache_info()._asdict(),
+    })
+
+@main_bp.route("/metrics")
+def metrics_endpoint():
+    """Métricas Prometheus somadas de todos os workers (token ou admin)."""
+    token = current_app.config.get("METRICS_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    if not (token and hmac.compare_digest(auth.encode(), f"Bearer {token}".encode())):
+        if not current_user.is_authenticated:
+            abort(401)
+        if not is_admin():
+            abort(403)
+    resp = current_app.response_class(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    resp.cache_control.no_store = True
+    return resp
+
 # ---------------- PORTAL ----------------
+# Lista de QRs com paginação keyset: cada página continua a partir da chave
+# (coluna de ordenação, id) da última linha, sem OFFSET.
+# Texto ordena sem diferenciar maiúsculas; a expressão é a mesma dos índices.
+_QR_SORTS = {
+    "created": None,             # id é monotônico: ordem de criação == ordem de id
+    "updated": "q.updated_at",   # idx_qr_codes_updated / idx_qr_codes_owner_updated
+    "scans": "c.scans",          # idx_qr_scan_counters_scans
+    "code": "q.code",            # UNIQUE(code)
+    "description": "COALESCE(q.description, '') COLLATE NOCASE",  # idx_qr_codes_description
+    "status": "q.status",        # idx_qr_codes_status
+    "url": "COALESCE(q.current_url, '') COLLATE NOCASE",  # idx_qr_codes_url
+}
+
+def _encode_cursor(key, qr_id) -> str:
+    raw = json.dumps([key, qr_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(value):
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        key, qr_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    # cursor adulterado (lista, dict, float...) vira primeira página, não erro do SQLite
+    if not isinstance(key, (str, int, type(None))) or isinstance(key, bool):
+        return None
+    if not isinstance(qr_id, int) or isinstance(qr_id, bool):
+        return None
+    return key, qr_id
+
+def _qr_list_args():
+    sort = request.args.get("sort", "created")
+    if sort not in _QR_SORTS:
+        sort = "created"
+    order = "asc" if request.args.get("order") == "asc" else "desc"
+    status = request.args.get("status", "")
+    if status not in ("active", "inactive"):
+        status = ""
+    owner = request.args.get("owner", type=int) if is_admin() else None
+    return {"sort": sort, "order": order, "status": status, "owner": owner}
+
+def _qr_scope(status, owner):
+    """WHERE do escopo: admin vê tudo (ou um dono), user só o que é dele."""
+    where, params = [], []
+    if not is_admin():
+        where.append("q.owner_user_id = ?")
+        params.append(current_user.id)
+    elif owner:
+        where.append("q.owner_user_id = ?")
+        params.append(owner)
+    if status:
+        where.append("q.status = ?")
+        params.append(status)
+    return where, params
+
+def _list_qrs(db, sort, order, status, owner, cursor=None, limit=50):
+    """Uma página da lista. Retorna (rows, next_cursor)."""
+    where, params = _qr_scope(status, owner)
+    key = _QR_SORTS[sort]
+    op = "<" if order == "desc" else ">"
+
+    if sort == "scans":
+        # parte do índice de scans; todo QR tem linha em qr_scan_counters
+        source = "qr_scan_counters c JOIN qr_codes q ON q.id = c.qr_code_id"
+        id_col = "c.qr_code_id"
+    else:
+        source = "qr_codes q LEFT JOIN qr_scan_counters c ON c.qr_code_id = q.id"
+        id_col = "q.id"
+
+    if cursor:
+        if key:
+            # o limite simples repetido deixa o SQLite usar a faixa do índice
+            # (com índice de expressão a comparação de tupla sozinha vira SCAN)
+            where.append(f"{key} {op}= ? AND ({key}, {id_col}) {op} (?, ?)")
+            params.extend((cursor[0], *cursor))
+        else:
+            where.append(f"{id_col} {op} ?")
+            params.append(cursor[1])
+
+    order_by = f"{key} {order}, {id_col} {order}" if key else f"{id_col} {order}"
+    sql = f"""
+      SELECT
+        q.*,
+        u.name  AS owner_name,
+        u.email AS owner_email,
+        COALESCE(c.scans, 0) AS scans,
+        {key or "NULL"} AS sort_key
+      FROM {source}
+      LEFT JOIN users u ON u.id = q.owner_user_id
+      {"WHERE " + " AND ".join(where) if where else ""}
+      ORDER BY {order_by}
+      LIMIT ?
+    """
+    rows = db.execute(sql, (*params, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["sort_key"], last["id"])
+    return rows, next_cursor
+
+def _qr_summary(db, status, owner):
+    where, params = _qr_scope(status, owner)
+    return db.execute(f"""
+      SELECT
+        COUNT(*) AS total,
+        COALESCE(SUM(q.status = 'active'), 0) AS active,
+        COALESCE(SUM(c.scans), 0) AS scans
+      FROM qr_codes q
+      LEFT JOIN qr_scan_counters c ON c.qr_code_id = q.id
+      {"WHERE " + " AND ".join(where) if where else ""}
+    """, params).fetchone()
+
 @main_bp.route("/")
 @login_required
 def dashboard():
-    db = get_db()
+    db = get_read_db()
+    args = _qr_list_args()
+    rows, next_cursor = _list_qrs(
+        db, cursor=_decode_cursor(request.args.get("cursor")),
+        limit=current_app.config["DASHBOARD_PAGE_SIZE"], **args,
+    )
+    summary = _qr_summary(db, args["status"], args["owner"])
 
+    owners = []
     if is_admin():
-        rows = db.execute("""
-          SELECT
-            q.*,
-            u.name  AS owner_name,
-            u.email AS owner_email,
-            (SELECT COUNT(*) FROM qr_access_logs l WHERE l.qr_code_id = q.id) AS scans
-          FROM qr_codes q
-          LEFT JOIN users u ON u.id = q.owner_user_id
-          ORDER BY q.id DESC
-        """).fetchall()
+        owners = db.execute("SELECT id, name, email FROM users ORDER BY COALESCE(name, email)").fetchall()
         scope_label = "Todos os QRs (admin)"
     else:
-        rows = db.execute("""
-          SELECT
-            q.*,
-            (SELECT COUNT(*) FROM qr_access_logs l WHERE l.qr_code_id = q.id) AS scans
-          FROM qr_codes q
-          WHERE q.owner_user_id = ?
-          ORDER BY q.id DESC
-        """, (current_user.id,)).fetchall()
         scope_label = "Seus QRs"
 
-    return render_template("dashboard.html", rows=rows, scope_label=scope_label)
+    return render_template(
+        "dashboard.html",
+        rows=rows,
+        next_cursor=next_cursor,
+        summary=summary,
+        owners=owners,
+        scope_label=scope_label,
+        **args,
+    )
+
+@main_bp.route("/api/qrs")
+@login_required
+def api_qrs():
+    """Mesma lista do dashboard em JSON (carregamento das próximas páginas)."""
+    db = get_read_db()
+    args = _qr_list_args()
+    limit = max(1, min(request.args.get("limit", type=int) or current_app.config["DASHBOARD_PAGE_SIZE"], 500))
+    rows, next_cursor = _list_qrs(db, cursor=_decode_cursor(request.args.get("cursor")), limit=limit, **args)
+
+    items = []
+    for r in rows:
+        items.append({
+            "id": r["id"],
+            "code": r["code"],
+            "description": r["description"],
+            "status": r["status"],
+            "current_url": r["current_url"],
+            "scans": r["scans"],
+            "owner_name": r["owner_name"] if is_admin() else None,
+            "owner_email": r["owner_email"] if is_admin() else None,
+            "created_at": r["created_at"],
+            "updated_at": r["updated_at"],
+            "edit_url": url_for("main.edit_qr", qr_id=r["id"]),
+            "stats_url": url_for("main.qr_stats", qr_id=r["id"]),
+            "png_url": url_for("main.qr_png", code=r["code"]),
+            "svg_url": url_for("main.qr_svg", code=r["code"]),
+            "redirect_url": url_for("main.redirect_qr", code=r["code"]),
+        })
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 @main_bp.route("/qr/new", methods=["POST"])
 @login_required
@@ -199,6 +390,7 @@ def new_qr():
           VALUES (?, NULL, 'active', ?, ?, ?, ?)
         """, (code, description, current_user.id, _now_utc(), _now_utc()))
         db.commit()
+        invalidate_qr(code)
         flash("QR criado com sucesso.")
     except Exception:
         flash("Esse código já existe.")
@@ -229,172 +421,279 @@ def edit_qr(qr_id: int):
           WHERE id = ?
         """, (current_url if current_url else None, description, status, _now_utc(), qr_id))
         db.commit()
+        invalidate_qr(qr["code"])
         flash("Atualizado.")
         return redirect(url_for("main.dashboard"))
 
     public_url = f"{current_app.config['BASE_URL'].rstrip('/')}/r/{qr['code']}"
     return render_template("edit_qr.html", qr=qr, public_url=public_url)
 
-# @main_bp.route("/qr/<int:qr_id>/stats")
-# @login_required
-# def qr_stats(qr_id: int):
-#     db = get_db()
-#     qr = _fetch_qr_or_404(db, qr_id)
-
-#     total = db.execute(
-#         "SELECT COUNT(*) AS c FROM qr_access_logs WHERE qr_code_id = ?",
-#         (qr_id,)
-#     ).fetchone()["c"]
+# # Janela padrão (em dias) de cada agrupamento quando não há start/end
+_STATS_DEFAULT_DAYS = {"hour": 2, "day": 30, "week": 84, "month": 365}
+_STATS_TITLES = {
+    "hour": ("hora", "Scans por hora (últimas 48 horas)"),
+    "day": ("dia", "Scans por dia (últimos 30 dias)"),
+    "week": ("semana", "Scans por semana (últimas 12 semanas)"),
+    "month": ("mês", "Scans por mês (últimos 12 meses)"),
+}
 
-#     last = db.execute("""
-#         SELECT accessed_at, ip_address, user_agent, referer
-#         FROM qr_access_logs
-#         WHERE qr_code_id = ?
-#         ORDER BY id DESC
-#         LIMIT 20
-#     """, (qr_id,)).fetchall()
-
-#     return render_template("stats.html", qr=qr, total=total, last=last)
+def _parse_day(value):
+    try:
+        return datetime.strptime((value or "").strip(), "%Y-%m-%d").date()
+    except ValueError:
+        return None
 
 @main_bp.route("/qr/<int:qr_id>/stats")
 @login_required
 def qr_stats(qr_id: int):
-    db = get_db()
+    db = get_read_db()
     qr = _fetch_qr_or_404(db, qr_id)
 
-    # group: day | week | month
+    # group: hour | day | week | month
     group = (request.args.get("group") or "day").strip().lower()
-    if group not in ("day", "week", "month"):
+    if group not in _STATS_DEFAULT_DAYS:
         group = "day"
 
-    total = db.execute(
-        "SELECT COUNT(*) AS c FROM qr_access_logs WHERE qr_code_id = ?",
+    row = db.execute(
+        "SELECT scans FROM qr_scan_counters WHERE qr_code_id = ?",
         (qr_id,)
-    ).fetchone()["c"]
+    ).fetchone()
+    total = row["scans"] if row else 0
+
+    # hits repetidos na janela de deduplicação: não entram em total nem nos gráficos
+    row = db.execute("SELECT hits FROM qr_scan_suppressed WHERE qr_code_id = ?", (qr_id,)).fetchone()
+    suppressed = row["hits"] if row else 0
+
+    # bots de preview de link (WhatsApp, Telegram...) inflam os scans
+    exclude_bots = request.args.get("exclude_bots") == "1"
+    bot_scans = bot_scans_total(db, qr_id)
+    if exclude_bots:
+        total -= bot_scans
 
     last = db.execute("""
         SELECT accessed_at, ip_address, user_agent, referer
         FROM qr_access_logs
         WHERE qr_code_id = ?
-        ORDER BY id DESC
+        ORDER BY ts DESC, id DESC
         LIMIT 20
     """, (qr_id,)).fetchall()
+    if len(last) < 20:
+        # logs mais antigos podem já estar arquivados
+        last += last_archived(db, qr_id, 20 - len(last))
+
+    # Intervalo em dias locais (STATS_TIMEZONE), inclusivo. Os gráficos saem
+    # dos rollups (qr_scan_daily / qr_scan_hourly), não dos logs brutos.
+    tz = stats_timezone()
+    start = _parse_day(request.args.get("start"))
+    end = _parse_day(request.args.get("end"))
+    custom = bool(start or end)
+    end = end or datetime.now(tz).date()
+    start = start or end - timedelta(days=_STATS_DEFAULT_DAYS[group] - 1)
+    if start > end:
+        start, end = end, start
+    if group == "hour" and (end - start).days > 31:
+        start = end - timedelta(days=31)
+
+    if group == "hour":
+        series = hourly_series(
+            db, qr_id,
+            datetime.combine(start, dtime.min, tz),
+            datetime.combine(end + timedelta(days=1), dtime.min, tz),
+            exclude_bots=exclude_bots,
+        )
+    else:
+        series = regroup(daily_series(db, qr_id, start.isoformat(), end.isoformat(), exclude_bots), group)
 
-    # Agrupamento (SQLite): accessed_at está em ISO (UTC) salvo como texto
-    # Usamos substr para pegar yyyy-mm-dd / yyyy-mm / yyyy-mm-dd (base p/ semana)
-    if group == "day":
-        # Últimos 30 dias
-        rows = db.execute("""
-            SELECT substr(accessed_at, 1, 10) AS bucket, COUNT(*) AS c
-            FROM qr_access_logs
-            WHERE qr_code_id = ?
-              AND accessed_at >= datetime('now','-30 day')
-            GROUP BY bucket
-            ORDER BY bucket
-        """, (qr_id,)).fetchall()
-        chart_title = "Scans por dia (últimos 30 dias)"
-
-    elif group == "month":
-        # Últimos 12 meses
-        rows = db.execute("""
-            SELECT substr(accessed_at, 1, 7) AS bucket, COUNT(*) AS c
-            FROM qr_access_logs
-            WHERE qr_code_id = ?
-              AND accessed_at >= datetime('now','-365 day')
-            GROUP BY bucket
-            ORDER BY bucket
-        """, (qr_id,)).fetchall()
-        chart_title = "Scans por mês (últimos 12 meses)"
+    breakdown = ua_breakdown(db, qr_id, start.isoformat(), end.isoformat(), exclude_bots)
 
-    else:
-        # week (ISO-ish): agrupamos pela "segunda-feira" da semana
-        # date(substr(accessed_at,1,10), 'weekday 1', '-7 days') => Monday da semana
-        rows = db.execute("""
-            SELECT
-              date(substr(accessed_at, 1, 10), 'weekday 1', '-7 days') AS bucket,
-              COUNT(*) AS c
-            FROM qr_access_logs
-            WHERE qr_code_id = ?
-              AND accessed_at >= datetime('now','-84 day')  -- ~12 semanas
-            GROUP BY bucket
-            ORDER BY bucket
-        """, (qr_id,)).fetchall()
-        chart_title = "Scans por semana (últimas 12 semanas)"
-
-    labels = [r["bucket"] for r in rows]
-    values = [r["c"] for r in rows]
+    # Visitantes únicos (ip + UA, sem bots): merge dos sketches HLL diários.
+    # Por hora não há sketch: só o total do período.
+    unique_total, unique_buckets = uniques(db, qr_id, start.isoformat(), end.isoformat(), group)
+
+    unit, chart_title = _STATS_TITLES[group]
+    if custom:
+        chart_title = f"Scans por {unit} ({start:%d/%m/%Y} a {end:%d/%m/%Y})"
+
+    labels = [b for b, _ in series]
+    values = [n for _, n in series]
+    unique_values = [unique_buckets.get(b, 0) for b in labels] if group != "hour" else []
 
     return render_template(
         "stats.html",
         qr=qr,
         total=total,
+        bot_scans=bot_scans,
+        suppressed=suppressed,
+        dedup_window=current_app.config.get("SCAN_DEDUP_WINDOW", 0),
+        exclude_bots=exclude_bots,
+        breakdown=breakdown,
+        unique_total=unique_total,
+        unique_values=unique_values,
+        unique_error_pct=round(HLL_STD_ERROR * 100, 1),
         last=last,
         group=group,
         chart_title=chart_title,
         labels=labels,
-        values=values
+        values=values,
+        start=start.isoformat() if custom else "",
+        end=end.isoformat() if custom else "",
+        tz_name=current_app.config.get("STATS_TIMEZONE", "")
     )
 
 
-@main_bp.route("/qr/<code>/png")
+def _scans_export_response(qrs, basename: str, fmt: str):
+    """Resposta em streaming com os scans de qrs (?start=&end= em dias locais, ?gzip=1)."""
+    if fmt not in logexport.MIMETYPES:
+        abort(404)
+    start_ms, end_ms = logexport.day_range_ms(
+        _parse_day(request.args.get("start")), _parse_day(request.args.get("end")), stats_timezone()
+    )
+    gz = request.args.get("gzip") in ("1", "true", "yes")
+
+    # Conexão própria: o corpo é gerado depois do teardown do request
+    readonly = current_app.config.get("DB_READ_ONLY_CONNECTIONS", True)
+    db = current_app.extensions["db"].connect(readonly=readonly)
+    body = logexport.iter_export(db, qrs, fmt, start_ms, end_ms,
+                                 chunk=current_app.config["SCAN_EXPORT_CHUNK"], gzip=gz, close=True)
+
+    filename = f"{basename}.{fmt}" + (".gz" if gz else "")
+    resp = current_app.response_class(body, mimetype="application/gzip" if gz else logexport.MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp.cache_control.no_store = True
+    return resp
+
+@main_bp.route("/qr/<int:qr_id>/scans.<fmt>")
 @login_required
-def qr_png(code: str):
+def qr_scans_export(qr_id: int, fmt: str):
+    """Scans brutos de um QR (mesmo escopo do stats)."""
+    qr = _fetch_qr_or_404(get_read_db(), qr_id)
+    return _scans_export_response([(qr["id"], qr["code"])], f"scans-qr-{qr_id}", fmt)
+
+@main_bp.route("/scans/export.<fmt>")
+@login_required
+def scans_export(fmt: str):
+    """Scans brutos de todos os QRs do usuário (admin: todos, ou ?owner=)."""
+    owner = request.args.get("owner", type=int) if is_admin() else current_user.id
+    qrs = select_qrs(get_read_db(), owner_id=owner)
+    return _scans_export_response(qrs, f"scans-{owner or 'todos'}", fmt)
+
+def _qr_image_response(code: str, fmt: str):
+    """PNG/SVG do QR (?size=&border=&ecc=), com cache por conteúdo e ETag."""
     db = get_db()
     qr = _fetch_qr_by_code_for_png(db, code)
     if not qr:
         abort(404)
+    try:
+        opts = parse_options(request.args, fmt=fmt)
+    except ValueError:
+        abort(400)
 
     base_url = current_app.config["BASE_URL"].rstrip("/")
     qr_url = f"{base_url}/r/{code}"
 
-    img = qrcode.make(qr_url)
+    # A imagem só depende do payload e das opções: a chave do cache é também
+    # o ETag, então um If-None-Match válido responde 304 sem renderizar nada
+    # (comparação fraca: o SVG comprimido sai com W/"...").
+    key = image_key(qr_url, options_params(opts))
+    if request.if_none_match.contains_weak(key):
+        resp = current_app.response_class(status=304)
+    else:
+        data = get_image_cache().get_or_render(key, fmt, lambda: render(qr_url, opts))
+        resp = send_file(io.BytesIO(data), mimetype=MIMETYPES[fmt], as_attachment=True,
+                         download_name=f"{code}.{fmt}", conditional=False)
+    resp.set_etag(key)
+    resp.cache_control.no_cache = None
+    resp.cache_control.private = True
+    resp.cache_control.max_age = current_app.config["QR_IMAGE_MAX_AGE"]
+    return resp
 
-    tmp_dir = os.path.join(os.getcwd(), "_tmp")
-    os.makedirs(tmp_dir, exist_ok=True)
-    tmp_path = os.path.join(tmp_dir, f"{code}.png")
+@main_bp.route("/qr/<code>/png")
+@login_required
+def qr_png(code: str):
+    return _qr_image_response(code, "png")
+
+@main_bp.route("/qr/<code>/svg")
+@login_required
+def qr_svg(code: str):
+    return _qr_image_response(code, "svg")
+
+@main_bp.route("/qr/export.zip")
+@login_required
+def qr_export_zip():
+    """ZIP (em streaming) com a imagem de cada QR: ?ids=1,2,3 e/ou ?status=&owner=.
 
-    img.save(tmp_path)
-    return send_file(tmp_path, mimetype="image/png", as_attachment=True, download_name=f"{code}.png")
+    Aceita as mesmas opções de renderização do PNG/SVG (?format=&size=&border=&ecc=).
+    """
+    try:
+        ids = [int(x) for x in request.args.get("ids", "").split(",") if x.strip()]
+        opts = parse_options(request.args)
+    except ValueError:
+        abort(400)
+    status = request.args.get("status", "")
+    if status not in ("", "active", "inactive"):
+        abort(400)
+    # mesmo escopo do PNG: admin tudo (ou um dono), user só dele
+    owner = request.args.get("owner", type=int) if is_admin() else current_user.id
+
+    items = select_qrs(get_read_db(), ids=ids, status=status, owner_id=owner)
+    if not items:
+        abort(404)
+    if len(items) > current_app.config["QR_EXPORT_MAX_ITEMS"]:
+        abort(413)
+
+    base_url = current_app.config["BASE_URL"].rstrip("/")
+    body = iter_zip(items, base_url, get_image_cache(), current_app.config["QR_RENDER_WORKERS"], opts)
+    resp = current_app.response_class(body, mimetype="application/zip")
+    resp.headers["Content-Disposition"] = 'attachment; filename="qrcodes.zip"'
+    resp.cache_control.no_store = True
+    return resp
 
 # ---------------- PUBLIC REDIRECT ----------------
+# Respostas do /r/<code>, compartilhadas com o fast path WSGI (app/fastpath.py)
+QR_NOT_FOUND = ("QR Code não encontrado.", 404)
+QR_DISABLED = ("Este QR está desativado.", 410)
+QR_UNAVAILABLE = ("Este imóvel não está disponível no momento.", 200)
+QR_RATE_LIMITED = ("Muitas leituras seguidas. Tente novamente em instantes.", 429)
+
 @main_bp.route("/r/<code>")
 def redirect_qr(code: str):
+    ip = get_client_ip()
+    log_scan, retry_after = check_redirect(current_app, ip, code)
+    if retry_after is not None:
+        return QR_RATE_LIMITED + ({"Retry-After": str(retry_after)},)
+
     db = get_db()
-    qr = db.execute("SELECT * FROM qr_codes WHERE code = ?", (code,)).fetchone()
+    qr = resolve_qr(db, code)
 
     if not qr:
-        return ("QR Code não encontrado.", 404)
+        return QR_NOT_FOUND
 
-    # loga acesso
-    db.execute("""
-      INSERT INTO qr_access_logs (qr_code_id, accessed_at, ip_address, user_agent, referer)
-      VALUES (?, ?, ?, ?, ?)
-    """, (
-        qr["id"],
-        _now_utc(),
-        get_client_ip(),
-        request.headers.get("User-Agent", ""),
-        request.headers.get("Referer", "")
-    ))
-    db.commit()
+    # loga acesso (write-behind: o 302 sai antes do scan ser gravado)
+    if log_scan:
+        record_scan(new_scan(
+            qr.id,
+            ip,
+            request.headers.get("User-Agent", ""),
+            request.headers.get("Referer", ""),
+        ))
 
-    if qr["status"] != "active":
-        return ("Este QR está desativado.", 410)
+    if qr.status != "active":
+        return QR_DISABLED
 
-    if not is_valid_http_url(qr["current_url"] or ""):
-        return ("Este imóvel não está disponível no momento.", 200)
+    if not is_valid_http_url(qr.current_url or ""):
+        return QR_UNAVAILABLE
 
-    return redirect(qr["current_url"], code=302)
+    return redirect(qr.current_url, code=302)
 
 @main_bp.route("/land")
 def land():
-    return render_template("land.html")
+    return page_response("land.html")
 
 @main_bp.route("/landing")
 def landing():
-    return render_template("landing.html")
+    return page_response("landing.html")
 
 @main_bp.route("/landing_new")
 def landing_new():
-    return render_template("landing_new.html")
+    return page_response("landing_new.html")
 
@@ -0,0 +1,296 @@
+"""Gravação dos scans do /r/<code> (qr_access_logs).
+
+No modo "async" (write-behind) o redirect só enfileira o scan em memória e
+uma thread em background grava os lotes com executemany, uma transação por
+lote. No modo "sync" cada scan é gravado dentro do próprio request.
+
+Hits repetidos na janela de deduplicação não viram scan: só somam em
+qr_scan_suppressed (por QR), junto do próximo lote no modo async ou na hora
+no modo sync.
+"""
+import atexit
+import calendar
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from flask import current_app
+
+from .db import get_db
+from .aggregates import apply_scans
+from . import metrics
+from .useragent import classify
+from .dedup import ScanDeduper
+
+log = logging.getLogger(__name__)
+
+# accessed_at: ISO em UTC (legado, exibição); ts: epoch em ms (filtros e índices)
+# ua_*/is_bot: classificação do User-Agent (app/useragent.py)
+Scan = namedtuple("Scan", "qr_code_id accessed_at ip_address user_agent referer ts ua_device ua_os ua_browser is_bot")
+
+_INSERT_SQL = """
+  INSERT INTO qr_access_logs
+    (qr_code_id, accessed_at, ip_address, user_agent, referer, ts, ua_device, ua_os, ua_browser, is_bot)
+  VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SUPPRESSED_SQL = """
+  INSERT INTO qr_scan_suppressed (qr_code_id, hits) VALUES (?, ?)
+  ON CONFLICT(qr_code_id) DO UPDATE SET hits = hits + excluded.hits
+"""
+
+
+def epoch_ms(dt: datetime) -> int:
+    """datetime UTC ingênuo -> epoch em milissegundos."""
+    return calendar.timegm(dt.utctimetuple()) * 1000 + dt.microsecond // 1000
+
+
+def new_scan(qr_code_id, ip_address, user_agent, referer, now=None):
+    now = now or datetime.utcnow()
+    return Scan(qr_code_id, now.isoformat(), ip_address, user_agent, referer, epoch_ms(now),
+                *classify(user_agent))
+
+
+def write_scans(db, scans, suppressed=None):
+    """Grava um lote de scans (e seus agregados) e as repetições suprimidas
+    ({qr_code_id: n}) numa única transação."""
+    try:
+        if scans:
+            db.executemany(_INSERT_SQL, scans)
+            apply_scans(db, scans)
+        if suppressed:
+            db.executemany(_SUPPRESSED_SQL, suppressed.items())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if scans:
+        metrics.inc("qr_scans_written_total", value=len(scans))
+
+
+class ScanWriter:
+    """Fila em memória + thread que grava os scans em lotes."""
+
+    def __init__(self, connect, batch_size=200, flush_interval=0.5, max_queue=10000,
+                 drain_on_shutdown=True, shutdown_timeout=10.0, max_retries=3, deduper=None):
+        self._connect = connect
+        self.deduper = deduper
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self.max_queue = max(1, max_queue)
+        self.drain_on_shutdown = drain_on_shutdown
+        self.shutdown_timeout = shutdown_timeout
+        self.max_retries = max(1, max_retries)
+
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "rejected": 0, "dropped": 0,
+                       "restarts": 0}
+        self._reset()
+        atexit.register(self.stop)
+
+    def _reset(self):
+        # Estado por processo: depois de um fork (gunicorn --preload) a thread
+        # do pai não existe no filho, então tudo é recriado.
+        self._pid = os.getpid()
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._thread = None
+        self._stopping = False
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._stopping:
+            return
+        if self._thread is not None:
+            if self._thread.is_alive():
+                return
+            # a thread morreu (erro fora do _write): sobe outra, a fila continua
+            log.warning("scan-writer: thread parada, reiniciando (%d na fila)", len(self._queue))
+            self._stats["restarts"] += 1
+        self._thread = threading.Thread(target=self._run, name="scan-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, scan) -> bool:
+        """Enfileira o scan. Retorna False se a fila estiver cheia (ou parada)."""
+        with self._cond:
+            self._ensure_started()
+            if self._stopping or len(self._queue) >= self.max_queue:
+                self._stats["rejected"] += 1
+                return False
+            self._queue.append(scan)
+            self._stats["enqueued"] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        return True
+
+    def flush(self, timeout=None) -> bool:
+        """Espera a fila esvaziar (útil em CLI/benchmarks). Retorna True se esvaziou."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._pid != os.getpid() or self._thread is None:
+                return not self._queue
+            self._ensure_started()
+            self._cond.notify_all()
+            while self._queue or self._inflight or (self.deduper and self.deduper.has_pending()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else self.flush_interval)
+        return True
+
+    def stop(self):
+        """Para a thread; grava o que falta se drain_on_shutdown estiver ligado."""
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._stopping = True
+            if not self.drain_on_shutdown:
+                self._stats["dropped"] += len(self._queue)
+                self._queue.clear()
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.shutdown_timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, queued=len(self._queue), mode="async")
+
+    def _take_batch(self):
+        n = min(self.batch_size, len(self._queue))
+        return [self._queue.popleft() for _ in range(n)]
+
+    def _run(self):
+        db = None
+        try:
+            db = self._connect()
+            while True:
+                with self._cond:
+                    if len(self._queue) < self.batch_size and not self._stopping:
+                        self._cond.wait(self.flush_interval)
+                    batch = self._take_batch()
+                    suppressed = self.deduper.take_pending() if self.deduper else None
+                    self._inflight = len(batch) + len(suppressed or ())
+                    stopping = self._stopping
+                if batch or suppressed:
+                    self._write(db, batch, suppressed)
+                    with self._cond:
+                        self._inflight = 0
+                        self._cond.notify_all()
+                elif stopping:
+                    return
+        except Exception:
+            log.exception("scan-writer: thread encerrada por erro; reinicia no próximo scan")
+        finally:
+            with self._cond:
+                self._inflight = 0
+                self._cond.notify_all()
+            if db is not None:
+                db.close()
+
+    def _write(self, db, batch, suppressed=None):
+        # Erro do SQLite (lock, disco) é tentado de novo; qualquer outro (dado
+        # inválido, bug) descarta o lote na hora: repetir não adianta, e a
+        # thread precisa continuar viva para os próximos.
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                write_scans(db, batch, suppressed)
+            except Exception as e:
+                if attempt == self.max_retries or not isinstance(e, sqlite3.Error):
+                    log.exception("scan-writer: descartando lote de %d scans (+ repetições de %d QRs)",
+                                  len(batch), len(suppressed or ()))
+                    with self._cond:
+                        self._stats["dropped"] += len(batch)
+                    return
+                time.sleep(0.1 * attempt)
+            else:
+                with self._cond:
+                    self._stats["written"] += len(batch)
+                    self._stats["batches"] += 1 if batch else 0
+                return
+
+
+def init_app(app):
+    if app.config.get("SCAN_DEDUP_WINDOW", 0) > 0:
+        app.extensions["scan_deduper"] = ScanDeduper(
+            window=app.config["SCAN_DEDUP_WINDOW"],
+            max_keys=app.config["SCAN_DEDUP_MAX_KEYS"],
+        )
+
+    if app.config.get("SCAN_LOG_MODE") != "async":
+        return
+
+    app.extensions["scan_writer"] = ScanWriter(
+        app.extensions["db"].connect,
+        batch_size=app.config["SCAN_LOG_BATCH_SIZE"],
+        flush_interval=app.config["SCAN_LOG_FLUSH_INTERVAL"],
+        max_queue=app.config["SCAN_LOG_MAX_QUEUE"],
+        drain_on_shutdown=app.config["SCAN_LOG_DRAIN_ON_SHUTDOWN"],
+        shutdown_timeout=app.config["SCAN_LOG_SHUTDOWN_TIMEOUT"],
+        deduper=app.extensions.get("scan_deduper"),
+    )
+
+
+def get_scan_writer():
+    return current_app.extensions.get("scan_writer")
+
+
+def record_scan(scan, app=None):
+    """Registra um scan: enfileira no writer ou grava na hora (modo sync / fila cheia).
+
+    Repetições dentro da janela de deduplicação (app/dedup.py) não gravam
+    scan: somam em qr_scan_suppressed (pelo writer, ou na hora sem ele).
+
+    Fora de um app context (fast path do /r/) passe o app: a gravação direta
+    usa a conexão persistente da thread.
+    """
+    extensions = (app or current_app).extensions
+    deduper = extensions.get("scan_deduper")
+    writer = extensions.get("scan_writer")
+    if deduper is not None and deduper.is_duplicate(scan.qr_code_id, scan.ip_address, scan.user_agent):
+        metrics.inc("qr_scans_deduplicated_total")
+        if writer is None:
+            write_scans(get_db() if app is None else extensions["db"].connection(), (), deduper.take_pending())
+        return
+    if writer is not None and writer.enqueue(scan):
+        metrics.inc("qr_scans_recorded_total", (("mode", "async"),))
+        return
+    write_scans(get_db() if app is None else extensions["db"].connection(), [scan])
+    metrics.inc("qr_scans_recorded_total", (("mode", "sync"),))
+
+
+def _strip_port(ip):
+    # alguns proxies (ex.: Azure App Service) mandam "ip:porta" / "[ipv6]:porta"
+    if ip.startswith("["):
+        return ip[1:ip.find("]")] if "]" in ip else ip
+    if ip.count(":") == 1:
+        return ip.split(":", 1)[0]
+    return ip
+
+
+def client_ip(forwarded_for, remote_addr, trusted_hops=None):
+    """IP do cliente a partir do X-Forwarded-For (sem a porta).
+
+    trusted_hops=None: o primeiro endereço do header, como sempre foi (o
+    cliente pode forjá-lo mandando o próprio X-Forwarded-For). Com N proxies
+    confiáveis, cada um acrescenta à direita o endereço de quem o chamou,
+    então o cliente é o N-ésimo a partir da direita; com menos de N
+    endereços no header vale o remote_addr. 0 ignora o header (acesso
+    direto, sem proxy).
+    """
+    if trusted_hops == 0 or not forwarded_for:
+        return remote_addr
+    hops = [h.strip() for h in forwarded_for.split(",") if h.strip()]
+    if not hops:
+        return remote_addr
+    if trusted_hops is None:
+        return _strip_port(hops[0])
+    if len(hops) < trusted_hops:
+        # menos hops que proxies: o header não passou por todos, não confia
+        return remote_addr
+    return _strip_port(hops[-trusted_hops])
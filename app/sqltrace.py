@@ -0,0 +1,241 @@
+"""Perfil das queries SQLite (opt-in: SQL_TRACE=1).
+
+Com o trace ligado as conexões do ConnectionManager passam a ser
+TracingConnection: cada statement é cronometrado do execute até a última
+linha lida (no SQLite o fetch é a maior parte do custo de um SELECT) e tem
+as linhas contadas. Statements acima de SQL_SLOW_MS vão para o log
+"app.sqltrace" (ou SQL_SLOW_LOG) com o EXPLAIN QUERY PLAN. Em cada request
+o tempo total no banco e o número de queries saem no header Server-Timing,
+visível no devtools do navegador; com o logger em DEBUG a lista completa de
+statements do request também é logada.
+
+Desligado, nada disso roda: as conexões continuam sendo as de metrics.py.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request
+
+from . import metrics
+
+log = logging.getLogger("app.sqltrace")
+
+_local = threading.local()
+_slow_s = 0.1
+
+# statements sem plano a mostrar
+_NO_PLAN = ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA", "SAVEPOINT", "RELEASE", "EXPLAIN")
+
+
+class Statement:
+    __slots__ = ("conn", "sql", "params", "seconds", "rows", "done")
+
+    def __init__(self, conn, sql, params):
+        self.conn = conn
+        self.sql = sql
+        self.params = params
+        self.seconds = 0.0
+        self.rows = 0
+        self.done = False
+
+
+class Trace:
+    """Statements de um request (ou de qualquer trecho entre start() e stop())."""
+
+    def __init__(self):
+        self.statements = []
+        self.started = time.perf_counter()
+
+    @property
+    def db_seconds(self):
+        return sum(s.seconds for s in self.statements)
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        return (f'db;dur={self.db_seconds * 1000:.1f};desc="{len(self.statements)} queries", '
+                f"app;dur={total * 1000:.1f}")
+
+
+def start():
+    _local.trace = Trace()
+    return _local.trace
+
+
+def stop():
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    return trace
+
+
+def _short(sql) -> str:
+    return " ".join(sql.split())
+
+
+def _finish(stmt):
+    if stmt.done:
+        return
+    stmt.done = True
+    if stmt.seconds < _slow_s:
+        return
+    plan = ""
+    if stmt.params is not None and not _short(stmt.sql).upper().startswith(_NO_PLAN):
+        try:
+            # execute "cru" da conexão (sem trace nem métricas)
+            rows = sqlite3.Connection.execute(stmt.conn, "EXPLAIN QUERY PLAN " + stmt.sql, stmt.params).fetchall()
+            plan = "\n".join(f"  {r[3]}" for r in rows)
+        except Exception as e:  # statement com bind diferente, conexão fechada...
+            plan = f"  (sem plano: {e})"
+    params = repr(stmt.params)
+    if len(params) > 200:
+        params = params[:200] + "..."
+    log.warning("query lenta: %.1f ms, %d linhas: %s params=%s\n%s",
+                stmt.seconds * 1000, stmt.rows, _short(stmt.sql), params, plan)
+
+
+class TracingCursor(sqlite3.Cursor):
+    _stmt = None
+
+    def _begin(self, sql, params):
+        self._end()
+        stmt = Statement(self.connection, sql, params)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.statements.append(stmt)
+        self._stmt = stmt
+        return stmt
+
+    def _end(self):
+        if self._stmt is not None:
+            stmt, self._stmt = self._stmt, None
+            _finish(stmt)
+
+    def _after(self, stmt, t, op):
+        elapsed = time.perf_counter() - t
+        stmt.seconds += elapsed
+        metrics.observe("db_query_duration_seconds", (("op", op),), elapsed)
+        if self.description is None:
+            # sem linhas para ler (INSERT/UPDATE/DDL): terminou aqui
+            stmt.rows = max(self.rowcount, 0)
+            self._end()
+
+    def execute(self, sql, parameters=(), /):
+        stmt = self._begin(sql, parameters)
+        t = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._after(stmt, t, "execute")
+
+    def executemany(self, sql, parameters, /):
+        stmt = self._begin(sql, None)  # os parâmetros podem ser um gerador
+        t = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._after(stmt, t, "executemany")
+
+    def _fetched(self, t, n, exhausted):
+        stmt = self._stmt
+        if stmt is not None:
+            stmt.seconds += time.perf_counter() - t
+            stmt.rows += n
+            if exhausted:
+                self._end()
+
+    def fetchone(self):
+        t = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        t = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(t, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        t = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t, len(rows), True)
+        return rows
+
+    def __next__(self):
+        t = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(t, 0, True)
+            raise
+        self._fetched(t, 1, False)
+        return row
+
+    def close(self):
+        self._end()
+        super().close()
+
+
+class TracingConnection(metrics.InstrumentedConnection):
+    """Conexão cujos cursores registram cada statement no trace da thread."""
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters, /):
+        return self.cursor().executemany(sql, parameters)
+
+    def commit(self):
+        stmt = Statement(self, "COMMIT", None)
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.statements.append(stmt)
+        t = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            stmt.seconds = time.perf_counter() - t
+            _finish(stmt)
+
+
+# ---------------- FLASK ----------------
+
+def _start_request():
+    start()
+
+
+def _finish_request(response):
+    trace = stop()
+    if trace is None:
+        return response
+    # SELECTs lidos só em parte (fetchone sem esgotar o cursor) fecham aqui
+    for stmt in trace.statements:
+        _finish(stmt)
+    response.headers["Server-Timing"] = trace.server_timing()
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s %s: %d queries, %.1f ms no banco\n%s", request.method, request.path,
+                  len(trace.statements), trace.db_seconds * 1000,
+                  "\n".join(f"  {s.seconds * 1000:7.2f} ms {s.rows:6d} linhas  {_short(s.sql)[:160]}"
+                            for s in trace.statements))
+    return response
+
+
+def init_app(app):
+    global _slow_s
+    if not app.config.get("SQL_TRACE"):
+        return
+    _slow_s = app.config.get("SQL_SLOW_MS", 100) / 1000.0
+    app.extensions["db"].factory = TracingConnection
+    path = app.config.get("SQL_SLOW_LOG")
+    if path and not any(getattr(h, "baseFilename", None) == os.path.abspath(path) for h in log.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(asctime)s [%(process)d] %(levelname)s %(message)s"))
+        log.addHandler(handler)
+    log.setLevel(logging.DEBUG if app.config.get("SQL_TRACE_ALL") else logging.INFO)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
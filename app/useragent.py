@@ -0,0 +1,101 @@
+"""Classificação do User-Agent dos scans (dispositivo, SO, navegador, bot).
+
+Roda na ingestão, e o resultado vai para colunas inteiras em qr_access_logs
+(índices nas tuplas abaixo; nunca reordene, só acrescente no fim). O conjunto
+de UAs distintos é pequeno perto do volume de scans, então classify() é
+memoizado com LRU.
+
+Bots de preview de link (WhatsApp, Telegram, Facebook...) buscam a URL quando
+o corretor compartilha o link e inflam os scans; eles contam como device "bot".
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+DEVICES = ("other", "mobile", "tablet", "desktop", "bot")
+OSES = ("other", "iOS", "Android", "Windows", "macOS", "Linux", "ChromeOS")
+BROWSERS = (
+    "other", "Chrome", "Safari", "Firefox", "Edge", "Samsung", "Opera",
+    "WhatsApp", "Instagram", "Facebook", "Telegram", "Bot",
+)
+
+DEVICE_BOT = DEVICES.index("bot")
+
+UAInfo = namedtuple("UAInfo", "device os browser is_bot")
+
+# Preview de link / crawlers / clientes HTTP (o WhatsApp real não tem "Mozilla")
+_BOT_RE = re.compile(
+    r"^WhatsApp/|TelegramBot|facebookexternalhit|facebookcatalog|Twitterbot|Slackbot|"
+    r"LinkedInBot|Discordbot|SkypeUriPreview|Pinterestbot|Googlebot|bingbot|Applebot|"
+    r"YandexBot|DuckDuckBot|Baiduspider|HeadlessChrome|Lighthouse|curl/|Wget/|"
+    r"python-requests|python-urllib|aiohttp|Go-http-client|okhttp|Java/|"
+    r"crawler|spider|preview",
+    re.IGNORECASE,
+)
+# "bot" genérico (AhrefsBot, PetalBot, MJ12bot, "bot/1.0"...), com caixa:
+# "BOT" maiúsculo é nome de aparelho (CUBOT) e não conta
+_BOT_WORD_RE = re.compile(r"(?<![A-Z])[Bb]ot\b")
+
+# (regex, navegador): a ordem importa (Edge/Samsung/Opera também dizem "Chrome")
+_BROWSER_RULES = [
+    (re.compile(r"Instagram"), "Instagram"),
+    (re.compile(r"FBAN|FBAV|FB_IAB|facebookexternalhit"), "Facebook"),
+    (re.compile(r"WhatsApp", re.I), "WhatsApp"),
+    (re.compile(r"Telegram", re.I), "Telegram"),
+    (re.compile(r"Edg(e|A|iOS)?/"), "Edge"),
+    (re.compile(r"SamsungBrowser/"), "Samsung"),
+    (re.compile(r"OPR/|Opera"), "Opera"),
+    (re.compile(r"Firefox/|FxiOS/"), "Firefox"),
+    (re.compile(r"Chrome/|CriOS/"), "Chrome"),
+    (re.compile(r"Safari/"), "Safari"),
+]
+
+_OS_RULES = [
+    (re.compile(r"iPhone|iPad|iPod|iOS"), "iOS"),
+    (re.compile(r"Android"), "Android"),
+    (re.compile(r"CrOS"), "ChromeOS"),
+    (re.compile(r"Windows"), "Windows"),
+    (re.compile(r"Mac OS X|Macintosh"), "macOS"),
+    (re.compile(r"Linux|X11"), "Linux"),
+]
+
+_TABLET_RE = re.compile(r"iPad|Tablet|Android(?!.*Mobile)", re.IGNORECASE)
+_MOBILE_RE = re.compile(r"Mobi|iPhone|iPod|Android|Windows Phone", re.IGNORECASE)
+
+
+def _first(rules, ua, default="other"):
+    for rx, label in rules:
+        if rx.search(ua):
+            return label
+    return default
+
+
+@lru_cache(maxsize=4096)
+def classify(ua) -> UAInfo:
+    """UAInfo com os índices em DEVICES/OSES/BROWSERS e is_bot (0/1)."""
+    ua = (ua or "").strip()
+    if not ua:
+        return UAInfo(0, 0, 0, 0)
+
+    os_name = _first(_OS_RULES, ua)
+    if _BOT_RE.search(ua) or _BOT_WORD_RE.search(ua):
+        browser = _first(_BROWSER_RULES[:4], ua, "Bot")
+        return UAInfo(DEVICE_BOT, OSES.index(os_name), BROWSERS.index(browser), 1)
+
+    if _TABLET_RE.search(ua):
+        device = "tablet"
+    elif _MOBILE_RE.search(ua):
+        device = "mobile"
+    elif os_name in ("Windows", "macOS", "Linux", "ChromeOS"):
+        device = "desktop"
+    else:
+        device = "other"
+    browser = _first(_BROWSER_RULES, ua)
+    return UAInfo(DEVICES.index(device), OSES.index(os_name), BROWSERS.index(browser), 0)
+
+
+def labels(device, os_, browser):
+    """Índices -> nomes (índice desconhecido/NULL vira "other")."""
+    def pick(names, i):
+        return names[i] if i is not None and 0 <= i < len(names) else "other"
+    return pick(DEVICES, device), pick(OSES, os_), pick(BROWSERS, browser)
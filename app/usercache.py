@@ -0,0 +1,119 @@
+"""Cache em memória dos usuários logados (user_loader do Flask-Login).
+
+Sem cache, todo request autenticado faz um SELECT em users. Aqui cada worker
+guarda, por id, só o registro compacto (UserRecord: id, email, name, role,
+is_active), com TTL e LRU; ids inexistentes ou inativos também ficam em cache
+(como None). A coerência entre workers é a mesma do qrcache: triggers em users
+incrementam cache_versions('users') e cada worker confere esse número no
+máximo a cada USER_CACHE_VERSION_CHECK_INTERVAL segundos. Desativar um
+usuário vale em todos os workers dentro desse intervalo; o TTL é só um teto
+extra.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from .auth import UserRecord
+from .db import get_db
+
+_MISSING = object()
+
+_SELECT_SQL = "SELECT id, email, name, role, is_active FROM users WHERE id = ?"
+
+
+def _fetch(db, user_id):
+    row = db.execute(_SELECT_SQL, (user_id,)).fetchone()
+    if row is None or not row[4]:
+        return None
+    return UserRecord(row[0], row[1], row[2], row[3], True)
+
+
+class UserCache:
+    def __init__(self, maxsize=1000, ttl=60.0, version_check_interval=1.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> (expira_em, UserRecord | None)
+        self._version = None
+        self._version_checked_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, db, user_id: int):
+        """UserRecord do usuário ativo, ou None (inexistente/inativo)."""
+        now = time.monotonic()
+        self._check_version(db, now)
+
+        with self._lock:
+            entry = self._entries.get(user_id, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        record = _fetch(db, user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, record)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return record
+
+    def invalidate(self, user_id=None):
+        """Remove um usuário (ou todos, se user_id=None) do cache deste processo."""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), version=self._version)
+
+    def _check_version(self, db, now):
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+        row = db.execute("SELECT version FROM cache_versions WHERE name = 'users'").fetchone()
+        version = row[0] if row else None
+        with self._lock:
+            self._version_checked_at = now
+            if version != self._version:
+                if self._version is not None:
+                    self._entries.clear()
+                    self._stats["invalidations"] += 1
+                self._version = version
+
+
+def init_app(app):
+    if not app.config.get("USER_CACHE_ENABLED", True):
+        return
+    app.extensions["user_cache"] = UserCache(
+        maxsize=app.config["USER_CACHE_MAXSIZE"],
+        ttl=app.config["USER_CACHE_TTL"],
+        version_check_interval=app.config["USER_CACHE_VERSION_CHECK_INTERVAL"],
+    )
+
+
+def get_user(user_id):
+    """UserRecord do usuário ativo com esse id (str do Flask-Login), ou None."""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    cache = current_app.extensions.get("user_cache")
+    if cache is not None:
+        return cache.get(get_db(), user_id)
+    return _fetch(get_db(), user_id)
+
+
+def invalidate_user(user_id=None):
+    cache = current_app.extensions.get("user_cache")
+    if cache is not None:
+        cache.invalidate(user_id)
@@ -0,0 +1,87 @@
+"""Throughput das landing pages: render_template a cada request vs pré-renderizadas (app/pages.py).
+
+Uso (a partir da raiz do projeto):
+    python bench/bench_landing.py [--requests 5000] [--page landing]
+
+Chama o WSGI do Flask em processo (sem rede nem servidor). Para cada modo
+mostra requests/s e bytes por resposta: o render_template de antes, a página
+pronta sem e com Accept-Encoding: gzip e o GET condicional (304).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+BROWSER = {"User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile Safari/604.1"}
+
+
+def setup():
+    d = tempfile.mkdtemp(prefix="rualead-landing-")
+    os.environ.update({"DB_PATH": os.path.join(d, "bench.db"), "METRICS_DIR": ""})
+    from app import create_app
+    return create_app()
+
+
+def run(wsgi, environ, n):
+    out = {}
+
+    def start_response(status, headers, exc_info=None):
+        out["status"] = status
+
+    size = 0
+    t = time.perf_counter()
+    for _ in range(n):
+        body = wsgi(dict(environ), start_response)
+        size = sum(len(chunk) for chunk in body)
+        if hasattr(body, "close"):
+            body.close()
+    return time.perf_counter() - t, out["status"], size
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=5000)
+    ap.add_argument("--page", choices=("land", "landing", "landing_new"), default="landing")
+    args = ap.parse_args()
+
+    app = setup()
+    pages = app.extensions.get("pages")
+    if pages is None:
+        raise SystemExit("PRERENDER_PAGES está desligado; rode sem PRERENDER_PAGES=0.")
+    wsgi = app.wsgi_app
+    path = f"/{args.page}"
+    etag = pages[f"{args.page}.html"].variants["gzip"][1]
+
+    def environ(**headers):
+        return EnvironBuilder(path=path, headers=dict(BROWSER, **headers)).get_environ()
+
+    cases = (
+        ("render_template", False, environ(**{"Accept-Encoding": "gzip"})),
+        ("pronta", True, environ()),
+        ("pronta + gzip", True, environ(**{"Accept-Encoding": "gzip"})),
+        ("pronta + 304", True, environ(**{"Accept-Encoding": "gzip", "If-None-Match": f'"{etag}"'})),
+    )
+    print(f"{path}: {args.requests} requests por modo")
+    results = {}
+    for label, prerendered, env in cases:
+        if prerendered:
+            app.extensions["pages"] = pages
+        else:
+            app.extensions.pop("pages", None)
+        run(wsgi, env, min(200, args.requests))  # aquece
+        elapsed, status, size = run(wsgi, env, args.requests)
+        results[label] = args.requests / elapsed
+        print(f"  {label:<16} {results[label]:9.0f} req/s  {elapsed / args.requests * 1e6:8.1f} µs/req  "
+              f"{status:<16} {size:>7} bytes")
+    base = results["render_template"]
+    for label in ("pronta", "pronta + gzip", "pronta + 304"):
+        print(f"  ganho {label:<16} {results[label] / base:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Custo do rate limit do /r/<code> (app/ratelimit.py) por request.
+
+Uso (a partir da raiz do projeto):
+    python bench/bench_ratelimit.py [--checks 200000] [--requests 20000]
+
+1. RedirectLimiter.check isolado: poucos clientes (baldes quentes), muitos
+   IPs distintos (criação + remoção de baldes com RATE_LIMIT_MAX_KEYS baixo)
+   e um cliente acima do limite.
+2. O fast path WSGI do redirect com e sem limiter, em processo, para ver o
+   custo relativo ao request inteiro.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+from app.ratelimit import RedirectLimiter  # noqa: E402
+
+
+def bench_check(label, limiter, calls):
+    t = time.perf_counter()
+    limited = 0
+    for ip, code in calls:
+        limited += limiter.check(ip, code) > 0
+    elapsed = time.perf_counter() - t
+    print(f"  {label:<34} {elapsed / len(calls) * 1e9:7.0f} ns/check  limitados={limited / len(calls):6.1%}  "
+          f"chaves={limiter.stats()['keys']}")
+
+
+def bench_wsgi(n):
+    d = tempfile.mkdtemp(prefix="rualead-ratelimit-")
+    os.environ.update({
+        "DB_PATH": os.path.join(d, "bench.db"),
+        "METRICS_DIR": "",
+        "SCAN_DEDUP_WINDOW": "0",
+    })
+    from app import create_app
+    from app.fastpath import RedirectFastPath
+
+    app = create_app()
+    stamp = datetime.utcnow().isoformat()
+    con = app.extensions["db"].connect()
+    con.executemany(
+        "INSERT INTO qr_codes (code, current_url, status, created_at, updated_at) VALUES (?, ?, 'active', ?, ?)",
+        [(f"QR-{i}", f"https://example.com/{i}", stamp, stamp) for i in range(100)],
+    )
+    con.commit()
+    environs = [EnvironBuilder(path=f"/r/QR-{i % 100}", headers={"X-Forwarded-For": f"10.0.{i % 50}.{i % 251}"}).get_environ()
+                for i in range(1000)]
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    # limites altos: ninguém é limitado, mede só o custo da checagem
+    limiter = RedirectLimiter(ip_code=(1e9, 1e9), ip=(1e9, 1e9), global_=(1e9, 1e9))
+    wsgi = RedirectFastPath(app, app.wsgi_app)
+    writer = app.extensions.get("scan_writer")
+    results = {}
+    # alternado e repetido; fica o melhor de cada (menos ruído do writer/GC)
+    for label, value in (("com limiter", limiter), ("sem limiter", None)) * 3:
+        if value is None:
+            app.extensions.pop("redirect_limiter", None)
+        else:
+            app.extensions["redirect_limiter"] = value
+        t = time.perf_counter()
+        for i in range(n):
+            for _ in wsgi(dict(environs[i % len(environs)]), start_response):
+                pass
+        us = (time.perf_counter() - t) / n * 1e6
+        results[label] = min(us, results.get(label, us))
+        if writer:
+            writer.flush(30)
+    for label, us in results.items():
+        print(f"  {label:<34} {us:7.1f} µs/request")
+    print(f"  custo do limiter                   {results['com limiter'] - results['sem limiter']:7.1f} µs/request")
+    print(f"  limiter: {limiter.stats()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--checks", type=int, default=200000)
+    ap.add_argument("--requests", type=int, default=20000)
+    args = ap.parse_args()
+    rnd = random.Random(1)
+
+    print("RedirectLimiter.check")
+    warm = [(f"10.0.0.{rnd.randint(1, 50)}", f"QR-{rnd.randint(1, 20)}") for _ in range(args.checks)]
+    bench_check("50 IPs x 20 códigos", RedirectLimiter(ip_code=(1e9, 1e9), ip=(1e9, 1e9), global_=(1e9, 1e9)), warm)
+    churn = [(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", "QR-1") for i in range(args.checks)]
+    bench_check("IPs sempre novos (max_keys=10000)",
+                RedirectLimiter(ip_code=(1e9, 1e9), ip=(1e9, 1e9), global_=(1e9, 1e9), max_keys=10000), churn)
+    bench_check("1 cliente acima do limite", RedirectLimiter(), [("10.9.9.9", "QR-1")] * args.checks)
+
+    print("fast path do /r/<code>")
+    bench_wsgi(args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Throughput do /r/<code>: rota do Flask vs fast path WSGI (app/fastpath.py).
+
+Uso (a partir da raiz do projeto):
+    python bench/bench_redirect.py [--requests 20000] [--threads 1]
+
+Chama os dois WSGI callables em processo (sem rede nem servidor, só o custo
+do app) com o mesmo request de celular, sem e com cookie de sessão logada,
+e mostra requests/s e latência média. O scan vai para a fila write-behind,
+como em produção. Para medir através do gunicorn, use
+    python bench/loadtest.py --mix redirect=1 --env REDIRECT_FAST_PATH=0
+e compare com o mesmo comando sem o --env.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import Client, EnvironBuilder  # noqa: E402
+
+ADMIN = ("bench@example.com", "bench-password")
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Version/17.0 Mobile Safari/604.1",
+    "X-Forwarded-For": "203.0.113.7",
+}
+
+
+def setup(n_qrs):
+    d = tempfile.mkdtemp(prefix="rualead-redirect-")
+    os.environ.update({
+        "DB_PATH": os.path.join(d, "bench.db"),
+        "ADMIN_EMAIL": ADMIN[0],
+        "ADMIN_PASSWORD": ADMIN[1],
+        "METRICS_DIR": "",
+        "SCAN_DEDUP_WINDOW": os.getenv("SCAN_DEDUP_WINDOW", "0"),  # mede a gravação de todo hit
+        "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "0"),
+    })
+    from app import create_app
+    app = create_app()
+    stamp = datetime.utcnow().isoformat()
+    con = app.extensions["db"].connect()
+    con.executemany(
+        "INSERT INTO qr_codes (code, current_url, status, created_at, updated_at) VALUES (?, ?, 'active', ?, ?)",
+        [(f"QR-{i}", f"https://example.com/imovel/{i}", stamp, stamp) for i in range(n_qrs)],
+    )
+    con.commit()
+    con.close()
+    return app
+
+
+def run(wsgi, environs, n, threads):
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    def worker(k):
+        for i in range(k, n, threads):
+            body = wsgi(dict(environs[i % len(environs)]), start_response)
+            for _ in body:
+                pass
+            if hasattr(body, "close"):
+                body.close()
+
+    ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    t = time.perf_counter()
+    for th in ts:
+        th.start()
+    for th in ts:
+        th.join()
+    return time.perf_counter() - t
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--qrs", type=int, default=100)
+    args = ap.parse_args()
+
+    app = setup(args.qrs)
+    from app.fastpath import RedirectFastPath
+    flask_wsgi = app.wsgi_app
+    fast_wsgi = RedirectFastPath(app, flask_wsgi)
+
+    login = Client(flask_wsgi)
+    login.post("/login", data={"email": ADMIN[0], "password": ADMIN[1]})
+    cookie = f"session={login.get_cookie('session').value}"
+
+    writer = app.extensions.get("scan_writer")
+    print(f"{args.requests} requests, {args.threads} thread(s), {args.qrs} QRs")
+    for label, extra in (("sem cookie", {}), ("com sessão", {"Cookie": cookie})):
+        environs = [EnvironBuilder(path=f"/r/QR-{i}", headers=dict(HEADERS, **extra)).get_environ()
+                    for i in range(args.qrs)]
+        results = {}
+        for name, wsgi in (("flask", flask_wsgi), ("fast path", fast_wsgi)):
+            run(wsgi, environs, min(1000, args.requests), args.threads)  # aquece o cache de QRs
+            elapsed = run(wsgi, environs, args.requests, args.threads)
+            if writer:
+                writer.flush(30)
+            results[name] = args.requests / elapsed
+            print(f"  {label:<11} {name:<10} {results[name]:9.0f} req/s  {elapsed / args.requests * 1e6:7.1f} µs/req")
+        print(f"  {label:<11} ganho      {results['fast path'] / results['flask']:9.2f}x")
+    if writer:
+        print("scan writer:", writer.stats())
+
+
+if __name__ == "__main__":
+    main()
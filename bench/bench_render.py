@@ -0,0 +1,60 @@
+"""Micro-benchmark da renderização dos QRs: tempo e tamanho por formato.
+
+Uso (a partir da raiz do projeto):
+    python bench/bench_render.py [-n 200] [--payload https://exemplo.com/r/ABC123]
+
+Não usa o cache de imagens: mede só qrimage.render() para cada combinação.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.qrimage import QROptions, _build, render  # noqa: E402
+
+CASES = [
+    ("png (padrão)", QROptions("png", 10, 4, "M")),
+    ("png size=4", QROptions("png", 4, 4, "M")),
+    ("png ecc=H", QROptions("png", 10, 4, "H")),
+    ("svg", QROptions("svg", 10, 4, "M")),
+    ("svg ecc=H", QROptions("svg", 10, 4, "H")),
+]
+
+
+def matrix_only(payload, opts):
+    """Só a codificação (qr.make + máscaras): o piso comum a todos os formatos."""
+    return _build(payload, opts).get_matrix()
+
+
+def bench(payload, opts, n, fn=render):
+    fn(payload, opts)  # aquecimento
+    times = []
+    for i in range(n):
+        # payload diferente a cada volta, como num export de vários QRs
+        t = time.perf_counter()
+        data = fn(f"{payload}{i}", opts)
+        times.append(time.perf_counter() - t)
+    return times, len(data) if isinstance(data, bytes) else 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-n", type=int, default=200, help="Renderizações por caso.")
+    ap.add_argument("--payload", default="https://rualead.example.com/r/LANCAMENTO-")
+    args = ap.parse_args()
+
+    print(f"{'caso':<14} {'média ms':>9} {'p95 ms':>8} {'img/s':>8} {'bytes':>8}")
+    cases = [(label, opts, render) for label, opts in CASES]
+    cases.insert(0, ("só matriz", CASES[0][1], matrix_only))
+    for label, opts, fn in cases:
+        times, size = bench(args.payload, opts, args.n, fn)
+        mean = statistics.mean(times)
+        p95 = sorted(times)[int(len(times) * 0.95) - 1]
+        print(f"{label:<14} {mean * 1000:9.2f} {p95 * 1000:8.2f} {1 / mean:8.0f} {size:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Teste de carga HTTP: /r/<code>, dashboard e stats sob gunicorn.
+
+Uso (a partir da raiz do projeto, com gunicorn instalado):
+    python bench/loadtest.py --mix redirect=8,dashboard=1,stats=1 \\
+        --workers 3 --concurrency 32 --duration 20 --json resultado.json
+
+Sobe create_app() (wsgi:app) num SQLite temporário sob gunicorn, semeia QRs
+(e scans, para o stats ter o que mostrar), faz login como admin em cada
+cliente e dispara requisições concorrentes durante --duration segundos.
+Reporta throughput, latência p50/p95/p99 por cenário, códigos HTTP, erros de
+conexão e quantas vezes "database is locked" apareceu no log do servidor.
+No fim confere se todo scan respondido pelo /r/ foi gravado no banco.
+A saída é JSON (stdout ou --json) para comparar branches.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ADMIN_EMAIL = "bench@example.com"
+ADMIN_PASSWORD = "bench-password"
+USER_AGENTS = [
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Version/17.0 Mobile Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 13; SM-S908B) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36",
+    "WhatsApp/2.23.20.0 A",
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def seed(env, n_qrs, n_scans):
+    """Cria o schema, o admin, n_qrs QRs ativos e n_scans scans espalhados em 30 dias."""
+    os.environ.update(env)
+    from app import create_app
+    from app.db import get_db
+    from app.scanlog import new_scan, write_scans
+
+    app = create_app()
+    with app.app_context():
+        db = get_db()
+        stamp = datetime.utcnow().isoformat(timespec="seconds")
+        admin_id = db.execute("SELECT id FROM users WHERE email = ?", (ADMIN_EMAIL,)).fetchone()[0]
+        db.executemany(
+            "INSERT INTO qr_codes (code, description, current_url, status, owner_user_id, created_at, updated_at)"
+            " VALUES (?, ?, ?, 'active', ?, ?, ?)",
+            [(f"BENCH-{i}", f"QR {i}", f"https://example.com/imovel/{i}", admin_id, stamp, stamp) for i in range(n_qrs)],
+        )
+        db.commit()
+        ids = [r[0] for r in db.execute("SELECT id FROM qr_codes ORDER BY id")]
+        rnd = random.Random(1)
+        now = datetime.utcnow()
+        batch = []
+        for i in range(n_scans):
+            when = now - timedelta(seconds=rnd.randint(0, 30 * 86400))
+            batch.append(new_scan(rnd.choice(ids), f"10.1.{i % 250}.{i % 97}", rnd.choice(USER_AGENTS), None, now=when))
+            if len(batch) == 1000:
+                write_scans(db, batch)
+                batch = []
+        if batch:
+            write_scans(db, batch)
+        writer = app.extensions.get("scan_writer")
+        if writer:
+            writer.stop()
+    return ids
+
+
+class Client:
+    """Conexão HTTP keep-alive (quando o servidor permite) com o cookie de sessão."""
+
+    def __init__(self, port):
+        self.port = port
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.cookie = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            resp = self.conn.getresponse()
+            resp.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            raise
+        if resp.will_close:
+            self.conn.close()
+        set_cookie = resp.getheader("Set-Cookie")
+        if set_cookie and set_cookie.startswith("session="):
+            self.cookie = set_cookie.split(";", 1)[0]
+        return resp.status
+
+    def login(self):
+        body = urlencode({"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+        status = self.request("POST", "/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+        if status != 302 or not self.cookie:
+            raise RuntimeError(f"login falhou (HTTP {status})")
+
+
+def make_scenarios(qr_ids):
+    codes = [f"BENCH-{i}" for i in range(len(qr_ids))]
+    return {
+        "redirect": lambda rnd: ("/r/" + rnd.choice(codes), {"User-Agent": rnd.choice(USER_AGENTS),
+                                                            "X-Forwarded-For": f"203.0.113.{rnd.randint(1, 254)}"}),
+        "dashboard": lambda rnd: ("/", {}),
+        "stats": lambda rnd: (f"/qr/{rnd.choice(qr_ids)}/stats?group={rnd.choice(['day', 'week', 'hour'])}", {}),
+        "api_qrs": lambda rnd: ("/api/qrs?sort=scans", {}),
+    }
+
+
+def run_load(port, scenarios, mix, concurrency, duration, seed_value):
+    names = [name for name, _ in mix]
+    weights = [w for _, w in mix]
+    results = {name: {"latencies": [], "status": {}, "errors": {}} for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    start_barrier = threading.Barrier(concurrency)
+
+    def worker(n):
+        rnd = random.Random(seed_value + n)
+        client = Client(port)
+        client.login()
+        local = {name: ([], {}, {}) for name in names}
+        start_barrier.wait()
+        while time.monotonic() < deadline:
+            name = rnd.choices(names, weights)[0]
+            path, headers = scenarios[name](rnd)
+            lat, status, errors = local[name]
+            t = time.perf_counter()
+            try:
+                code = client.request("GET", path, headers=headers)
+            except Exception as e:  # conexão recusada/resetada, timeout...
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            lat.append(time.perf_counter() - t)
+            status[code] = status.get(code, 0) + 1
+        with lock:
+            for name, (lat, status, errors) in local.items():
+                r = results[name]
+                r["latencies"].extend(lat)
+                for k, v in status.items():
+                    r["status"][k] = r["status"].get(k, 0) + v
+                for k, v in errors.items():
+                    r["errors"][k] = r["errors"].get(k, 0) + v
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.monotonic() - t0
+
+
+def summarize(results, elapsed):
+    out = {}
+    for name, r in results.items():
+        lat = sorted(r["latencies"])
+        ms = lambda v: None if v is None else round(v * 1000, 2)  # noqa: E731
+        out[name] = {
+            "requests": len(lat),
+            "rps": round(len(lat) / elapsed, 1) if elapsed else 0,
+            "p50_ms": ms(percentile(lat, 50)),
+            "p95_ms": ms(percentile(lat, 95)),
+            "p99_ms": ms(percentile(lat, 99)),
+            "max_ms": ms(lat[-1] if lat else None),
+            "status": {str(k): v for k, v in sorted(r["status"].items())},
+            "http_5xx": sum(v for k, v in r["status"].items() if k >= 500),
+            "client_errors": r["errors"],
+        }
+    return out
+
+
+def parse_mix(value):
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--mix", default="redirect=8,dashboard=1,stats=1",
+                    help="Cenários e pesos: redirect, dashboard, stats, api_qrs.")
+    ap.add_argument("--workers", type=int, default=2, help="Workers do gunicorn.")
+    ap.add_argument("--threads", type=int, default=1, help="Threads por worker do gunicorn (gthread se > 1).")
+    ap.add_argument("--concurrency", type=int, default=16, help="Clientes simultâneos.")
+    ap.add_argument("--duration", type=float, default=15, help="Segundos de carga.")
+    ap.add_argument("--qrs", type=int, default=200, help="QRs semeados.")
+    ap.add_argument("--seed-scans", type=int, default=20000, help="Scans semeados (histórico do stats).")
+    ap.add_argument("--scan-log-mode", choices=["async", "sync"], default=None, help="SCAN_LOG_MODE do servidor.")
+    ap.add_argument("--env", action="append", default=[], metavar="NOME=VALOR",
+                    help="Variável extra para o app (ex.: REDIRECT_FAST_PATH=0); pode repetir.")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--keep", action="store_true", help="Não apaga o diretório temporário (banco e log).")
+    ap.add_argument("--json", dest="json_path", default=None, help="Grava o resultado neste arquivo.")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="rualead-bench-")
+    env = {
+        "DB_PATH": os.path.join(tmp, "bench.db"),
+        "ADMIN_EMAIL": ADMIN_EMAIL,
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+        "APP_SECRET": "bench",
+        "BASE_URL": "http://bench.local",
+        "QR_IMAGE_CACHE_DIR": os.path.join(tmp, "qr_cache"),
+        "SCAN_ARCHIVE_DIR": os.path.join(tmp, "archive"),
+        # todo hit vira linha (scans_answered == scans_recorded); use --env para ligar
+        "SCAN_DEDUP_WINDOW": "0",
+        "RATE_LIMIT_ENABLED": "0",
+    }
+    if args.scan_log_mode:
+        env["SCAN_LOG_MODE"] = args.scan_log_mode
+    env.update(item.split("=", 1) for item in args.env)
+
+    print(f"semeando {args.qrs} QRs e {args.seed_scans} scans em {tmp}...", file=sys.stderr)
+    qr_ids = seed(env, args.qrs, args.seed_scans)
+    rows_before = sqlite3.connect(env["DB_PATH"]).execute("SELECT COUNT(*) FROM qr_access_logs").fetchone()[0]
+
+    port = free_port()
+    log_path = os.path.join(tmp, "server.log")
+    cmd = [sys.executable, "-m", "gunicorn", "-w", str(args.workers), "-b", f"127.0.0.1:{port}",
+           "--log-level", "warning", "wsgi:app"]
+    if args.threads > 1:
+        cmd[3:3] = ["--threads", str(args.threads)]
+    with open(log_path, "wb") as log:
+        server = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"gunicorn saiu (código {server.returncode}); veja {log_path}")
+                time.sleep(0.1)
+
+        print(f"carga: {args.concurrency} clientes por {args.duration}s ({args.mix})...", file=sys.stderr)
+        results, elapsed = run_load(port, make_scenarios(qr_ids), parse_mix(args.mix),
+                                    args.concurrency, args.duration, args.seed)
+    finally:
+        # SIGTERM: gunicorn encerra os workers e o write-behind grava a fila
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    summary = summarize(results, elapsed)
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        server_log = f.read()
+    rows_after = sqlite3.connect(env["DB_PATH"]).execute("SELECT COUNT(*) FROM qr_access_logs").fetchone()[0]
+    scans_answered = sum(v for k, v in results.get("redirect", {"status": {}})["status"].items() if k in (200, 302, 410))
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: getattr(args, k) for k in ("mix", "workers", "threads", "concurrency", "duration", "qrs", "seed_scans", "env")},
+        "scan_log_mode": args.scan_log_mode or os.getenv("SCAN_LOG_MODE", "async"),
+        "elapsed_s": round(elapsed, 2),
+        "total_rps": round(sum(s["requests"] for s in summary.values()) / elapsed, 1) if elapsed else 0,
+        "scenarios": summary,
+        "server": {
+            "database_is_locked": server_log.count("database is locked"),
+            "tracebacks": server_log.count("Traceback"),
+            "scans_answered": scans_answered,
+            "scans_recorded": rows_after - rows_before,
+        },
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.keep:
+        print(f"arquivos em {tmp}", file=sys.stderr)
+    else:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+// Set year
+document.getElementById("year").textContent = new Date().getFullYear();
+
+// WhatsApp redirect (STATIC)
+// Troque abaixo pelo número comercial do RuaLead no formato DDI + DDD + número (sem +, sem espaços)
+// Ex: Brasil: 55 + 11 + 912345678 => "5511912345678"
+const RUALEAD_WA_NUMBER = "55XXXXXXXXXXX"; // <-- ALTERE AQUI
+
+// Google Forms (OPÇÃO 1)
+// 1) Troque FORM_ID e os entry.xxxxxx pelos do SEU formulário
+const GOOGLE_FORM_ACTION_URL = "https://docs.google.com/forms/d/e/1FAIpQLSeDUMenT9j-C4gRZdu1Ct1NYHHDDL1kKntz0PiuKV-EYaCGSg/formResponse";
+
+// Troque os entrys abaixo pelos do seu form (você pega no link pré-preenchido)
+const GF = {
+  nome: "entry.6446805",
+  empresa: "entry.1181733162",
+  cidade: "entry.411987689",
+  whats: "entry.1725602620",
+  placas: "entry.1456561747",
+  obs: "entry.1183393845"
+};
+
+function onlyDigits(s){ return (s||"").replace(/\D/g, ""); }
+
+document.getElementById("leadForm").addEventListener("submit", async function(e){
+  e.preventDefault();
+
+  const nome   = document.getElementById("nome").value.trim();
+  const empresa= document.getElementById("empresa").value.trim();
+  const cidade = document.getElementById("cidade").value.trim();
+  const whats  = document.getElementById("whats").value.trim();
+  const placas = document.getElementById("placas").value;
+  const obs    = document.getElementById("obs").value.trim();
+
+  // 1) Salvar no Google Forms (sem backend)
+  // Usa FormData para simular um envio normal de formulário
+  try {
+    const fd = new FormData();
+    fd.append(GF.nome, nome);
+    fd.append(GF.empresa, empresa);
+    fd.append(GF.cidade, cidade);
+    fd.append(GF.whats, whats);
+    fd.append(GF.placas, placas);
+    fd.append(GF.obs, obs || "-");
+
+    // IMPORTANTE:
+    // mode: "no-cors" evita erro de CORS (não dá para ler a resposta, mas envia)
+    await fetch(GOOGLE_FORM_ACTION_URL, {
+      method: "POST",
+      mode: "no-cors",
+      body: fd
+    });
+  } catch (err) {
+    // Se falhar, ainda abre o WhatsApp (não travar a conversão)
+    console.warn("Falha ao enviar para Google Forms:", err);
+  }
+
+  // 2) Abrir WhatsApp (como já estava)
+  const msg =
+`Olá! Quero rodar um piloto do RuaLead.
+
+    Nome: ${nome}
+    Imobiliária: ${empresa}
+    Cidade/UF: ${cidade}
+    Meu WhatsApp: ${whats}
+    Qtde de placas: ${placas}
+    Obs: ${obs || "-"}
+
+    Pode me explicar como funciona e enviar a proposta do piloto de 30 dias?`;
+
+  const wa = (RUALEAD_WA_NUMBER || "").replace(/\D/g, "");
+  const url = `https://wa.me/${wa}?text=${encodeURIComponent(msg)}`;
+  window.open(url, "_blank");
+
+  // (Opcional) limpar form
+  // e.target.reset();
+});
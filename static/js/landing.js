@@ -0,0 +1,62 @@
+// Year (igual anexo)
+document.getElementById("year").textContent = new Date().getFullYear();
+
+// WhatsApp comercial (DDI+DDD+número, sem + e sem espaços)
+const RUALEAD_WA_NUMBER = "5511999999999"; // <-- ALTERE AQUI
+
+// Google Forms (sem backend)
+const GOOGLE_FORM_ACTION_URL = "https://docs.google.com/forms/d/e/1FAIpQLSeDUMenT9j-C4gRZdu1Ct1NYHHDDL1kKntz0PiuKV-EYaCGSg/formResponse";
+const GF = {
+nome: "entry.6446805",
+empresa: "entry.1181733162",
+cidade: "entry.411987689",
+whats: "entry.1725602620",
+placas: "entry.1456561747",
+obs: "entry.1183393845"
+};
+
+document.getElementById("leadForm").addEventListener("submit", async function(e){
+e.preventDefault();
+
+const nome = document.getElementById("nome").value.trim();
+const empresa = document.getElementById("empresa").value.trim();
+const cidade = document.getElementById("cidade").value.trim();
+const whats = document.getElementById("whats").value.trim();
+const placas = document.getElementById("placas").value;
+const obs = document.getElementById("obs").value.trim();
+
+// 1) salvar no Google Forms
+try {
+  const fd = new FormData();
+  fd.append(GF.nome, nome);
+  fd.append(GF.empresa, empresa);
+  fd.append(GF.cidade, cidade);
+  fd.append(GF.whats, whats);
+  fd.append(GF.placas, placas);
+  fd.append(GF.obs, obs || "-");
+
+  await fetch(GOOGLE_FORM_ACTION_URL, {
+    method: "POST",
+    mode: "no-cors",
+    body: fd
+  });
+} catch (err) {
+  console.warn("Erro ao enviar para Google Forms:", err);
+}
+
+// 2) abrir WhatsApp
+const msg = `Olá! Quero rodar um piloto do RuaLead.
+
+Nome: ${nome}
+Imobiliária: ${empresa}
+Cidade/UF: ${cidade}
+Meu WhatsApp: ${whats}
+Qtde de placas: ${placas}
+Obs: ${obs || "-"}
+
+Pode me explicar como funciona e enviar a proposta do piloto de 30 dias?`;
+
+const wa = (RUALEAD_WA_NUMBER || "").replace(/\D/g, "");
+const url = `https://wa.me/${wa}?text=${encodeURIComponent(msg)}`;
+window.open(url, "_blank");
+});
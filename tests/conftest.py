@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+import pytest
+
+# Config lê o ambiente no import de app: tudo aqui antes do primeiro import
+_tmp = tempfile.mkdtemp(prefix="rualead-tests-")
+os.environ.update({
+    "DB_PATH": os.path.join(_tmp, "test.db"),
+    "ADMIN_EMAIL": "admin@test.local",
+    "ADMIN_PASSWORD": "admin123",
+    "METRICS_DIR": "",
+    "SCAN_LOG_MODE": "sync",
+    "SCAN_DEDUP_WINDOW": "0",
+    "RATE_LIMIT_ENABLED": "0",
+})
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture(scope="session")
+def admin_client(app):
+    client = app.test_client()
+    r = client.post("/login", data={"email": os.environ["ADMIN_EMAIL"], "password": os.environ["ADMIN_PASSWORD"]})
+    assert r.status_code == 302
+    return client
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from app.aggregates import rebuild_rollups
+from app.scanlog import new_scan, write_scans
+
+
+def test_rebuild_counts_every_log(app, caplog):
+    db = app.extensions["db"].connect()
+    try:
+        db.execute("INSERT INTO qr_codes (code, status, created_at, updated_at) VALUES ('AGG-1', 'active', '', '')")
+        qr_id = db.execute("SELECT id FROM qr_codes WHERE code = 'AGG-1'").fetchone()[0]
+        now = datetime(2026, 3, 10, 12, 0)
+        # o write-behind pode gravar um scan de horas atrás depois dos mais novos
+        write_scans(db, [new_scan(qr_id, f"203.0.113.{i}", "Mozilla/5.0", None, now=now + timedelta(minutes=i))
+                         for i in range(5)])
+        write_scans(db, [new_scan(qr_id, "203.0.113.99", "Mozilla/5.0", None, now=now - timedelta(hours=6))])
+        # log antigo, de antes da coluna ts (backfill-ts não rodou)
+        db.execute("INSERT INTO qr_access_logs (qr_code_id, accessed_at, ip_address, user_agent) VALUES (?, ?, ?, ?)",
+                   (qr_id, (now - timedelta(days=1)).isoformat(), "198.51.100.1", "Mozilla/5.0"))
+        db.commit()
+
+        with caplog.at_level("WARNING", logger="app.aggregates"):
+            rebuild_rollups(db, [qr_id])
+        assert "1 log(s) sem ts" in caplog.text
+
+        logged = db.execute("SELECT COUNT(*) FROM qr_access_logs WHERE qr_code_id = ?", (qr_id,)).fetchone()[0]
+        for table in ("qr_scan_daily", "qr_scan_hourly"):
+            total = db.execute(f"SELECT SUM(scans) FROM {table} WHERE qr_code_id = ?", (qr_id,)).fetchone()[0]
+            assert total == logged == 7
+    finally:
+        db.close()
@@ -0,0 +1,47 @@
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+from app import assets
+
+
+@pytest.fixture
+def static_dir(tmp_path, monkeypatch):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copytree(os.path.join(root, "static", "css"), tmp_path / "css")
+    shutil.copytree(os.path.join(root, "static", "js"), tmp_path / "js")
+    # sem rede: cada URL devolve um conteúdo fixo derivado dela
+    monkeypatch.setattr(assets.urllib.request, "urlopen",
+                        lambda url, timeout=None: io.BytesIO(f"/* {url} */".encode()))
+    return str(tmp_path)
+
+
+def test_build_fails_without_vendor(static_dir):
+    with pytest.raises(RuntimeError, match="faltando"):
+        assets.build_assets(static_dir)
+
+
+def test_vendor_then_build(static_dir):
+    assert sorted(assets.download_vendor(static_dir)) == sorted(assets.VENDOR)
+    assert assets.check_vendor(static_dir) == []
+    manifest = assets.build_assets(static_dir)
+    assert set(assets.VENDOR) <= set(manifest)
+    assert os.path.exists(os.path.join(static_dir, "dist", "manifest.json"))
+    css = open(os.path.join(static_dir, "dist", manifest["css/landing.css"]), encoding="utf-8").read()
+    assert os.path.basename(manifest["vendor/inter/inter-latin-wght-normal.woff2"]) in css
+
+
+def test_vendor_checks_committed_lock(static_dir):
+    assets.download_vendor(static_dir)
+    lock_path = os.path.join(static_dir, *assets.VENDOR_LOCK.split("/"))
+    with open(lock_path, encoding="utf-8") as f:
+        lock = json.load(f)
+    rel = "vendor/chart.js/chart.umd.min.js"
+    lock[rel]["integrity"] = "sha384-outro"
+    with open(lock_path, "w", encoding="utf-8") as f:
+        json.dump(lock, f)
+    with pytest.raises(RuntimeError, match="não bate"):
+        assets.download_vendor(static_dir, force=True)
@@ -0,0 +1,37 @@
+from app.scanlog import client_ip
+
+# cliente -> CDN -> front-end do App Service -> app
+MULTI_HOP = "198.51.100.9, 203.0.113.7:5555, 10.0.0.1"
+
+
+def test_default_is_leftmost():
+    assert client_ip(MULTI_HOP, "10.0.0.2") == "198.51.100.9"
+
+
+def test_trusted_hops_from_the_right():
+    assert client_ip(MULTI_HOP, "10.0.0.2", 1) == "10.0.0.1"
+    assert client_ip(MULTI_HOP, "10.0.0.2", 2) == "203.0.113.7"
+    assert client_ip(MULTI_HOP, "10.0.0.2", 3) == "198.51.100.9"
+
+
+def test_forged_header_is_ignored_with_trusted_hops():
+    # o cliente manda o próprio X-Forwarded-For; o proxy acrescenta o IP real
+    assert client_ip("1.2.3.4, 203.0.113.7:40000", "10.0.0.2", 1) == "203.0.113.7"
+
+
+def test_fewer_hops_than_trusted():
+    # o único endereço pode ter vindo do próprio cliente
+    assert client_ip("203.0.113.7", "10.0.0.2", 3) == "10.0.0.2"
+    assert client_ip("1.2.3.4, 203.0.113.7", "10.0.0.2", 3) == "10.0.0.2"
+
+
+def test_port_is_stripped():
+    assert client_ip("[2001:db8::1]:443", "10.0.0.2") == "2001:db8::1"
+    assert client_ip("2001:db8::1", "10.0.0.2") == "2001:db8::1"
+    assert client_ip("203.0.113.7:5555", "10.0.0.2") == "203.0.113.7"
+
+
+def test_without_header():
+    assert client_ip("", "10.0.0.2") == "10.0.0.2"
+    assert client_ip(" , ", "10.0.0.2", 1) == "10.0.0.2"
+    assert client_ip(MULTI_HOP, "10.0.0.2", 0) == "10.0.0.2"
@@ -0,0 +1,32 @@
+from app import db as appdb
+
+
+def _thread_conn(app):
+    return getattr(app.extensions["db"]._local, "rw", None)
+
+
+def test_check_db_skips_bootstrap_when_admin_exists(app, monkeypatch):
+    def boom(*args, **kwargs):
+        raise AssertionError("bootstrap_admin no startup com o admin já criado")
+
+    monkeypatch.setattr(appdb, "bootstrap_admin", boom)
+    appdb.check_db(app)
+    assert _thread_conn(app) is None
+
+
+def test_check_db_closes_connection_when_upgrade_is_pending(app, monkeypatch):
+    monkeypatch.setattr(appdb, "latest_schema_version", lambda: 10**6)
+    monkeypatch.setitem(app.config, "DB_AUTO_UPGRADE", False)
+    appdb.check_db(app)
+    assert _thread_conn(app) is None
+
+
+def test_check_db_creates_missing_admin(app, monkeypatch):
+    monkeypatch.setitem(app.config, "ADMIN_EMAIL", "novo-admin@test.local")
+    appdb.check_db(app)
+    con = app.extensions["db"].connect()
+    try:
+        row = con.execute("SELECT role FROM users WHERE email = 'novo-admin@test.local'").fetchone()
+    finally:
+        con.close()
+    assert row is not None and row["role"] == "admin"
@@ -0,0 +1,100 @@
+"""O fast path WSGI do /r/<code> (app/fastpath.py) responde igual à rota do Flask.
+
+Os mesmos requests vão para redirect_qr (app.wsgi_app original) e para
+RedirectFastPath: QR ativo, sem URL, com URL inválida, desativado,
+inexistente, código com acento/espaço, GET/HEAD/POST, com e sem
+X-Forwarded-For, com sessão logada e com cookie inválido. Compara status,
+headers, corpo e o scan gravado (QR, IP, user-agent, referer, classificação).
+O conftest sobe o app com SCAN_LOG_MODE=sync (scan lido na hora), sem
+deduplicação (os dois caminhos recebem o mesmo hit em sequência) e sem rate
+limit (todos os requests saem do mesmo IP).
+"""
+import os
+from datetime import datetime
+
+import pytest
+from werkzeug.test import Client
+
+from app.fastpath import RedirectFastPath
+
+QRS = [
+    ("ATIVO", "https://example.com/casa?x=1&y=ç", "active"),
+    ("SEM-URL", None, "active"),
+    ("URL-INVALIDA", "ftp://example.com/x", "active"),
+    ("DESATIVADO", "https://example.com/velho", "inactive"),
+    ("CASA-ção", "https://example.com/acento", "active"),
+    ("com espaço", "https://example.com/espaco", "active"),
+]
+
+PATHS = ["/r/ATIVO", "/r/SEM-URL", "/r/URL-INVALIDA", "/r/DESATIVADO", "/r/NAO-EXISTE",
+         "/r/CASA-ção", "/r/CASA-%C3%A7%C3%A3o", "/r/com%20espa%C3%A7o", "/r/%FF",
+         "/r/", "/r/ATIVO/", "/r/ATIVO/extra", "/r/ATIVO?utm_source=placa"]
+
+HEADER_SETS = [
+    {},
+    {"User-Agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Safari/604.1",
+     "Referer": "https://instagram.com/"},
+    {"X-Forwarded-For": "203.0.113.7, 10.0.0.1", "User-Agent": "WhatsApp/2.23.20.0 A"},
+    {"X-Forwarded-For": "  198.51.100.1  "},
+]
+
+
+@pytest.fixture(scope="module")
+def con(app):
+    stamp = datetime.utcnow().isoformat()
+    con = app.extensions["db"].connect()
+    for code, url, status in QRS:
+        con.execute(
+            "INSERT INTO qr_codes (code, current_url, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (code, url, status, stamp, stamp),
+        )
+    con.commit()
+    yield con
+    con.close()
+
+
+@pytest.fixture(scope="module")
+def cookies(app):
+    login = Client(app.wsgi_app)
+    login.post("/login", data={"email": os.environ["ADMIN_EMAIL"], "password": os.environ["ADMIN_PASSWORD"]})
+    session = login.get_cookie("session")
+    assert session is not None
+    return [None, f"session={session.value}", "session=lixo.invalido"]
+
+
+def last_scan(con):
+    # fetchall: um cursor não esgotado seguraria o snapshot de leitura
+    rows = con.execute("""
+      SELECT id, qr_code_id, ip_address, user_agent, referer, ua_device, ua_os, ua_browser, is_bot
+      FROM qr_access_logs ORDER BY id DESC LIMIT 1
+    """).fetchall()
+    return tuple(rows[0]) if rows else None
+
+
+def call(client, con, method, path, headers):
+    before = last_scan(con)
+    resp = client.open(path, method=method, headers=headers)
+    after = last_scan(con)
+    scan = after[1:] if after != before else None
+    return resp.status, sorted(resp.headers.items()), resp.get_data(), scan
+
+
+@pytest.mark.parametrize("method", ["GET", "HEAD", "POST"])
+@pytest.mark.parametrize("path", PATHS)
+def test_same_response_as_flask(app, con, cookies, method, path):
+    flask_wsgi = app.wsgi_app
+    slow = Client(flask_wsgi)
+    fast = Client(RedirectFastPath(app, flask_wsgi))
+    for headers in HEADER_SETS:
+        for cookie in cookies:
+            h = dict(headers, **({"Cookie": cookie} if cookie else {}))
+            assert call(fast, con, method, path, h) == call(slow, con, method, path, h), h
+
+
+def test_scan_is_recorded(app, con):
+    fast = Client(RedirectFastPath(app, app.wsgi_app))
+    resp = fast.get("/r/ATIVO", headers={"X-Forwarded-For": "203.0.113.9", "User-Agent": "curl/8.4.0"})
+    assert resp.status_code == 302
+    qr_id, ip, ua = last_scan(con)[1:4]
+    assert con.execute("SELECT code FROM qr_codes WHERE id = ?", (qr_id,)).fetchone()[0] == "ATIVO"
+    assert (ip, ua) == ("203.0.113.9", "curl/8.4.0")
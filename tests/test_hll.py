@@ -0,0 +1,100 @@
+"""Sketches HyperLogLog contra contagens exatas em dados sintéticos (seed fixa).
+
+Visitantes (ip, user-agent) com repetição entre dias, um sketch por dia como
+a ingestão faz; o estimado tem que ficar a até 4 erros padrão do exato por
+dia, por semana/mês (merge dos dias) e no período inteiro.
+"""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from app.hll import HLL, STD_ERROR
+
+SEED = 1
+DAYS = 60
+TOLERANCE = 4 * STD_ERROR
+
+UAS = [
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 13) Chrome/120.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0 Safari/537.36",
+]
+
+
+def synthetic(days, seed):
+    """{dia: [(ip, ua)]}: base de visitantes que voltam + novos a cada dia."""
+    rnd = random.Random(seed)
+    regulars = [(f"10.0.{i // 256}.{i % 256}", rnd.choice(UAS)) for i in range(3000)]
+    start = date(2026, 1, 1)
+    out = {}
+    next_id = 0
+    for d in range(days):
+        scans = rnd.sample(regulars, rnd.randint(0, 400))
+        for _ in range(rnd.choice((5, 50, 500, 5000))):
+            next_id += 1
+            scans.append((f"172.{next_id >> 16 & 255}.{next_id >> 8 & 255}.{next_id & 255}", rnd.choice(UAS)))
+        scans += rnd.choices(scans, k=len(scans))  # o mesmo visitante escaneia de novo
+        out[(start + timedelta(days=d)).isoformat()] = scans
+    return out
+
+
+def assert_close(estimate, exact):
+    # contagens pequenas: o estimador é praticamente exato (linear counting)
+    assert abs(estimate - exact) <= 2 or abs(estimate - exact) / exact <= TOLERANCE, (estimate, exact)
+
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic(DAYS, SEED)
+
+
+@pytest.fixture(scope="module")
+def sketches(data):
+    out = {}
+    for day, scans in data.items():
+        sk = HLL()
+        for ip, ua in scans:
+            sk.add(ip, ua)
+        out[day] = sk
+    return out
+
+
+def test_serialization_roundtrip(sketches):
+    for sk in sketches.values():
+        assert HLL.from_bytes(sk.to_bytes()).registers == sk.registers
+
+
+def test_daily(data, sketches):
+    for day, scans in data.items():
+        assert_close(sketches[day].count(), len(set(scans)))
+
+
+@pytest.mark.parametrize("key", [
+    lambda d: date.fromisoformat(d).isocalendar()[:2],  # semana
+    lambda d: d[:7],  # mês
+], ids=["semana", "mes"])
+def test_merged_periods(data, sketches, key):
+    groups = {}
+    for day in data:
+        groups.setdefault(key(day), []).append(day)
+    for days in groups.values():
+        merged = HLL()
+        for day in days:
+            merged.merge(sketches[day])
+        assert_close(merged.count(), len({v for day in days for v in data[day]}))
+
+
+def test_merge_equals_single_sketch(data, sketches):
+    merged, single = HLL(), HLL()
+    for day, scans in data.items():
+        merged.merge(sketches[day])
+        for ip, ua in scans:
+            single.add(ip, ua)
+    assert merged.registers == single.registers
+    assert_close(merged.count(), len({v for scans in data.values() for v in scans}))
+
+
+def test_empty():
+    assert HLL().count() == 0
+    assert HLL.from_bytes(HLL().to_bytes()).count() == 0
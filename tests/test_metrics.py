@@ -0,0 +1,45 @@
+import json
+import os
+
+from app import metrics
+
+
+def _snap(value, started):
+    return {"counters": [["qr_scans_written_total", [], value]], "histograms": [], "started": started}
+
+
+def _written(total):
+    return total.get(("c", "qr_scans_written_total", ()), 0)
+
+
+def test_reused_pid_counts_as_dead(tmp_path):
+    reg = metrics.Registry()
+    reg.directory = str(tmp_path)
+    parent = os.getppid()
+    # worker antigo com o mesmo pid de um processo vivo (pid reaproveitado)
+    (tmp_path / f"metrics-{parent}.json").write_text(json.dumps(_snap(5, -1)))
+    # snapshot antigo com o pid deste processo
+    (tmp_path / f"metrics-{os.getpid()}.json").write_text(json.dumps(_snap(7, -1)))
+
+    assert _written(reg.collect()) == 12
+    assert sorted(os.listdir(tmp_path)) == [".lock", "metrics-dead.json"]
+    assert _written(reg.collect()) == 12  # somado uma vez só
+
+
+def test_live_worker_is_merged(tmp_path):
+    reg = metrics.Registry()
+    reg.directory = str(tmp_path)
+    parent = os.getppid()
+    (tmp_path / f"metrics-{parent}.json").write_text(json.dumps(_snap(3, metrics._proc_start(parent))))
+    assert _written(reg.collect()) == 3
+    assert f"metrics-{parent}.json" in os.listdir(tmp_path)
+
+
+def test_flush_records_start_time(tmp_path):
+    reg = metrics.Registry()
+    reg.directory = str(tmp_path)
+    reg.inc("qr_scans_written_total")
+    reg.flush()
+    snap = json.loads((tmp_path / f"metrics-{os.getpid()}.json").read_text())
+    assert snap["started"] == metrics._proc_start(os.getpid()) is not None
+    assert _written(reg.collect()) == 1  # o próprio arquivo não soma de novo
@@ -0,0 +1,97 @@
+import base64
+import json
+
+import pytest
+
+from app.routes import _decode_cursor, _encode_cursor
+
+
+def _raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.fixture(scope="module")
+def qrs(app, admin_client):
+    rows = [("T-B", "banana", "https://b.example"), ("T-a", "Abacaxi", None),
+            ("T-C", None, "https://A.example"), ("T-d", "cereja", "https://c.example")]
+    for code, desc, url in rows:
+        admin_client.post("/qr/new", data={"code": code, "description": desc or ""})
+    db = app.extensions["db"].connect()
+    try:
+        for code, desc, url in rows:
+            db.execute("UPDATE qr_codes SET current_url = ?, description = ? WHERE code = ?", (url, desc, code))
+        db.execute("UPDATE qr_codes SET status = 'inactive' WHERE code = 'T-d'")
+        db.commit()
+    finally:
+        db.close()
+    return [code for code, _, _ in rows]
+
+
+def test_cursor_roundtrip():
+    assert _decode_cursor(_encode_cursor("abc", 7)) == ("abc", 7)
+    assert _decode_cursor(_encode_cursor(None, 7)) == (None, 7)
+    assert _decode_cursor(_encode_cursor(12, 7)) == (12, 7)
+
+
+@pytest.mark.parametrize("value", [
+    [[1, 2], 7], [{"a": 1}, 7], [1.5, 7], [True, 7], ["x", "7"], ["x", 7.0], ["x", None], [1, 2, 3], {"k": 1},
+])
+def test_bad_cursor_is_ignored(value):
+    assert _decode_cursor(_raw_cursor(value)) is None
+
+
+def test_bad_cursor_is_first_page(admin_client, qrs):
+    r = admin_client.get("/api/qrs", query_string={"sort": "updated", "cursor": _raw_cursor([[1, 2], 1])})
+    assert r.status_code == 200
+    assert r.get_json()["items"]
+
+
+def _walk(client, sort, order):
+    """Percorre a lista inteira de 1 em 1 (um cursor por página)."""
+    codes, cursor = [], None
+    while True:
+        r = client.get("/api/qrs", query_string={"sort": sort, "order": order, "limit": 1, "cursor": cursor or ""})
+        assert r.status_code == 200
+        data = r.get_json()
+        codes += [it["code"] for it in data["items"] if it["code"].startswith("T-")]
+        cursor = data["next_cursor"]
+        if not cursor:
+            return codes
+
+
+@pytest.mark.parametrize("sort,expected", [
+    ("code", ["T-B", "T-C", "T-a", "T-d"]),
+    ("description", ["T-C", "T-a", "T-B", "T-d"]),   # sem descrição primeiro, sem diferenciar maiúsculas
+    ("url", ["T-a", "T-C", "T-B", "T-d"]),
+])
+def test_text_sorts(admin_client, qrs, sort, expected):
+    assert _walk(admin_client, sort, "asc") == expected
+    assert _walk(admin_client, sort, "desc") == expected[::-1]
+
+
+def test_status_sort(admin_client, qrs):
+    codes = _walk(admin_client, "status", "desc")
+    assert codes[0] == "T-d"
+    assert sorted(codes) == sorted(qrs)
+
+
+def test_dashboard_sort_headers(admin_client, qrs):
+    html = admin_client.get("/?sort=description&order=asc").data.decode()
+    assert "sort=code" in html and "sort=url" in html and "sort=status" in html
+    assert "sort=description&amp;order=desc" in html
+
+
+@pytest.mark.parametrize("limit,expected", [(-1, 1), (-1000, 1), (2, 2), (10**6, 500)])
+def test_api_limit_is_clamped(app, admin_client, qrs, limit, expected):
+    db = app.extensions["db"].connect()
+    try:
+        db.executemany(
+            "INSERT OR IGNORE INTO qr_codes (code, status, created_at, updated_at) VALUES (?, 'active', '', '')",
+            [(f"L-{i:03}",) for i in range(510)],
+        )
+        db.commit()
+    finally:
+        db.close()
+    r = admin_client.get("/api/qrs", query_string={"limit": limit})
+    assert r.status_code == 200
+    assert len(r.get_json()["items"]) == expected
@@ -0,0 +1,15 @@
+import io
+import zipfile
+
+from app.qrexport import iter_zip
+from app.qrimage import QRImageCache
+
+
+def test_colliding_codes_get_unique_names():
+    items = [(1, "Casa ção"), (2, "Casa-ção"), (3, "casa ção"), (4, "Casa_"), (5, "..."), (6, "qr-5")]
+    data = b"".join(iter_zip(items, "https://example.com", QRImageCache(), workers=0))
+    names = zipfile.ZipFile(io.BytesIO(data)).namelist()
+    assert len(names) == len(items)
+    assert len({n.lower() for n in names}) == len(items)
+    assert names[:3] == ["Casa_o.png", "Casa-_o.png", "casa_o-3.png"]
+    assert names[4:] == ["qr-5.png", "qr-5-6.png"]
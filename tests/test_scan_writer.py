@@ -0,0 +1,56 @@
+import sqlite3
+
+from app import scanlog
+from app.scanlog import ScanWriter
+
+
+def _writer(**kw):
+    return ScanWriter(lambda: sqlite3.connect(":memory:", check_same_thread=False),
+                      flush_interval=0.01, **kw)
+
+
+def test_unexpected_error_drops_batch_and_keeps_thread(monkeypatch):
+    calls = []
+
+    def write_scans(db, scans, suppressed=None):
+        calls.append(list(scans))
+        if len(calls) == 1:
+            raise ValueError("scan inválido")
+
+    monkeypatch.setattr(scanlog, "write_scans", write_scans)
+    w = _writer(batch_size=1, max_retries=3)
+    try:
+        assert w.enqueue("a")
+        assert w.flush(2)
+        assert w.enqueue("b")
+        assert w.flush(2)
+        assert calls == [["a"], ["b"]]  # sem retry para erro que não é do SQLite
+        stats = w.stats()
+        assert stats["dropped"] == 1 and stats["written"] == 1
+        assert w._thread.is_alive()
+    finally:
+        w.stop()
+
+
+def test_dead_thread_is_restarted(monkeypatch):
+    written = []
+    monkeypatch.setattr(scanlog, "write_scans", lambda db, scans, suppressed=None: written.extend(scans))
+    connects = []
+
+    def connect():
+        connects.append(1)
+        if len(connects) == 1:
+            raise sqlite3.OperationalError("unable to open database file")
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    w = ScanWriter(connect, batch_size=1, flush_interval=0.01)
+    try:
+        w.enqueue("a")
+        w._thread.join(2)
+        assert not w._thread.is_alive()
+        assert w.enqueue("b")
+        assert w.flush(2)
+        assert written == ["a", "b"]
+        assert w.stats()["restarts"] == 1
+    finally:
+        w.stop()
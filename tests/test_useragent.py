@@ -0,0 +1,56 @@
+import pytest
+
+from app.db import reclassify_bot_scans
+from app.scanlog import new_scan, write_scans
+from app.useragent import DEVICES, classify
+
+CUBOT = "Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Mobile Safari/537.36"
+
+
+@pytest.mark.parametrize("ua", [
+    CUBOT,
+    "Mozilla/5.0 (Linux; Android 11; KingKong 5 Pro Build/CUBOT) Mobile",
+    "Mozilla/5.0 (Linux; Android 13; SM-S918B) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36",
+])
+def test_phones_are_not_bots(ua):
+    info = classify(ua)
+    assert not info.is_bot
+    assert DEVICES[info.device] == "mobile"
+
+
+@pytest.mark.parametrize("ua", [
+    "Mozilla/5.0 (compatible; AhrefsBot/7.0; +http://ahrefs.com/robot/)",
+    "Mozilla/5.0 (compatible; MJ12bot/v1.4.8; http://mj12bot.com/)",
+    "Mozilla/5.0 (compatible; PetalBot;+https://webmaster.petalsearch.com/site/petalbot)",
+    "mybot/1.0",
+    "WhatsApp/2.23.20.0",
+    "curl/8.4.0",
+])
+def test_bots(ua):
+    assert classify(ua).is_bot
+
+
+def test_reclassify_bot_scans(app):
+    db = app.extensions["db"].connect()
+    try:
+        db.execute("INSERT INTO qr_codes (code, status, created_at, updated_at) VALUES ('UA-1', 'active', '', '')")
+        qr_id = db.execute("SELECT id FROM qr_codes WHERE code = 'UA-1'").fetchone()[0]
+        db.execute("INSERT OR IGNORE INTO qr_scan_counters (qr_code_id, scans) VALUES (?, 0)", (qr_id,))
+        scan = new_scan(qr_id, "203.0.113.7", CUBOT, None)
+        # como a versão anterior do parser gravava: is_bot = 1
+        write_scans(db, [scan._replace(ua_device=DEVICES.index("bot"), is_bot=1)])
+        assert db.execute("SELECT SUM(bot_scans) FROM qr_scan_daily WHERE qr_code_id = ?", (qr_id,)).fetchone()[0] == 1
+
+        assert reclassify_bot_scans(db) == 1
+        row = db.execute("SELECT is_bot, ua_device FROM qr_access_logs WHERE qr_code_id = ?", (qr_id,)).fetchone()
+        assert tuple(row) == (0, DEVICES.index("mobile"))
+        assert db.execute("SELECT SUM(bot_scans) FROM qr_scan_daily WHERE qr_code_id = ?", (qr_id,)).fetchone()[0] == 0
+        assert reclassify_bot_scans(db) == 0
+    finally:
+        db.close()
+
+
+def test_reclassify_bots_command(app):
+    result = app.test_cli_runner().invoke(args=["scans", "reclassify-bots"])
+    assert result.exit_code == 0, result.output
+    assert "deixaram de ser bot" in result.output
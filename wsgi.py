@@ -1,3 +1,8 @@
 from app import create_app
+from app.fastpath import RedirectFastPath
 
-app = create_app()
\ No newline at end of file
+app = create_app()
+
+# /r/<code> é atendido antes do Flask (sem sessão/login/hooks); o resto segue normal
+if app.config["REDIRECT_FAST_PATH"]:
+    app.wsgi_app = RedirectFastPath(app, app.wsgi_app)